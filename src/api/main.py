@@ -1,12 +1,17 @@
 """
 FastAPI server for EduMate RAG with conversation support
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
+import os
 import sys
+import tempfile
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
@@ -14,6 +19,15 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from src.config import config
 from src.vector_store import vector_store
 from src.rag_chain import rag_chain
+from src.pdf_loader import pdf_loader
+from src.document_manager import DocumentError, DocumentManager, DocumentNotFoundError
+from src.conversation_store import DEFAULT_SESSION, SessionBusy
+from src.followup import classify_followup
+from src.snapshot import SnapshotError, export_store_snapshot, import_snapshot
+from src.watcher import PDFWatcher
+from src.extraction import pdf_extractor
+from src.quarantine import quarantine
+from src.profiler import profiler
 
 # Create FastAPI app
 app = FastAPI(
@@ -31,9 +45,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+UPLOAD_WRITE_BYTES = 1024 * 1024  # Upload bytes buffered per threadpool disk write
+
+# Opt-in sampling profiler; when disabled the middleware is not installed
+PROFILED_PATHS = ("/api/query", "/api/index")
+
+if config.PROFILING_ENABLED:
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        """Profile a sampled fraction of requests, or any carrying X-Profile: 1"""
+        if request.url.path.startswith(PROFILED_PATHS) and profiler.should_profile(
+            request.headers.get("X-Profile")
+        ):
+            with profiler.request(f"{request.method} {request.url.path}") as profile:
+                response = await call_next(request)
+            response.headers["X-Profile-Id"] = str(profile.id)
+            return response
+        return await call_next(request)
+
+def require_admin(x_admin_token: str = Header(default="")):
+    """Guard admin endpoints when ADMIN_TOKEN is configured"""
+    if config.ADMIN_TOKEN and x_admin_token != config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+# Background ingestion of PDFs dropped into the folder (WATCH_PDF_FOLDER=true)
+pdf_watcher = PDFWatcher(vector_store)
+
+# Single-document upload/replace/delete (kept in step with the watcher)
+document_manager = DocumentManager(vector_store, pdf_loader, watcher=pdf_watcher)
+
+@app.on_event("startup")
+async def start_watcher():
+    """Start the PDF folder watcher if enabled"""
+    if config.WATCH_PDF_FOLDER:
+        pdf_watcher.start()
+
+@app.on_event("startup")
+async def start_warmup():
+    """Replay logged questions in the background; /ready waits for it"""
+    if config.WARM_ON_STARTUP:
+        rag_chain.warmer.start()
+    else:
+        rag_chain.warmer.skip()
+
+@app.on_event("shutdown")
+async def stop_watcher():
+    """Stop the PDF folder watcher"""
+    pdf_watcher.stop()
+
 # Pydantic models for request/response
 class QueryRequest(BaseModel):
     question: str
+    session_id: str = DEFAULT_SESSION
 
 class QueryResponse(BaseModel):
     question: str
@@ -41,14 +104,24 @@ class QueryResponse(BaseModel):
     sources: List[str]
     num_context_docs: int
     conversation_turn: int
+    degraded: bool = False  # LLM missed its deadline; the answer quotes the course materials
+
+class PrefetchRequest(BaseModel):
+    question: str  # Partial question typed so far
+    session_id: str = DEFAULT_SESSION
 
 class ConversationMessage(BaseModel):
+    id: int
     role: str  # "student" or "assistant"
     content: str
+    created_at: float
 
 class ConversationHistoryResponse(BaseModel):
+    session_id: str
     total_turns: int
     messages: List[ConversationMessage]
+    next_cursor: Optional[int]  # Pass as ?after= to fetch only newer messages
+    has_more: bool
 
 # Endpoints
 
@@ -70,8 +143,18 @@ async def health():
         "model": config.GROQ_MODEL,
         "vector_store": {
             "collection": collection_info["collection_name"],
-            "documents_indexed": collection_info["count"]
+            "documents_indexed": collection_info["count"],
+            "hnsw_rebuild_needed": collection_info["hnsw_rebuild_needed"]
         },
+        "embedding_batcher": (
+            vector_store.query_embedder.get_stats() if vector_store.query_embedder else None
+        ),
+        "generation": rag_chain.generator.get_stats(),
+        "warmup": rag_chain.warmer.get_stats(),
+        "sessions": rag_chain.conversations.get_queue_stats(),
+        "search_shards": (
+            vector_store.sharded_index.get_stats() if config.VECTOR_BACKEND == "sharded" else None
+        ),
         "features": {
             "conversation_memory": True,
             "multi_turn_support": True,
@@ -79,6 +162,19 @@ async def health():
         }
     }
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness check: 503 until the startup cache warm-up has finished
+    
+    Point the load balancer's readiness probe here (and liveness at /health)
+    so traffic arrives only once the caches are warm.
+    """
+    stats = rag_chain.warmer.get_stats()
+    if not stats["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming", "warmup": stats})
+    return {"status": "ready", "warmup": stats}
+
 @app.post("/api/query")
 async def query(request: QueryRequest) -> QueryResponse:
     """
@@ -101,73 +197,404 @@ async def query(request: QueryRequest) -> QueryResponse:
     
     try:
         # Query RAG chain (with conversation memory)
-        result = rag_chain.query(request.question)
+        # Run in the threadpool so concurrent queries overlap (and their
+        # embeddings can share a batch) instead of blocking the event loop;
+        # a request queued behind its session's running turn waits here,
+        # without holding a worker thread
+        async with rag_chain.conversations.admit(request.session_id):
+            result = await run_in_threadpool(rag_chain.query, request.question,
+                                             session_id=request.session_id)
+        # Standalone questions are what a restart replays; follow-ups only
+        # make sense inside their conversation ("tell me more" asked first
+        # is searched, but is still a follow-up)
+        if (result.get("retrieval_mode") == "search"
+                and classify_followup(request.question, True) == "new"):
+            rag_chain.query_log.record(request.question, request.session_id)
         
         return QueryResponse(
             question=result["question"],
             answer=result["answer"],
             sources=result["sources"],
             num_context_docs=result["num_context_docs"],
-            conversation_turn=result["conversation_turn"]
+            conversation_turn=result["conversation_turn"],
+            degraded=result.get("degraded", False)
         )
     
+    except SessionBusy as e:
+        # Same-session requests queue behind each other; past the bound the
+        # client should wait for its earlier answers instead of piling on
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         print(f" API Error: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
-@app.post("/api/index")
+@app.post("/api/prefetch", status_code=202)
+async def prefetch(request: PrefetchRequest):
+    """
+    Warm retrieval for a question the student is still typing
+    
+    Call on every keystroke (or input change); only the text the student
+    pauses on is searched, and the real /api/query cancels anything pending.
+    Returns immediately.
+    
+    Example:
+        POST /api/prefetch
+        {
+            "question": "What is a dead",
+            "session_id": "student-42"
+        }
+    """
+    status = rag_chain.prefetcher.submit(request.session_id, request.question)
+    return JSONResponse(status_code=202, content={"status": status})
+
+@app.get("/api/prefetch/stats")
+async def prefetch_stats():
+    """Prefetch hit rate and wasted work, plus the query cache counters"""
+    return {
+        "prefetch": rag_chain.prefetcher.get_stats(),
+        "embedding_cache": vector_store.embedding_cache.get_stats(),
+        "search_cache": vector_store.search_cache.get_stats(),
+        "answer_cache": rag_chain.answer_cache.get_stats(),
+        "query_log": rag_chain.query_log.get_stats()
+    }
+
+@app.post("/api/index", dependencies=[Depends(require_admin)])
 async def index():
     """
     Re-index all PDFs in the database
     
+    The new index is built in a shadow collection while queries are served
+    from the current one, and is swapped in once validated.
+    
     Returns:
         Success status and document count
     """
     try:
-        success = vector_store.index_pdfs()
+        success = await run_in_threadpool(vector_store.index_pdfs)
         
         if success:
-            collection_info = vector_store.get_collection_info()
+            collection_info = await run_in_threadpool(vector_store.get_collection_info)
             return {
                 "status": "success",
                 "message": "PDFs indexed successfully",
-                "documents_indexed": collection_info["count"]
+                "documents_indexed": collection_info["count"],
+                "ingest": vector_store.last_ingest_stats
             }
         else:
-            raise HTTPException(status_code=400, detail="Indexing failed")
+            swap = (vector_store.last_ingest_stats or {}).get("swap") or {}
+            problems = "; ".join(swap.get("problems", []))
+            raise HTTPException(status_code=400,
+                                detail=f"Indexing failed: {problems}" if problems else "Indexing failed")
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f" indexing Error: {e}")
         raise HTTPException(status_code=500, detail=f"Error indexing PDFs: {str(e)}")
 
+@app.get("/api/index/generations")
+async def index_generations():
+    """
+    Show the live and previous index generations
+    
+    Returns:
+        Collection names, chunk counts and whether a rebuild is running
+    """
+    return vector_store.get_generations()
+
+@app.post("/api/index/rollback", dependencies=[Depends(require_admin)])
+async def rollback_index():
+    """
+    Put the previous index generation back into service
+    
+    Returns:
+        The generation state after the rollback
+    """
+    try:
+        return await run_in_threadpool(vector_store.rollback)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/api/index/hnsw", dependencies=[Depends(require_admin)])
+async def rebuild_hnsw():
+    """
+    Rebuild the HNSW index with the configured parameters
+    
+    The stored vectors are copied into a new generation built with
+    HNSW_M / HNSW_CONSTRUCTION_EF / HNSW_SEARCH_EF (and any
+    HNSW_COLLECTION_PARAMS override), validated and swapped in.
+    
+    Returns:
+        Rebuild report with the parameters that changed
+    """
+    try:
+        report = await run_in_threadpool(vector_store.rebuild_hnsw)
+    except Exception as e:
+        print(f" HNSW rebuild error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error rebuilding HNSW index: {str(e)}")
+    if not report["ok"]:
+        raise HTTPException(status_code=400,
+                            detail=f"HNSW rebuild rejected: {'; '.join(report['problems'])}")
+    return report
+
+@app.get("/api/documents")
+async def list_documents():
+    """
+    List indexed documents with their chunk counts
+    
+    Example:
+        GET /api/documents
+    """
+    try:
+        documents = await run_in_threadpool(document_manager.list_documents)
+        return {"documents": documents, "total": len(documents)}
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing documents: {str(e)}")
+
+@app.put("/api/documents/{filename}", dependencies=[Depends(require_admin)])
+async def upload_document(filename: str, request: Request):
+    """
+    Upload a PDF, or replace an existing one, and index just that file
+    
+    The body is streamed to disk, validated, then moved into place; a
+    replaced document's chunks are swapped without a gap in search results.
+    
+    Example:
+        curl -T week3.pdf -H "X-Admin-Token: $ADMIN_TOKEN" http://localhost:8000/api/documents/week3.pdf
+    """
+    try:
+        tmp_path = document_manager.create_upload(filename)
+    except DocumentError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    max_bytes = config.MAX_UPLOAD_MB * 1024 * 1024
+    try:
+        received = 0
+        buffer = bytearray()
+        with open(tmp_path, "wb") as f:
+            # Disk writes run in the threadpool, a megabyte at a time, so a
+            # large upload does not block the event loop
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > max_bytes:
+                    raise HTTPException(status_code=413,
+                                        detail=f"Upload exceeds {config.MAX_UPLOAD_MB} MB")
+                buffer += chunk
+                if len(buffer) >= UPLOAD_WRITE_BYTES:
+                    await run_in_threadpool(f.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(f.write, bytes(buffer))
+        
+        return await run_in_threadpool(document_manager.commit_upload, tmp_path, filename)
+    
+    except DocumentError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f" Upload error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error uploading document: {str(e)}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+@app.delete("/api/documents/{filename}", dependencies=[Depends(require_admin)])
+async def delete_document(filename: str):
+    """
+    Delete a PDF and remove its chunks from the index
+    
+    Example:
+        DELETE /api/documents/week3.pdf
+    """
+    try:
+        return await run_in_threadpool(document_manager.delete, filename)
+    
+    except DocumentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except DocumentError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f" Delete error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
+
+@app.get("/api/quarantine")
+async def list_quarantine():
+    """
+    List PDFs whose text could not be extracted within the time budgets
+    
+    Quarantined files are skipped by indexing, the watcher and uploads until
+    their content changes or they are released.
+    """
+    return {
+        "quarantined": quarantine.list(),
+        "extraction": pdf_extractor.get_stats()
+    }
+
+@app.delete("/api/quarantine/{file_hash}", dependencies=[Depends(require_admin)])
+async def release_quarantine(file_hash: str):
+    """
+    Release a file from quarantine so the next index run extracts it again
+    
+    Example:
+        DELETE /api/quarantine/3f2a...
+    """
+    if not quarantine.release(file_hash):
+        raise HTTPException(status_code=404, detail=f"Not quarantined: {file_hash}")
+    return {"status": "released", "file_hash": file_hash}
+
+@app.get("/api/watch/status")
+async def watch_status():
+    """
+    Get the state of the PDF folder watcher
+    
+    Returns:
+        Whether it is running, tracked/pending files and recent events
+    
+    Example:
+        GET /api/watch/status
+    """
+    return pdf_watcher.get_status()
+
+@app.get("/api/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """
+    List stored request profiles, newest first
+    
+    Example:
+        GET /api/admin/profiles
+    """
+    return {
+        "enabled": config.PROFILING_ENABLED,
+        "sample_rate": profiler.sample_rate,
+        "profiles": profiler.list_profiles()
+    }
+
+@app.get("/api/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)],
+         response_class=PlainTextResponse)
+async def get_profile(profile_id: int):
+    """
+    Get one profile as collapsed stacks (flamegraph.pl / speedscope format)
+    
+    Example:
+        curl http://localhost:8000/api/admin/profiles/3 | flamegraph.pl > query.svg
+    """
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.collapsed()
+
+@app.get("/api/snapshot/export")
+async def export_snapshot():
+    """
+    Download a snapshot of the indexed corpus (vectors, text, metadata)
+    
+    The snapshot is written to a temporary file first, so index writes are
+    held off only for as long as the export takes, not for the download.
+    
+    Returns:
+        Binary snapshot that another node can import without re-embedding
+    
+    Example:
+        curl -o corpus.edusnap http://localhost:8000/api/snapshot/export
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=".edusnap")
+    os.close(fd)
+    try:
+        await run_in_threadpool(export_store_snapshot, vector_store, tmp_path)
+    except Exception as e:
+        os.unlink(tmp_path)
+        print(f" Snapshot export error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error exporting snapshot: {str(e)}")
+    return FileResponse(tmp_path, media_type="application/octet-stream", filename="corpus.edusnap",
+                        background=BackgroundTask(os.unlink, tmp_path))
+
+@app.post("/api/snapshot/import", dependencies=[Depends(require_admin)])
+async def import_snapshot_endpoint(request: Request):
+    """
+    Replace the index with an uploaded snapshot
+    
+    The request body is streamed to a temporary file and verified in full
+    before the current collection is replaced.
+    
+    Example:
+        curl --data-binary @corpus.edusnap -H "X-Admin-Token: $ADMIN_TOKEN" \
+            http://localhost:8000/api/snapshot/import
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=".edusnap")
+    max_bytes = config.SNAPSHOT_MAX_MB * 1024 * 1024
+    try:
+        received = 0
+        buffer = bytearray()
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > max_bytes:
+                    raise HTTPException(status_code=413,
+                                        detail=f"Snapshot exceeds {config.SNAPSHOT_MAX_MB} MB")
+                buffer += chunk
+                if len(buffer) >= UPLOAD_WRITE_BYTES:
+                    await run_in_threadpool(f.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(f.write, bytes(buffer))
+        
+        info = await run_in_threadpool(import_snapshot, vector_store, tmp_path)
+        return {
+            "status": "success",
+            "message": "Snapshot imported successfully",
+            "embedding_model": info["embedding_model"],
+            "documents_indexed": info["imported"]
+        }
+    
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid snapshot: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f" Snapshot import error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error importing snapshot: {str(e)}")
+    finally:
+        os.unlink(tmp_path)
+
 @app.get("/api/conversation/history")
-async def get_conversation_history() -> ConversationHistoryResponse:
+async def get_conversation_history(session_id: str = DEFAULT_SESSION, after: Optional[int] = None,
+                                   limit: int = 100) -> ConversationHistoryResponse:
     """
-    Get the current conversation history
+    Get the conversation history, one page at a time
+    
+    Args:
+        session_id: Conversation to read
+        after: Cursor from a previous call; only newer messages are returned
+        limit: Page size (1-500)
     
     Returns:
-        List of all messages in current conversation
+        A page of messages and the cursor for the next call
     
     Example:
-        GET /api/conversation/history
+        GET /api/conversation/history?session_id=abc&after=12&limit=50
     """
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
+    
     try:
-        history = rag_chain.get_conversation_history()
-        summary = rag_chain.get_memory_summary()
+        conversation = rag_chain.conversations.peek(session_id)
+        page, next_cursor, has_more = conversation.page(after, limit)
         
         return ConversationHistoryResponse(
-            total_turns=summary["total_turns"],
-            messages=[
-                ConversationMessage(role=msg["role"], content=msg["content"])
-                for msg in history
-            ]
+            session_id=session_id,
+            total_turns=conversation.turns,
+            messages=[ConversationMessage(**msg.to_dict()) for msg in page],
+            next_cursor=next_cursor,
+            has_more=has_more
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving history: {str(e)}")
 
 @app.post("/api/conversation/clear")
-async def clear_conversation():
+async def clear_conversation(session_id: str = DEFAULT_SESSION):
     """
     Clear the conversation memory (start fresh)
     
@@ -178,18 +605,21 @@ async def clear_conversation():
         POST /api/conversation/clear
     """
     try:
-        rag_chain.clear_memory()
+        async with rag_chain.conversations.admit(session_id):
+            await run_in_threadpool(rag_chain.clear_memory, session_id)
         return {
             "status": "success",
             "message": "Conversation memory cleared",
             "note": "Next question will start a new conversation"
         }
     
+    except SessionBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing memory: {str(e)}")
 
 @app.get("/api/conversation/info")
-async def get_conversation_info():
+async def get_conversation_info(session_id: str = DEFAULT_SESSION):
     """
     Get conversation statistics
     
@@ -200,7 +630,7 @@ async def get_conversation_info():
         GET /api/conversation/info
     """
     try:
-        summary = rag_chain.get_memory_summary()
+        summary = rag_chain.get_memory_summary(session_id)
         return {
             "total_turns": summary["total_turns"],
             "total_messages": summary["total_messages"],
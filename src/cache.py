@@ -0,0 +1,85 @@
+"""
+In-process caches shared by the retrieval pipeline
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Cache key for a query: case, spacing and trailing punctuation ignored
+    
+    The embedding model is uncased, and a question typed ahead usually
+    lacks the "?" it is finally sent with.
+    """
+    return _WHITESPACE.sub(" ", text).strip().rstrip("?.!؟ ").casefold()
+
+
+def embedding_key(text: str) -> str:
+    """
+    Cache key for a query embedding: only spacing ignored
+    
+    Punctuation and case reach the model and change the vector, so the
+    embedding of "What is paging?" is not reused for "what is paging".
+    """
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit/miss counters"""
+    
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialize cache
+        
+        Args:
+            max_entries: Entries kept before the least recently used is dropped
+        """
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value or None"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the oldest entry if full"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get_stats(self) -> dict:
+        """Get cache usage statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
@@ -1,6 +1,7 @@
 """
 Configuration management for EduMate RAG
 """
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -20,6 +21,131 @@ class Config:
     
     # PDF Configuration
     PDF_FOLDER_PATH = os.getenv("PDF_FOLDER_PATH", "./assets/course_pdfs")
+    MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", 50))
+    SNAPSHOT_MAX_MB = int(os.getenv("SNAPSHOT_MAX_MB", 2048))  # Size limit for snapshot imports
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))  # Characters per chunk
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))  # Overlap between chunks
+    
+    # Text extraction budgets; files that exceed them are quarantined
+    EXTRACT_ISOLATION = os.getenv("EXTRACT_ISOLATION", "True").lower() == "true"  # Worker process per file
+    EXTRACT_FILE_TIMEOUT_S = float(os.getenv("EXTRACT_FILE_TIMEOUT_S", 120))
+    EXTRACT_PAGE_TIMEOUT_S = float(os.getenv("EXTRACT_PAGE_TIMEOUT_S", 10))
+    EXTRACT_MIN_TEXT_CHARS = int(os.getenv("EXTRACT_MIN_TEXT_CHARS", 1))
+    EXTRACT_FALLBACKS = [name.strip() for name in os.getenv("EXTRACT_FALLBACKS", "pymupdf,pdftotext").split(",")
+                         if name.strip()]
+    QUARANTINE_PATH = os.getenv("QUARANTINE_PATH", "./assets/quarantine.json")
+    QUARANTINE_ERROR_TTL_S = float(os.getenv("QUARANTINE_ERROR_TTL_S", 3600))  # Crashed workers are retried after this
+    
+    # Staged ingestion: extract -> chunk -> embed -> write
+    INGEST_EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", 2))
+    INGEST_CHUNK_WORKERS = int(os.getenv("INGEST_CHUNK_WORKERS", 1))
+    INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", 1))
+    INGEST_WRITE_WORKERS = int(os.getenv("INGEST_WRITE_WORKERS", 1))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 4))  # Items waiting per stage
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 64))  # Chunks per embed/write batch
+    
+    # Near-duplicate chunks are collapsed into one stored chunk at index time
+    DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "True").lower() == "true"
+    DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.85))  # Estimated Jaccard similarity
+    DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", 128))
+    DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", 16))
+    DEDUP_SHINGLE_WORDS = int(os.getenv("DEDUP_SHINGLE_WORDS", 3))
+    
+    # Full re-indexes are built in a shadow collection and swapped in once
+    # validated; the shadow must hold at least this fraction of the live chunks
+    SHADOW_MIN_COUNT_RATIO = float(os.getenv("SHADOW_MIN_COUNT_RATIO", 0.5))
+    SHADOW_VALIDATION_QUERIES = int(os.getenv("SHADOW_VALIDATION_QUERIES", 5))
+    
+    # HNSW parameters of the Chroma collection (Chroma's defaults: 16, 100, 10).
+    # They are fixed when a collection is created, so a change takes effect on
+    # the next rebuild (POST /api/index/hnsw or a full re-index)
+    HNSW_M = int(os.getenv("HNSW_M", 16))
+    HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", 100))
+    HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", 10))
+    # Per-collection overrides, e.g. {"course_materials": {"M": 32, "search_ef": 64}}
+    HNSW_COLLECTION_PARAMS = json.loads(os.getenv("HNSW_COLLECTION_PARAMS") or "{}")
+    
+    # Vector search backend: "chroma" (HNSW), "quantized" (int8 + float rescoring)
+    # or "sharded" (quantized shards searched in parallel processes)
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+    QUANTIZED_INDEX_PATH = os.getenv("QUANTIZED_INDEX_PATH", "./assets/quantized_index")
+    QUANTIZED_RESCORE_FACTOR = int(os.getenv("QUANTIZED_RESCORE_FACTOR", 4))
+    SHARD_COUNT = int(os.getenv("SHARD_COUNT", os.cpu_count() or 1))
+    SHARD_INDEX_PATH = os.getenv("SHARD_INDEX_PATH", "./assets/shard_index")
+    
+    # Query embedding micro-batching and ONNX thread counts (0 = onnxruntime default)
+    EMBED_BATCHING = os.getenv("EMBED_BATCHING", "True").lower() == "true"
+    EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", 32))
+    EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", 2.0))
+    EMBED_TIMEOUT_S = float(os.getenv("EMBED_TIMEOUT_S", 30))  # Longest wait for a batched query embedding
+    EMBED_INTRA_OP_THREADS = int(os.getenv("EMBED_INTRA_OP_THREADS", 0))
+    EMBED_INTER_OP_THREADS = int(os.getenv("EMBED_INTER_OP_THREADS", 0))
+    
+    # Query caches and type-ahead prefetch (/api/prefetch)
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096))
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 2048))
+    PREFETCH_DEBOUNCE_MS = float(os.getenv("PREFETCH_DEBOUNCE_MS", 250))
+    PREFETCH_MIN_CHARS = int(os.getenv("PREFETCH_MIN_CHARS", 12))
+    PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", 2))
+    
+    # Answers to first-turn questions, reused until the index changes (0 disables)
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 1024))
+    
+    # Query log of /api/query traffic, replayed at startup to warm the caches
+    # before /ready reports the service ready
+    QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "True").lower() == "true"
+    QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "./assets/query_log/queries.jsonl")
+    QUERY_LOG_MAX_KB = int(os.getenv("QUERY_LOG_MAX_KB", 1024))
+    QUERY_LOG_BACKUPS = int(os.getenv("QUERY_LOG_BACKUPS", 3))
+    WARM_ON_STARTUP = os.getenv("WARM_ON_STARTUP", "True").lower() == "true"
+    WARM_BUDGET_S = float(os.getenv("WARM_BUDGET_S", 30))
+    WARM_MAX_QUERIES = int(os.getenv("WARM_MAX_QUERIES", 50))
+    WARM_LOOKBACK_HOURS = float(os.getenv("WARM_LOOKBACK_HOURS", 168))
+    WARM_MIN_SESSIONS = int(os.getenv("WARM_MIN_SESSIONS", 2))
+    WARM_ANSWERS = os.getenv("WARM_ANSWERS", "False").lower() == "true"  # Each replayed question is one LLM call
+    
+    # Extracted page text cache (0 MB disables it)
+    PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", "./assets/page_cache")
+    PAGE_CACHE_MAX_MB = int(os.getenv("PAGE_CACHE_MAX_MB", 256))
+    
+    # Watch the PDF folder and ingest changes in the background
+    WATCH_PDF_FOLDER = os.getenv("WATCH_PDF_FOLDER", "False").lower() == "true"
+    WATCH_POLL_SECONDS = float(os.getenv("WATCH_POLL_SECONDS", 1.0))
+    WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", 2.0))
+    
+    # Retrieval Configuration (adaptive context selection)
+    RETRIEVAL_MAX_RESULTS = int(os.getenv("RETRIEVAL_MAX_RESULTS", 8))
+    RETRIEVAL_MAX_DISTANCE = float(os.getenv("RETRIEVAL_MAX_DISTANCE", 0.65))
+    RETRIEVAL_ELBOW_GAP = float(os.getenv("RETRIEVAL_ELBOW_GAP", 0.08))
+    MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", 1500))
+    
+    # Extractive context compression (keep only the best sentences)
+    CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "False").lower() == "true"
+    COMPRESSED_CONTEXT_TOKENS = int(os.getenv("COMPRESSED_CONTEXT_TOKENS", 600))
+    
+    # LLM latency deadline: slow calls are hedged, and a request that runs out
+    # of time is answered with excerpts from the retrieved chunks (0 = no deadline)
+    GENERATION_DEADLINE_MS = float(os.getenv("GENERATION_DEADLINE_MS", 8000))
+    GENERATION_HEDGE_PERCENTILE = float(os.getenv("GENERATION_HEDGE_PERCENTILE", 95))
+    GENERATION_HEDGE_MIN_MS = float(os.getenv("GENERATION_HEDGE_MIN_MS", 2000))
+    GENERATION_MAX_HEDGES = int(os.getenv("GENERATION_MAX_HEDGES", 1))
+    GENERATION_LATENCY_WINDOW = int(os.getenv("GENERATION_LATENCY_WINDOW", 200))
+    GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", 32))
+    DEGRADED_ANSWER_TOKENS = int(os.getenv("DEGRADED_ANSWER_TOKENS", 250))
+    
+    # Conversation sessions kept in memory
+    MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", 10000))
+    # Requests of one session run one at a time; this many may wait behind
+    # the running one (more get 429), each for at most the timeout (0 = no limit)
+    SESSION_QUEUE_SIZE = int(os.getenv("SESSION_QUEUE_SIZE", 4))
+    SESSION_QUEUE_TIMEOUT_S = float(os.getenv("SESSION_QUEUE_TIMEOUT_S", 60))
+    
+    # Opt-in request profiling (collapsed stacks at /api/admin/profiles)
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.0))
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+    PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", 50))
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
     
     # API Configuration
     API_HOST = os.getenv("API_HOST", "localhost")
@@ -0,0 +1,134 @@
+"""
+Context Compressor - Keep only the sentences that answer the question
+"""
+import re
+import time
+from typing import Callable, List, Tuple
+import numpy as np
+from src.cache import LRUCache
+from src.context_selection import estimate_tokens
+from src.records import Hit
+
+# Sentence ends (including the Arabic question mark) and line breaks
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?؟])\s+|\n+")
+
+
+def split_sentences(text: str, min_chars: int = 25) -> List[str]:
+    """
+    Split chunk text into sentences
+    
+    Fragments shorter than min_chars (headings, bullet stubs) are joined to
+    the following sentence so they are scored with their context.
+    
+    Args:
+        text: Chunk text
+        min_chars: Minimum sentence length
+    
+    Returns:
+        Sentences in original order
+    """
+    sentences = []
+    pending = ""
+    for piece in SENTENCE_BOUNDARY.split(text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        pending = f"{pending} {piece}" if pending else piece
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+class ContextCompressor:
+    """Extractive compression of retrieved chunks against the query embedding"""
+    
+    def __init__(self, embed_texts: Callable[[List[str]], List[List[float]]],
+                 cache_size: int = 20000):
+        """
+        Initialize compressor
+        
+        Args:
+            embed_texts: Embeds a batch of texts with the retrieval model
+            cache_size: Sentence embeddings kept between queries
+        """
+        self.embed_texts = embed_texts
+        self.sentence_cache = LRUCache(cache_size)
+    
+    def _embed_sentences(self, sentences: List[str]) -> np.ndarray:
+        """Embed sentences, reusing cached vectors for repeated chunks"""
+        vectors = [self.sentence_cache.get(s) for s in sentences]
+        missing = sorted({s for s, v in zip(sentences, vectors) if v is None})
+        if missing:
+            fresh = dict(zip(missing, self.embed_texts(missing)))
+            for sentence, vector in fresh.items():
+                self.sentence_cache.put(sentence, vector)
+            vectors = [fresh[s] if v is None else v for s, v in zip(sentences, vectors)]
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+    
+    def compress(self, query_embedding: List[float], docs: List[Hit],
+                 max_tokens: int) -> Tuple[List[Hit], dict]:
+        """
+        Reduce retrieved chunks to their most relevant sentences
+        
+        Sentences from all chunks are ranked by cosine similarity to the
+        query and added best-first until the token budget is spent. Each
+        chunk keeps its metadata (and so its source tag); kept sentences
+        stay in their original order, and chunks left with no sentences
+        are dropped.
+        
+        Args:
+            query_embedding: Embedding of the student's question
+            docs: Selected search results
+            max_tokens: Token budget for the compressed context
+        
+        Returns:
+            Compressed documents and a report with ratio and time cost
+        """
+        start = time.perf_counter()
+        original_tokens = sum(estimate_tokens(doc.content) for doc in docs)
+        
+        owners = []
+        sentences = []
+        for doc_idx, doc in enumerate(docs):
+            for sentence in split_sentences(doc.content):
+                owners.append(doc_idx)
+                sentences.append(sentence)
+        
+        kept = set()
+        tokens = 0
+        if sentences:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query /= max(np.linalg.norm(query), 1e-12)
+            scores = self._embed_sentences(sentences) @ query
+            for idx in np.argsort(-scores):
+                sentence_tokens = estimate_tokens(sentences[idx])
+                if kept and tokens + sentence_tokens > max_tokens:
+                    continue
+                kept.add(int(idx))
+                tokens += sentence_tokens
+        
+        compressed = []
+        for doc_idx, doc in enumerate(docs):
+            parts = [s for i, (owner, s) in enumerate(zip(owners, sentences))
+                     if owner == doc_idx and i in kept]
+            if parts:
+                compressed.append(doc.with_content(" ".join(parts)))
+        
+        report = {
+            "original_tokens": original_tokens,
+            "compressed_tokens": tokens,
+            "compression_ratio": round(tokens / original_tokens, 3) if original_tokens else 1.0,
+            "sentences_total": len(sentences),
+            "sentences_kept": len(kept),
+            "chunks_kept": len(compressed),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+        return compressed, report
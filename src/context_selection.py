@@ -0,0 +1,69 @@
+"""
+Context Selection - Choose how many retrieved chunks go into the prompt
+"""
+from typing import List, Tuple
+from src.records import Hit
+
+# Rough size of one token for the English/Arabic text in course PDFs
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a piece of text
+    
+    Args:
+        text: Text to measure
+    
+    Returns:
+        Approximate token count
+    """
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def select_context(docs: List[Hit], max_distance: float, min_gap: float,
+                   max_tokens: int) -> Tuple[List[Hit], dict]:
+    """
+    Pick the retrieved chunks worth sending to the LLM
+    
+    Three rules are applied in order to results sorted by cosine distance:
+    a relevance cutoff, an elbow cut at the first large jump in distance,
+    and a cap on the total context tokens. The best match that passes the
+    cutoff is always kept.
+    
+    Args:
+        docs: Search hits (content and distance are used)
+        max_distance: Results further away than this are dropped
+        min_gap: Distance jump between neighbours that marks the elbow
+        max_tokens: Budget for the combined chunk text
+    
+    Returns:
+        Selected documents and a report of why selection stopped
+    """
+    docs = sorted(docs, key=lambda doc: doc.distance)
+    selected = []
+    tokens = 0
+    stopped_by = "max_results"
+    
+    for doc in docs:
+        if doc.distance > max_distance:
+            stopped_by = "threshold"
+            break
+        if selected and doc.distance - selected[-1].distance >= min_gap:
+            stopped_by = "elbow"
+            break
+        doc_tokens = estimate_tokens(doc.content)
+        if selected and tokens + doc_tokens > max_tokens:
+            stopped_by = "token_budget"
+            break
+        selected.append(doc)
+        tokens += doc_tokens
+    
+    report = {
+        "candidates": len(docs),
+        "selected": len(selected),
+        "context_tokens": tokens,
+        "stopped_by": stopped_by,
+        "best_distance": docs[0].distance if docs else None
+    }
+    return selected, report
@@ -0,0 +1,320 @@
+"""
+Conversation Store - Structured per-session conversation history
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional, Tuple
+from src.config import config
+from src.records import Hit
+
+DEFAULT_SESSION = "default"
+
+
+class SessionBusy(Exception):
+    """A session already has as many requests queued as it is allowed"""
+
+
+class Message:
+    """One student or assistant message"""
+    
+    __slots__ = ("seq", "role", "content", "created_at")
+    
+    def __init__(self, seq: int, role: str, content: str):
+        self.seq = seq
+        self.role = role
+        self.content = content
+        self.created_at = time.time()
+    
+    def to_dict(self) -> dict:
+        return {
+            "id": self.seq,
+            "role": self.role,
+            "content": self.content,
+            "created_at": self.created_at
+        }
+
+
+class Conversation:
+    """Ordered messages of one session with constant-time counters"""
+    
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.messages: List[Message] = []
+        self.turns = 0
+        # Retrieval of the latest turn, reused by follow-up questions
+        self.last_context: Optional[List[Hit]] = None
+        self.topic_question = ""
+        # Sequence numbers keep increasing across clears so client cursors stay valid
+        self._next_seq = 1
+    
+    def _append(self, role: str, content: str):
+        self.messages.append(Message(self._next_seq, role, content))
+        self._next_seq += 1
+    
+    def add_turn(self, question: str, answer: str) -> int:
+        """
+        Record a question and its answer
+        
+        Returns:
+            The turn number just completed
+        """
+        # Both messages land in one step, so readers never see half a turn
+        self.messages.extend([Message(self._next_seq, "student", question),
+                              Message(self._next_seq + 1, "assistant", answer)])
+        self._next_seq += 2
+        self.turns += 1
+        return self.turns
+    
+    def render_history(self, max_messages: int) -> str:
+        """
+        Format the most recent messages for the prompt
+        
+        Args:
+            max_messages: Number of trailing messages to include
+        
+        Returns:
+            "Student: ..." / "Assistant: ..." lines
+        """
+        recent = self.messages[-max_messages:] if max_messages > 0 else []
+        prefix = {"student": "Student", "assistant": "Assistant"}
+        return "\n".join(f"{prefix[m.role]}: {m.content}" for m in recent)
+    
+    def preview(self, max_chars: int = 500) -> str:
+        """Opening lines of the conversation, truncated to max_chars"""
+        text = ""
+        for message in self.messages:
+            text += f"{'Student' if message.role == 'student' else 'Assistant'}: {message.content}\n"
+            if len(text) > max_chars:
+                return text[:max_chars] + "..."
+        return text.rstrip("\n")
+    
+    def page(self, after: Optional[int] = None, limit: int = 100) -> Tuple[List[Message], Optional[int], bool]:
+        """
+        Get messages newer than a cursor
+        
+        Args:
+            after: ID of the last message the client already has
+            limit: Maximum messages to return
+        
+        Returns:
+            Messages, the cursor for the next call, and whether more remain
+        """
+        start = 0
+        if after is not None and self.messages:
+            # Sequence numbers are contiguous, so the offset follows directly
+            start = min(len(self.messages), max(0, after - self.messages[0].seq + 1))
+        page = self.messages[start:start + limit]
+        next_cursor = page[-1].seq if page else after
+        has_more = start + limit < len(self.messages)
+        return page, next_cursor, has_more
+    
+    def clear(self):
+        """Forget all messages"""
+        self.messages = []
+        self.turns = 0
+        self.last_context = None
+        self.topic_question = ""
+
+
+class _SessionQueue:
+    """Tickets of the requests running or waiting in one session"""
+    
+    __slots__ = ("next_ticket", "serving", "pending", "abandoned", "turn_changed")
+    
+    def __init__(self, lock: threading.Lock):
+        self.next_ticket = 0
+        self.serving = 0
+        self.pending = 0  # Running plus waiting
+        self.abandoned = set()  # Tickets whose request stopped waiting
+        # Only this session's waiters wake when its turn moves on
+        self.turn_changed = threading.Condition(lock)
+
+
+class _SessionGate:
+    """Requests of one session admitted on the event loop, running or waiting"""
+    
+    __slots__ = ("lock", "pending")
+    
+    def __init__(self):
+        self.lock = asyncio.Lock()  # Wakes waiters in arrival order
+        self.pending = 0
+
+
+class ConversationStore:
+    """All active conversations, keyed by session ID"""
+    
+    def __init__(self, max_sessions: int = None, queue_size: int = None,
+                 queue_timeout_s: float = None):
+        """
+        Initialize store
+        
+        Args:
+            max_sessions: Least recently used sessions beyond this are dropped
+            queue_size: Requests that may wait behind the running one in a
+                session before further requests are refused
+            queue_timeout_s: Longest a request waits for its turn (0 = no limit)
+        """
+        self.max_sessions = config.MAX_SESSIONS if max_sessions is None else max_sessions
+        self.queue_size = config.SESSION_QUEUE_SIZE if queue_size is None else queue_size
+        self.queue_timeout_s = config.SESSION_QUEUE_TIMEOUT_S if queue_timeout_s is None else queue_timeout_s
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Per-session FIFO of requests; entries exist only while a session has
+        # requests in flight, so idle sessions cost nothing
+        self._queues: Dict[str, _SessionQueue] = {}
+        self._queue_lock = threading.Lock()
+        # The same, for requests that wait on the event loop (see admit)
+        self._gates: Dict[str, _SessionGate] = {}
+        self.rejected = 0
+    
+    def _reject(self, message: str) -> SessionBusy:
+        with self._queue_lock:
+            self.rejected += 1
+        return SessionBusy(message)
+    
+    @asynccontextmanager
+    async def admit(self, session_id: str = DEFAULT_SESSION):
+        """
+        Wait for a session's turn on the event loop
+        
+        The API takes this before handing a request to the threadpool, so a
+        request queued behind a slow turn of its session waits as a
+        coroutine instead of holding one of the pool's worker threads. Only
+        one request per session then reaches turn(), which rarely waits.
+        Must be used from a single event loop.
+        
+        Args:
+            session_id: Session to wait for
+        
+        Raises:
+            SessionBusy: The session's queue is full, or the wait timed out
+        """
+        gate = self._gates.get(session_id)
+        if gate is None:
+            gate = self._gates[session_id] = _SessionGate()
+        if gate.pending > self.queue_size:
+            raise self._reject(f"session {session_id!r} already has {gate.pending} requests in flight")
+        gate.pending += 1
+        try:
+            try:
+                await asyncio.wait_for(gate.lock.acquire(), self.queue_timeout_s or None)
+            except asyncio.TimeoutError:
+                raise self._reject(f"session {session_id!r} was busy for {self.queue_timeout_s:g} s") from None
+            try:
+                yield
+            finally:
+                gate.lock.release()
+        finally:
+            gate.pending -= 1
+            if gate.pending == 0:
+                del self._gates[session_id]
+    
+    @contextmanager
+    def turn(self, session_id: str = DEFAULT_SESSION):
+        """
+        Hold a session exclusively, in arrival order
+        
+        Requests in the same session run one at a time, first come first
+        served, so each turn reads the history the previous turn wrote.
+        Requests in different sessions do not wait for each other. Requests
+        from the event loop should wait in admit() first.
+        
+        Args:
+            session_id: Session to hold
+        
+        Raises:
+            SessionBusy: The session's queue is full, or the wait timed out
+        """
+        with self._queue_lock:
+            queue = self._queues.get(session_id)
+            if queue is None:
+                queue = self._queues[session_id] = _SessionQueue(self._queue_lock)
+            if queue.pending > self.queue_size:
+                self.rejected += 1
+                raise SessionBusy(f"session {session_id!r} already has {queue.pending} requests in flight")
+            ticket = queue.next_ticket
+            queue.next_ticket += 1
+            queue.pending += 1
+            
+            deadline = time.monotonic() + self.queue_timeout_s if self.queue_timeout_s else None
+            while queue.serving != ticket:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.rejected += 1
+                    self._leave(session_id, queue, ticket)
+                    raise SessionBusy(f"session {session_id!r} was busy for {self.queue_timeout_s:g} s")
+                queue.turn_changed.wait(remaining)
+        try:
+            yield
+        finally:
+            with self._queue_lock:
+                self._leave(session_id, queue, ticket)
+    
+    def _leave(self, session_id: str, queue: _SessionQueue, ticket: int):
+        """Finish or give up a ticket (caller holds _queue_lock)"""
+        queue.pending -= 1
+        if ticket == queue.serving:
+            queue.serving += 1
+        else:
+            # Gave up waiting; skip the ticket when its turn comes instead
+            # of stalling everyone behind it
+            queue.abandoned.add(ticket)
+        while queue.serving in queue.abandoned:
+            queue.abandoned.discard(queue.serving)
+            queue.serving += 1
+        if queue.pending == 0:
+            del self._queues[session_id]
+        queue.turn_changed.notify_all()
+    
+    def get_queue_stats(self) -> dict:
+        """Sessions with requests in flight and refused requests"""
+        gates = list(self._gates.items())
+        with self._queue_lock:
+            return {
+                "busy_sessions": len(self._queues.keys() | {session_id for session_id, _ in gates}),
+                "queued": (sum(max(0, queue.pending - 1) for queue in self._queues.values())
+                           + sum(max(0, gate.pending - 1) for _, gate in gates)),
+                "queue_size": self.queue_size,
+                "rejected": self.rejected
+            }
+    
+    def get(self, session_id: str = DEFAULT_SESSION) -> Conversation:
+        """Get (or start) the conversation for a session"""
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+            if conversation is None:
+                conversation = Conversation(session_id)
+                self._sessions[session_id] = conversation
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return conversation
+    
+    def peek(self, session_id: str = DEFAULT_SESSION) -> Conversation:
+        """
+        Get a session's conversation for reading, without starting one
+        
+        Unknown sessions read as an empty conversation that is not stored,
+        so lookups for arbitrary session IDs cannot evict real sessions.
+        """
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+            if conversation is None:
+                return Conversation(session_id)
+            self._sessions.move_to_end(session_id)
+            return conversation
+    
+    def clear(self, session_id: str = DEFAULT_SESSION):
+        """Clear one session's messages"""
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+        if conversation is not None:
+            conversation.clear()
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
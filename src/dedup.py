@@ -0,0 +1,228 @@
+"""
+Near-Duplicate Detection - MinHash signatures with LSH banding for chunks
+"""
+import json
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from src.config import config
+from src.records import DUPLICATES_KEY, ChunkBatch
+
+_WORD = re.compile(r"\w+")
+
+
+def load_duplicates(metadata: dict) -> List[dict]:
+    """
+    Chunks collapsed into a stored chunk, from its metadata
+    
+    Returns:
+        One {"source", "file_path", "file_hash", "chunk_index"} per duplicate
+    """
+    raw = (metadata or {}).get(DUPLICATES_KEY)
+    return json.loads(raw) if raw else []
+
+
+def dump_duplicates(duplicates: List[dict]) -> str:
+    """Metadata value for a list of collapsed chunks ("" for none)"""
+    return json.dumps(duplicates, ensure_ascii=False) if duplicates else ""
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles
+    
+    Each of num_perm hash functions is a multiply-shift hash of the shingle's
+    CRC32; the fraction of equal signature positions estimates the Jaccard
+    similarity of two texts' shingle sets.
+    """
+    
+    def __init__(self, num_perm: int = None, shingle_words: int = None, seed: int = 1):
+        """
+        Initialize hasher
+        
+        Args:
+            num_perm: Signature length
+            shingle_words: Words per shingle
+            seed: Seed for the hash functions
+        """
+        self.num_perm = config.DEDUP_NUM_PERM if num_perm is None else num_perm
+        self.shingle_words = config.DEDUP_SHINGLE_WORDS if shingle_words is None else shingle_words
+        rng = np.random.default_rng(seed)
+        # Odd 64-bit multipliers; the top 32 bits of a*x + b are the hash
+        self._a = rng.integers(1, 2 ** 63, self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, self.num_perm, dtype=np.uint64)
+    
+    def shingles(self, text: str) -> np.ndarray:
+        """CRC32 of every word shingle of a text (case and punctuation ignored)"""
+        words = _WORD.findall(text.casefold())
+        k = self.shingle_words
+        if len(words) <= k:
+            grams = {" ".join(words)}
+        else:
+            grams = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams),
+                           dtype=np.uint64, count=len(grams))
+    
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text"""
+        hashes = self.shingles(text)
+        # Wrapping uint64 arithmetic is intended: multiply-shift hashing
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(hashes, self._a) + self._b) >> np.uint64(32)
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    Streaming near-duplicate lookup
+    
+    Signatures are split into bands; chunks sharing any band are candidates,
+    and a candidate is a duplicate when its estimated Jaccard similarity
+    reaches the threshold. The first chunk seen stays canonical.
+    """
+    
+    def __init__(self, threshold: float = None, num_perm: int = None, bands: int = None,
+                 hasher: MinHasher = None):
+        """
+        Initialize index
+        
+        Args:
+            threshold: Estimated Jaccard similarity at which chunks are duplicates
+            num_perm: Signature length (must be divisible by bands)
+            bands: LSH bands; more bands find less similar candidates
+            hasher: MinHasher to use (built from num_perm if not given)
+        """
+        self.threshold = config.DEDUP_THRESHOLD if threshold is None else threshold
+        self.hasher = hasher or MinHasher(num_perm)
+        self.bands = config.DEDUP_BANDS if bands is None else bands
+        if self.hasher.num_perm % self.bands:
+            raise ValueError("DEDUP_NUM_PERM must be divisible by DEDUP_BANDS")
+        self.rows = self.hasher.num_perm // self.bands
+        
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        
+        self.checked = 0
+        self.duplicates = 0
+        self.chars_checked = 0
+        self.chars_dropped = 0
+    
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+    
+    def _find(self, signature: np.ndarray) -> Optional[str]:
+        best_key, best_score = None, self.threshold
+        seen = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            for key in self._buckets[band].get(band_key, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = float(np.mean(self._signatures[key] == signature))
+                if score >= best_score:
+                    best_key, best_score = key, score
+        return best_key
+    
+    def _add(self, key: str, signature: np.ndarray):
+        if key in self._signatures:
+            self._remove(key)
+        self._signatures[key] = signature
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, []).append(key)
+    
+    def _remove(self, key: str):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.remove(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+    
+    def check(self, key: str, text: str) -> Optional[str]:
+        """
+        Return the canonical chunk a text duplicates, or add it as canonical
+        
+        Args:
+            key: ID of the chunk
+            text: Chunk text
+        
+        Returns:
+            Key of the chunk this one duplicates, or None if it is new
+        """
+        signature = self.hasher.signature(text)
+        with self._lock:
+            self.checked += 1
+            self.chars_checked += len(text)
+            canonical = self._find(signature)
+            if canonical is None or canonical == key:
+                self._add(key, signature)
+                return None
+            self.duplicates += 1
+            self.chars_dropped += len(text)
+            return canonical
+    
+    def add(self, key: str, text: str):
+        """Register a stored chunk as canonical without checking it"""
+        signature = self.hasher.signature(text)
+        with self._lock:
+            self._add(key, signature)
+    
+    def remove(self, keys: List[str]):
+        """Forget chunks that were deleted from the index"""
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+    
+    def __len__(self) -> int:
+        return len(self._signatures)
+    
+    def get_stats(self) -> dict:
+        """Chunks checked and dropped, and the resulting size reduction"""
+        return {
+            "chunks_checked": self.checked,
+            "duplicates": self.duplicates,
+            "chunks_stored": self.checked - self.duplicates,
+            "chunk_reduction": round(self.duplicates / self.checked, 4) if self.checked else 0.0,
+            "text_reduction": round(self.chars_dropped / self.chars_checked, 4) if self.chars_checked else 0.0,
+            "threshold": self.threshold
+        }
+
+
+def duplicate_entry(chunk) -> dict:
+    """Record of a collapsed chunk, enough to store it again under its own ID"""
+    return {
+        "source": chunk.source,
+        "file_path": chunk.file_path,
+        "file_hash": chunk.file_hash,
+        "chunk_index": chunk.chunk_index
+    }
+
+
+def split_duplicates(index: NearDuplicateIndex,
+                     documents: ChunkBatch) -> Tuple[ChunkBatch, Dict[str, List[dict]]]:
+    """
+    Drop the chunks of a batch that duplicate an indexed (or earlier) chunk
+    
+    Args:
+        index: Near-duplicate index, updated with the new canonical chunks
+        documents: ChunkBatch to filter
+    
+    Returns:
+        The batch of chunks to store, and the collapsed chunks per canonical ID
+    """
+    kept, duplicates = [], {}
+    for chunk in documents:
+        canonical = index.check(chunk.chunk_id, chunk.content)
+        if canonical is None:
+            kept.append(chunk)
+        else:
+            duplicates.setdefault(canonical, []).append(duplicate_entry(chunk))
+    if len(kept) == len(documents):
+        return documents, duplicates
+    return ChunkBatch.from_chunks(kept), duplicates
@@ -0,0 +1,171 @@
+"""
+Document Manager - Upload, replace and delete individual course PDFs
+"""
+import os
+import tempfile
+import threading
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, List
+from src.config import config
+
+PDF_MAGIC = b"%PDF-"
+
+
+class DocumentError(ValueError):
+    """Raised when an uploaded document cannot be accepted"""
+
+
+class DocumentNotFoundError(DocumentError):
+    """Raised when a document is neither on disk nor in the index"""
+
+
+class DocumentManager:
+    """Keep single PDFs on disk and in the index in step"""
+    
+    def __init__(self, store, loader, folder: str = None, watcher=None):
+        """
+        Initialize document manager
+        
+        Args:
+            store: VectorStore the chunks are written to
+            loader: PDFLoader used to validate uploads
+            folder: Folder PDFs are stored in (defaults to PDF_FOLDER_PATH)
+            watcher: Optional PDFWatcher kept away from files being updated
+        """
+        self.store = store
+        self.loader = loader
+        self.folder = Path(folder or config.PDF_FOLDER_PATH)
+        self.watcher = watcher
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+    
+    def resolve(self, filename: str) -> Path:
+        """
+        Map a client supplied filename to its path in the PDF folder
+        
+        Args:
+            filename: Bare file name such as "week1.pdf"
+        
+        Returns:
+            Path inside the PDF folder
+        """
+        if not filename or Path(filename).name != filename or filename.startswith("."):
+            raise DocumentError(f"Invalid filename: {filename!r}")
+        if not filename.endswith(".pdf"):
+            raise DocumentError("Only .pdf files are supported")
+        return self.folder / filename
+    
+    def create_upload(self, filename: str) -> str:
+        """
+        Create a temporary file next to the target for streaming an upload
+        
+        The file lives in the PDF folder (so the final rename is atomic) but
+        does not end in .pdf, so the loader and watcher ignore it.
+        
+        Args:
+            filename: Name the upload will be stored under
+        
+        Returns:
+            Path of the temporary file
+        """
+        self.resolve(filename)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=f".{filename}.", suffix=".part")
+        os.close(fd)
+        return tmp_path
+    
+    def _lock(self, filename: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(filename, threading.Lock())
+    
+    def _hold(self, path: Path):
+        if self.watcher is not None:
+            return self.watcher.hold(path)
+        return nullcontext()
+    
+    def commit_upload(self, tmp_path: str, filename: str) -> dict:
+        """
+        Validate an uploaded file, move it into place and index it
+        
+        The upload is parsed before the existing file is touched, so a
+        broken upload leaves the current version on disk and in the index.
+        
+        Args:
+            tmp_path: Temporary file from create_upload
+            filename: Name to store the document under
+        
+        Returns:
+            Whether the document was created or replaced, and its chunk count
+        """
+        target = self.resolve(filename)
+        with open(tmp_path, "rb") as f:
+            if f.read(len(PDF_MAGIC)) != PDF_MAGIC:
+                raise DocumentError("Uploaded file is not a PDF")
+        
+        try:
+            # Also fills the page cache, so indexing below does not re-parse
+            pages = self.loader.extract_pages(Path(tmp_path))
+        except Exception as e:
+            raise DocumentError(f"Could not read PDF: {e}")
+        if not any(page.strip() for page in pages):
+            raise DocumentError("PDF contains no extractable text")
+        
+        with self._lock(filename), self._hold(target):
+            existed = target.exists()
+            os.replace(tmp_path, target)
+            chunks = self.store.index_file(target)
+        
+        return {
+            "filename": filename,
+            "source": target.stem,
+            "status": "replaced" if existed else "created",
+            "chunks": chunks
+        }
+    
+    def delete(self, filename: str) -> dict:
+        """
+        Delete a document from disk and remove its chunks from the index
+        
+        Args:
+            filename: Name of the stored document
+        
+        Returns:
+            Number of chunks removed
+        """
+        target = self.resolve(filename)
+        with self._lock(filename), self._hold(target):
+            existed = target.exists()
+            if existed:
+                target.unlink()
+            chunks = self.store.remove_file(target)
+        
+        if not existed and not chunks:
+            raise DocumentNotFoundError(f"Document not found: {filename}")
+        return {"filename": filename, "source": target.stem, "chunks_removed": chunks}
+    
+    def list_documents(self) -> List[dict]:
+        """
+        List indexed documents with their chunk counts
+        
+        Returns:
+            One entry per document, including PDFs on disk not yet indexed
+        """
+        documents = self.store.list_documents()
+        indexed_paths = {doc["file_path"] for doc in documents}
+        for doc in documents:
+            doc["filename"] = Path(doc["file_path"]).name if doc["file_path"] else f"{doc['source']}.pdf"
+            doc["on_disk"] = bool(doc["file_path"]) and Path(doc["file_path"]).exists()
+        
+        for pdf_path in sorted(self.folder.glob("*.pdf")):
+            if str(pdf_path) not in indexed_paths:
+                documents.append({
+                    "source": pdf_path.stem,
+                    "file_path": str(pdf_path),
+                    "file_hash": "",
+                    "chunks": 0,
+                    "duplicate_chunks": 0,
+                    "filename": pdf_path.name,
+                    "on_disk": True
+                })
+        return documents
@@ -0,0 +1,171 @@
+"""
+Embedding Service - Micro-batching of concurrent query embeddings
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+from src.config import config
+from src.profiler import profiler
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+class EmbeddingBatcher:
+    """
+    Collect concurrent embedding requests and run them as one forward pass
+    
+    A single background thread owns the model. It takes the first queued
+    text, then gathers whatever else is already waiting (up to max_batch).
+    It waits up to max_wait_ms for more only while other callers are still
+    handing in texts, so a lone request is never delayed by the window.
+    A forward pass is sampled into the profiles of the requests it serves.
+    """
+    
+    def __init__(self, embed_fn: EmbedFn, max_batch: int = None, max_wait_ms: float = None,
+                 timeout_s: float = None):
+        """
+        Initialize batcher
+        
+        Args:
+            embed_fn: Embeds a list of texts in one call
+            max_batch: Largest number of texts per forward pass
+            max_wait_ms: Longest time the first text in a batch waits for company
+            timeout_s: Longest a caller waits for its embedding (0 = no limit)
+        """
+        self.embed_fn = embed_fn
+        self.max_batch = max(1, config.EMBED_MAX_BATCH if max_batch is None else max_batch)
+        self.max_wait = (config.EMBED_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.timeout_s = config.EMBED_TIMEOUT_S if timeout_s is None else timeout_s
+        
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiting = 0  # Callers that have entered embed() and not yet been batched
+        self._thread: Optional[threading.Thread] = None
+        
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.forward_seconds = 0.0
+    
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+    
+    def embed(self, text: str) -> List[float]:
+        """
+        Embed one text, sharing a forward pass with concurrent callers
+        
+        Args:
+            text: Text to embed
+        
+        Returns:
+            Its embedding
+        
+        Raises:
+            concurrent.futures.TimeoutError: No embedding within timeout_s
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        with self._lock:
+            self._waiting += 1
+        self._queue.put((text, future, profiler.current()))
+        return future.result(timeout=self.timeout_s or None)
+    
+    def _collect(self) -> list:
+        """Block for the first request, then gather a batch around it"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            with self._lock:
+                others_arriving = self._waiting > len(batch)
+            remaining = deadline - time.monotonic()
+            if not others_arriving or remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        with self._lock:
+            self._waiting -= len(batch)
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _, _ in batch]
+            start = time.perf_counter()
+            try:
+                with profiler.section("embedding_batch", [profile for _, _, profile in batch]):
+                    embeddings = self.embed_fn(texts)
+                if len(embeddings) != len(batch):
+                    # Rows cannot be matched to callers, so none are trusted
+                    raise RuntimeError(f"embedder returned {len(embeddings)} vectors for {len(batch)} texts")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self.forward_seconds += time.perf_counter() - start
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            for (_, future, _), embedding in zip(batch, embeddings):
+                future.set_result(list(embedding))
+    
+    def get_stats(self) -> dict:
+        """Get batching statistics"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "avg_forward_ms": round(self.forward_seconds * 1000 / self.batches, 2) if self.batches else 0.0,
+            "config": {"max_batch": self.max_batch, "max_wait_ms": self.max_wait * 1000}
+        }
+
+
+class _OrtWithOptions:
+    """The onnxruntime module, with sessions created from fixed SessionOptions"""
+    
+    def __init__(self, ort, options):
+        self._ort = ort
+        self._options = options
+    
+    def __getattr__(self, name):
+        return getattr(self._ort, name)
+    
+    def InferenceSession(self, path, **kwargs):
+        kwargs.setdefault("sess_options", self._options)
+        return self._ort.InferenceSession(path, **kwargs)
+
+
+class ThreadedONNXEmbedding(ONNXMiniLM_L6_V2):
+    """Chroma's default ONNX embedder, with its session built with fixed thread counts"""
+    
+    def __init__(self, intra_op_threads: int = 0, inter_op_threads: int = 0, preferred_providers=None):
+        """
+        Initialize embedder (the session is still created lazily on first use)
+        
+        Args:
+            intra_op_threads: Threads used inside one operator (0 = runtime default)
+            inter_op_threads: Threads used to run independent operators
+            preferred_providers: ONNX execution providers, as for ONNXMiniLM_L6_V2
+        """
+        super().__init__(preferred_providers)
+        options = self.ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        self.ort = _OrtWithOptions(self.ort, options)
+
@@ -0,0 +1,332 @@
+"""
+PDF Text Extraction - Time-boxed pypdf in an isolated worker, with fallback engines
+"""
+import importlib.util
+import multiprocessing
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+from pypdf import PdfReader
+from src.config import config
+
+
+class ExtractionError(ValueError):
+    """No engine produced usable text for a PDF within its time budget"""
+    
+    def __init__(self, message: str, reason: str, attempts: List[str] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.attempts = attempts or []
+
+
+class _PageTimeout(Exception):
+    pass
+
+
+def _raise_page_timeout(signum, frame):
+    raise _PageTimeout()
+
+
+def pypdf_pages(pdf_path: str, page_timeout: float = 0) -> Tuple[List[str], List[int]]:
+    """
+    Extract the text of every page with pypdf
+    
+    Args:
+        pdf_path: PDF to read
+        page_timeout: Seconds allowed per page (0 = unlimited). Enforced
+            with SIGALRM, so only in a process's main thread
+    
+    Returns:
+        Text of each page ("" for pages over budget) and the numbers of the
+        pages that timed out
+    """
+    use_alarm = page_timeout > 0 and threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_page_timeout)
+    try:
+        pages, timed_out = [], []
+        for number, page in enumerate(PdfReader(pdf_path).pages):
+            try:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, page_timeout)
+                text = page.extract_text() or ""
+            except _PageTimeout:
+                text = ""
+                timed_out.append(number)
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            pages.append(text)
+        return pages, timed_out
+    finally:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, previous)
+
+
+def pymupdf_pages(pdf_path: str) -> List[str]:
+    """Extract page text with PyMuPDF (optional dependency)"""
+    import fitz
+    with fitz.open(pdf_path) as document:
+        return [page.get_text() for page in document]
+
+
+def pdftotext_pages(pdf_path: str) -> List[str]:
+    """Extract page text with poppler's pdftotext command"""
+    output = subprocess.run(
+        ["pdftotext", "-enc", "UTF-8", pdf_path, "-"],
+        capture_output=True, check=True, timeout=config.EXTRACT_FILE_TIMEOUT_S or None
+    ).stdout.decode("utf-8", errors="replace")
+    pages = output.split("\f")
+    return pages[:-1] if pages and not pages[-1].strip() else pages
+
+
+# Fallback engines: name -> (is it installed?, extract function)
+FALLBACK_EXTRACTORS: Dict[str, Tuple[Callable[[], bool], Callable[[str], List[str]]]] = {
+    "pymupdf": (lambda: importlib.util.find_spec("fitz") is not None, pymupdf_pages),
+    "pdftotext": (lambda: shutil.which("pdftotext") is not None, pdftotext_pages),
+}
+
+
+def register_fallback(name: str, extract_fn: Callable[[str], List[str]],
+                      available_fn: Callable[[], bool] = lambda: True):
+    """
+    Add a fallback extraction engine
+    
+    Args:
+        name: Name used in EXTRACT_FALLBACKS
+        extract_fn: Returns the text of every page of a PDF path (a
+            module-level function, so isolated workers can import it)
+        available_fn: Whether the engine can run in this environment
+    """
+    FALLBACK_EXTRACTORS[name] = (available_fn, extract_fn)
+
+
+def _child_main(fn, args, conn):
+    try:
+        conn.send(("ok", fn(*args)))
+    except BaseException as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+_context_lock = threading.Lock()
+_context = None
+
+
+def _worker_context():
+    """
+    Multiprocessing context for extraction workers
+    
+    Forking this process would copy it mid-flight: the server, ONNX,
+    watcher and prefetch threads may hold locks the child then waits on
+    forever. Workers are forked instead from a forkserver, a separate
+    single-threaded process started once with this module preloaded, so a
+    worker still starts in milliseconds. Where forkserver is unavailable,
+    workers are spawned.
+    """
+    global _context
+    with _context_lock:
+        if _context is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                _context = multiprocessing.get_context("forkserver")
+                _context.set_forkserver_preload([__name__])
+            else:
+                _context = multiprocessing.get_context("spawn")
+        return _context
+
+
+def run_isolated(fn: Callable, args: tuple, timeout: float):
+    """
+    Run a function in a separate worker process and kill it if it overruns
+    
+    Args:
+        fn: Module-level function to run (it is imported by the worker)
+        args: Its arguments
+        timeout: Seconds before the child is killed (0 = unlimited)
+    
+    Returns:
+        The function's return value
+    
+    Raises:
+        TimeoutError: The child did not finish in time
+        RuntimeError: The function raised, or the child crashed
+    """
+    context = _worker_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child_main, args=(fn, args, sender), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout if timeout > 0 else None):
+            raise TimeoutError(f"over {timeout:g}s")
+        status, value = receiver.recv()
+    except EOFError:
+        process.join()
+        raise RuntimeError(f"worker exited with code {process.exitcode}")
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+    if status == "error":
+        raise RuntimeError(value)
+    return value
+
+
+class PDFExtractor:
+    """
+    Page text extraction with per-file and per-page time budgets
+    
+    pypdf runs in a worker process that is killed when the file budget runs
+    out; pages over the page budget are skipped inside the worker. When pypdf
+    fails, times out or finds no text, the fallback engines are tried in
+    order under the same file budget.
+    """
+    
+    def __init__(self, file_timeout: float = None, page_timeout: float = None,
+                 min_text_chars: int = None, fallbacks: List[str] = None, isolate: bool = None):
+        """
+        Initialize extractor
+        
+        Args:
+            file_timeout: Seconds allowed per engine per file (0 = unlimited)
+            page_timeout: Seconds allowed per page in pypdf (0 = unlimited)
+            min_text_chars: Less text than this counts as "no text"
+            fallbacks: Fallback engine names in the order they are tried
+            isolate: Run engines in worker processes (needed for the time budgets)
+        """
+        self.file_timeout = config.EXTRACT_FILE_TIMEOUT_S if file_timeout is None else file_timeout
+        self.page_timeout = config.EXTRACT_PAGE_TIMEOUT_S if page_timeout is None else page_timeout
+        self.min_text_chars = config.EXTRACT_MIN_TEXT_CHARS if min_text_chars is None else min_text_chars
+        self.fallbacks = config.EXTRACT_FALLBACKS if fallbacks is None else fallbacks
+        self.isolate = config.EXTRACT_ISOLATION if isolate is None else isolate
+        
+        self._lock = threading.Lock()
+        self.counts = {
+            "files": 0, "pypdf": 0, "fallback": 0, "partial": 0,
+            "timeouts": 0, "page_timeouts": 0, "failed": 0
+        }
+        self.partial_files = deque(maxlen=20)  # Recent files extracted with pages missing
+    
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counts[key] += amount
+    
+    def _run(self, fn: Callable, *args):
+        if self.isolate:
+            return run_isolated(fn, args, self.file_timeout)
+        return fn(*args)
+    
+    def _has_text(self, pages: List[str]) -> bool:
+        return sum(len(page.strip()) for page in pages) >= max(1, self.min_text_chars)
+    
+    def extract(self, pdf_path) -> List[str]:
+        """
+        Extract the text of every page of a PDF
+        
+        Args:
+            pdf_path: PDF to read
+        
+        Returns:
+            Text of each page in order
+        
+        Raises:
+            ExtractionError: No engine produced text within the budget
+        """
+        return self.extract_with_gaps(pdf_path)[0]
+    
+    def extract_with_gaps(self, pdf_path) -> Tuple[List[str], List[int]]:
+        """
+        Extract the text of every page of a PDF, reporting pages left out
+        
+        Args:
+            pdf_path: PDF to read
+        
+        Returns:
+            Text of each page in order ("" for pages over the page budget)
+            and the numbers of those pages (empty for a complete extraction)
+        
+        Raises:
+            ExtractionError: No engine produced text within the budget
+        """
+        pdf_path = str(pdf_path)
+        self._count("files")
+        attempts, partial, timed_out = [], None, []
+        
+        try:
+            pages, timed_out = self._run(pypdf_pages, pdf_path, self.page_timeout)
+            if timed_out:
+                self._count("page_timeouts", len(timed_out))
+                attempts.append(f"pypdf: {len(timed_out)} page(s) over {self.page_timeout:g}s")
+                reason = "page_timeout"
+                if self._has_text(pages):
+                    partial = pages
+            elif self._has_text(pages):
+                self._count("pypdf")
+                return pages, []
+            else:
+                attempts.append("pypdf: no text")
+                reason = "no_text"
+        except TimeoutError as e:
+            self._count("timeouts")
+            attempts.append(f"pypdf: {e}")
+            reason = "timeout"
+        except Exception as e:
+            attempts.append(f"pypdf: {e}")
+            reason = "error"
+        
+        for name in self.fallbacks:
+            available, extract_fn = FALLBACK_EXTRACTORS.get(name, (lambda: False, None))
+            if not available():
+                attempts.append(f"{name}: not available")
+                continue
+            start = time.perf_counter()
+            try:
+                pages = self._run(extract_fn, pdf_path)
+            except TimeoutError as e:
+                self._count("timeouts")
+                attempts.append(f"{name}: {e}")
+                continue
+            except Exception as e:
+                attempts.append(f"{name}: {e}")
+                continue
+            if self._has_text(pages):
+                self._count("fallback")
+                print(f" Extracted {len(pages)} pages with {name} in "
+                      f"{time.perf_counter() - start:.1f}s after: {'; '.join(attempts)}")
+                return pages, []
+            attempts.append(f"{name}: no text")
+        
+        if partial is not None:
+            # Some pages were over budget, but the rest is usable
+            self._count("partial")
+            with self._lock:
+                self.partial_files.append({"file": pdf_path, "missing_pages": timed_out, "time": time.time()})
+            return partial, timed_out
+        
+        self._count("failed")
+        raise ExtractionError(f"text extraction failed ({reason}): {'; '.join(attempts)}", reason, attempts)
+    
+    def get_stats(self) -> dict:
+        """Get extraction outcome counters and budgets"""
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            **counts,
+            "partial_files": list(self.partial_files),
+            "file_timeout_s": self.file_timeout,
+            "page_timeout_s": self.page_timeout,
+            "fallbacks": {
+                name: FALLBACK_EXTRACTORS.get(name, (lambda: False, None))[0]()
+                for name in self.fallbacks
+            }
+        }
+
+
+# Global instance
+pdf_extractor = PDFExtractor()
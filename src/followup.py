@@ -0,0 +1,80 @@
+"""
+Follow-up Detection - Recognise conversational follow-ups without an LLM call
+"""
+import re
+
+# Questions that only ask to continue the previous answer
+CONTINUATION = re.compile(
+    r"^(please\s+)?("
+    r"tell me more|more|more details?|go on|continue|elaborate|can you elaborate|"
+    r"explain (it |that |this )?(further|more|again)|explain|why|why is that|how so|"
+    r"what do you mean|give (me )?(an )?example|an example|examples|and|really|"
+    r"لماذا|وضح أكثر|اشرح أكثر|المزيد|مثال"
+    r")(\s+please)?[\s.!?؟]*$",
+    re.IGNORECASE
+)
+
+# Words that point back at something said earlier
+REFERENCE_WORDS = {
+    "it", "its", "these", "those", "they", "them", "their",
+    "above", "previous", "same", "former", "latter",
+}
+
+# Demonstratives also open new questions ("what is this course about?"),
+# so they only refer back when the question names nothing of its own
+DEMONSTRATIVES = {"this", "that", "هذا", "هذه", "ذلك", "تلك"}
+
+# Question words, auxiliaries and particles that do not name a topic
+STOPWORDS = {
+    "what", "which", "who", "whom", "whose", "why", "how", "when", "where",
+    "is", "are", "was", "were", "be", "been", "do", "does", "did", "can", "could",
+    "would", "should", "will", "shall", "may", "might", "has", "have", "had",
+    "a", "an", "the", "of", "in", "on", "for", "to", "from", "with", "about", "by",
+    "and", "or", "i", "me", "you", "we", "please", "mean", "means",
+    "ما", "ماذا", "هل", "كيف", "لماذا", "متى", "أين", "من", "في", "عن", "هو", "هي", "يعني",
+}
+
+MAX_REFERENCE_WORDS = 10
+
+
+def classify_followup(question: str, has_previous_context: bool) -> str:
+    """
+    Classify a question relative to the previous turn
+    
+    Args:
+        question: The new question
+        has_previous_context: Whether the session has a cached retrieval
+    
+    Returns:
+        "continuation" to reuse the previous chunks as they are,
+        "reference" to search with a query condensed from recent turns,
+        or "new" for an independent question
+    """
+    if not has_previous_context:
+        return "new"
+    text = question.strip()
+    if CONTINUATION.match(text):
+        return "continuation"
+    words = re.findall(r"\w+", text.lower())
+    if len(words) > MAX_REFERENCE_WORDS:
+        return "new"
+    if REFERENCE_WORDS.intersection(words):
+        return "reference"
+    if DEMONSTRATIVES.intersection(words) and \
+            not any(word not in STOPWORDS and word not in DEMONSTRATIVES for word in words):
+        return "reference"
+    return "new"
+
+
+def condense_query(question: str, topic_question: str) -> str:
+    """
+    Build a standalone retrieval query for a follow-up
+    
+    Args:
+        question: The follow-up ("what are its advantages?")
+        topic_question: The last independent question of the session
+    
+    Returns:
+        A query carrying the earlier topic plus the new ask
+    """
+    return f"{topic_question} {question}".strip()
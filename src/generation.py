@@ -0,0 +1,220 @@
+"""
+Deadline-Aware Generation - Hedged LLM calls with an extractive fallback answer
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Tuple
+from src.config import config
+from src.context_compressor import split_sentences
+from src.context_selection import estimate_tokens
+from src.profiler import profiler
+from src.records import Hit
+
+_WORD = re.compile(r"\w+")
+
+
+class DeadlineExceeded(TimeoutError):
+    """No LLM call finished within the request's deadline"""
+
+
+class HedgedGenerator:
+    """
+    Run LLM calls under a latency deadline, hedging slow ones
+    
+    When a call has not returned by the hedge delay (the chosen percentile of
+    recent call latencies), an identical call is sent and whichever finishes
+    first wins. A call that fails is retried the same way while hedges and
+    time remain. Calls still running at the deadline are abandoned: their
+    threads finish in the background and their latency is still recorded.
+    """
+    
+    def __init__(self, deadline_ms: float = None, hedge_percentile: float = None,
+                 hedge_min_ms: float = None, max_hedges: int = None,
+                 window: int = None, workers: int = None):
+        """
+        Initialize generator
+        
+        Args:
+            deadline_ms: Time allowed per request (0 = no deadline, no hedging)
+            hedge_percentile: Latency percentile after which a hedge is sent
+            hedge_min_ms: Lower bound on the hedge delay (and the delay used
+                until enough latencies have been observed)
+            max_hedges: Extra calls allowed per request
+            window: Recent call latencies the percentile is taken over
+            workers: Threads available for calls, including abandoned ones
+        """
+        self.deadline_ms = config.GENERATION_DEADLINE_MS if deadline_ms is None else deadline_ms
+        self.hedge_percentile = config.GENERATION_HEDGE_PERCENTILE if hedge_percentile is None else hedge_percentile
+        self.hedge_min_ms = config.GENERATION_HEDGE_MIN_MS if hedge_min_ms is None else hedge_min_ms
+        self.max_hedges = config.GENERATION_MAX_HEDGES if max_hedges is None else max_hedges
+        self.min_samples = 20
+        self.latencies = deque(maxlen=config.GENERATION_LATENCY_WINDOW if window is None else window)
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.GENERATION_WORKERS if workers is None else workers,
+            thread_name_prefix="generation"
+        )
+        
+        self._lock = threading.Lock()
+        self.counts = {
+            "requests": 0, "hedges": 0, "hedge_wins": 0, "retries": 0,
+            "degraded": 0, "errors": 0
+        }
+    
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counts[key] += amount
+    
+    def _percentile(self, pct: float) -> float:
+        with self._lock:
+            values = sorted(self.latencies)
+        if not values:
+            return 0.0
+        rank = max(1, int(round(pct / 100 * len(values))))
+        return values[min(rank, len(values)) - 1]
+    
+    def hedge_delay_ms(self) -> float:
+        """Time a call may take before a hedge is sent"""
+        with self._lock:
+            enough = len(self.latencies) >= self.min_samples
+        if not enough:
+            return self.hedge_min_ms
+        return max(self.hedge_min_ms, self._percentile(self.hedge_percentile))
+    
+    def _timed(self, generate_fn: Callable, kwargs: dict):
+        start = time.perf_counter()
+        with profiler.section("generation"):
+            result = generate_fn(**kwargs)
+        with self._lock:
+            self.latencies.append((time.perf_counter() - start) * 1000)
+        return result
+    
+    def _submit(self, generate_fn: Callable, kwargs: dict):
+        """Start a call on the executor, in the caller's context so a profiled request samples it"""
+        return self.executor.submit(contextvars.copy_context().run, self._timed, generate_fn, kwargs)
+    
+    def run(self, generate_fn: Callable, **kwargs) -> Tuple[object, dict]:
+        """
+        Call generate_fn(**kwargs) within the deadline
+        
+        Args:
+            generate_fn: The LLM call
+            kwargs: Its arguments
+        
+        Returns:
+            The first successful result and a report (attempts, winner, elapsed)
+        
+        Raises:
+            DeadlineExceeded: No call succeeded before the deadline
+            Exception: Every call failed (the first call's error)
+        """
+        self._count("requests")
+        if not self.deadline_ms:
+            return generate_fn(**kwargs), {"attempts": 1, "hedged": False, "elapsed_ms": None}
+        
+        start = time.monotonic()
+        deadline = start + self.deadline_ms / 1000
+        hedge_at = start + self.hedge_delay_ms() / 1000
+        pending = {self._submit(generate_fn, kwargs): 0}
+        attempts, first_error = 1, None
+        
+        while pending:
+            now = time.monotonic()
+            can_hedge = attempts <= self.max_hedges
+            wake_at = min(deadline, hedge_at) if can_hedge else deadline
+            done, _ = wait(list(pending), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                attempt = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    if can_hedge and time.monotonic() < deadline:
+                        # Retry a failed call right away instead of waiting for the hedge delay
+                        pending[self._submit(generate_fn, kwargs)] = attempts
+                        attempts += 1
+                        self._count("retries")
+                        can_hedge = attempts <= self.max_hedges
+                    continue
+                if attempt:
+                    self._count("hedge_wins")
+                return result, {
+                    "attempts": attempts,
+                    "hedged": attempts > 1,
+                    "winner": attempt,
+                    "elapsed_ms": round((time.monotonic() - start) * 1000, 1)
+                }
+            
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if pending and can_hedge and now >= hedge_at:
+                pending[self._submit(generate_fn, kwargs)] = attempts
+                attempts += 1
+                self._count("hedges")
+                hedge_at = now + self.hedge_delay_ms() / 1000
+        
+        if not pending and first_error is not None:
+            self._count("errors")
+            raise first_error
+        self._count("degraded")
+        raise DeadlineExceeded(f"no answer within {self.deadline_ms:g} ms ({attempts} call(s))")
+    
+    def get_stats(self) -> dict:
+        """Outcome counters, observed call latencies and the current hedge delay"""
+        with self._lock:
+            counts = dict(self.counts)
+            samples = len(self.latencies)
+        return {
+            **counts,
+            "deadline_ms": self.deadline_ms,
+            "hedge_delay_ms": round(self.hedge_delay_ms(), 1),
+            "latency_samples": samples,
+            "p50_ms": round(self._percentile(50), 1),
+            "p95_ms": round(self._percentile(95), 1),
+            "p99_ms": round(self._percentile(99), 1)
+        }
+
+
+def extractive_answer(question: str, docs: List[Hit], max_tokens: int = None) -> str:
+    """
+    Answer from the retrieved chunks alone, for when the LLM missed its deadline
+    
+    Sentences are ranked by how many of the question's words they contain
+    and quoted best-first, with their source, until the token budget is spent.
+    
+    Args:
+        question: Student's question
+        docs: Retrieved (or compressed) chunks
+        max_tokens: Token budget for the quoted sentences
+    
+    Returns:
+        Answer text, introduced as an excerpt rather than a generated answer
+    """
+    max_tokens = config.DEGRADED_ANSWER_TOKENS if max_tokens is None else max_tokens
+    question_words = {word for word in _WORD.findall(question.casefold()) if len(word) > 2}
+    
+    candidates = []
+    for doc_rank, doc in enumerate(docs):
+        for position, sentence in enumerate(split_sentences(doc.content)):
+            overlap = len(question_words & set(_WORD.findall(sentence.casefold())))
+            # Ties go to better-ranked chunks, then to earlier sentences
+            candidates.append((-overlap, doc_rank, position, sentence, doc.source))
+    candidates.sort()
+    
+    quoted, tokens = [], 0
+    for _, _, _, sentence, source in candidates:
+        sentence_tokens = estimate_tokens(sentence)
+        if quoted and tokens + sentence_tokens > max_tokens:
+            continue
+        quoted.append(f"- [{source}] {sentence}")
+        tokens += sentence_tokens
+    
+    if not quoted:
+        return "The answer could not be generated in time, and no course materials matched this question."
+    return ("The answer could not be generated in time. These are the most relevant passages "
+            "from the course materials:\n\n" + "\n".join(quoted))
@@ -0,0 +1,278 @@
+"""
+Ingestion Pipeline - Extract, chunk, embed and write PDFs as overlapping stages
+"""
+import contextvars
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from src.config import config
+from src.page_cache import file_sha256
+from src.profiler import profiler
+from src.records import ChunkBatch
+from src.dedup import NearDuplicateIndex, split_duplicates
+
+_DONE = object()  # End-of-input marker, one per downstream worker
+
+
+class Stage:
+    """
+    One pipeline step: a worker pool reading from a bounded queue
+    
+    Workers block on put when the next stage's queue is full, so a slow
+    stage throttles everything upstream instead of letting work pile up in
+    memory.
+    """
+    
+    def __init__(self, name: str, fn: Callable[[object], Iterable], workers: int, queue_size: int):
+        """
+        Initialize stage
+        
+        Args:
+            name: Stage name used in the stats
+            fn: Turns one input item into zero or more output items
+            workers: Threads running fn
+            queue_size: Capacity of the stage's input queue
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self.next: Optional["Stage"] = None
+        
+        self._lock = threading.Lock()
+        self._live = 0
+        self.items = 0
+        self.outputs = 0
+        self.errors = 0
+        self.failed_files: Set[str] = set()
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0  # Time spent waiting for room downstream
+        self.depth_total = 0
+        self.depth_samples = 0
+        self.max_depth = 0
+    
+    def start(self) -> List[threading.Thread]:
+        """Start the workers (in the caller's context, so a profiled re-index samples them)"""
+        self._live = self.workers
+        threads = [
+            threading.Thread(target=contextvars.copy_context().run, args=(self._run,),
+                             name=f"ingest-{self.name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+    
+    def _run(self):
+        with profiler.section(f"ingest_{self.name}"):
+            self._work()
+    
+    def _work(self):
+        try:
+            while True:
+                depth = self.queue.qsize()
+                item = self.queue.get()
+                if item is _DONE:
+                    return
+                with self._lock:
+                    self.depth_total += depth
+                    self.depth_samples += 1
+                    self.max_depth = max(self.max_depth, depth)
+                
+                start = time.perf_counter()
+                try:
+                    outputs = list(self.fn(item) or ())
+                except Exception as e:
+                    print(f" Ingest {self.name} error ({Path(item_file(item)).name}): {e}")
+                    with self._lock:
+                        self.errors += 1
+                        self.failed_files.add(item_file(item))
+                    continue
+                busy = time.perf_counter() - start
+                
+                blocked = 0.0
+                if self.next is not None:
+                    for output in outputs:
+                        put_start = time.perf_counter()
+                        self.next.queue.put(output)
+                        blocked += time.perf_counter() - put_start
+                
+                with self._lock:
+                    self.items += 1
+                    self.outputs += len(outputs)
+                    self.busy_seconds += busy
+                    self.blocked_seconds += blocked
+        finally:
+            with self._lock:
+                self._live -= 1
+                last = self._live == 0
+            if last and self.next is not None:
+                for _ in range(self.next.workers):
+                    self.next.queue.put(_DONE)
+    
+    def get_stats(self, wall_seconds: float) -> dict:
+        """Throughput, utilization and queue depth of the stage"""
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "outputs": self.outputs,
+            "errors": self.errors,
+            "busy_s": round(self.busy_seconds, 3),
+            "blocked_s": round(self.blocked_seconds, 3),
+            "items_per_s": round(self.items / wall_seconds, 2) if wall_seconds else 0.0,
+            "utilization": round(self.busy_seconds / (wall_seconds * self.workers), 3) if wall_seconds else 0.0,
+            "queue_capacity": self.queue.maxsize,
+            "avg_queue_depth": round(self.depth_total / self.depth_samples, 2) if self.depth_samples else 0.0,
+            "max_queue_depth": self.max_depth
+        }
+
+
+def item_file(item) -> str:
+    """Path of the file a pipeline item belongs to"""
+    if isinstance(item, Path):
+        return str(item)
+    if isinstance(item, ChunkBatch):
+        return item[0].file_path if len(item) else ""
+    if isinstance(item, tuple) and item:
+        return item_file(item[0])
+    return ""
+
+
+class IngestPipeline:
+    """
+    extract -> chunk -> [dedup ->] embed -> write, with every stage running at once
+    
+    While one file's chunks are being embedded, the next file is already
+    being parsed and the previous batch is being written, so the total time
+    approaches that of the slowest stage rather than the sum of all four.
+    """
+    
+    def __init__(self, store, loader, extract_workers: int = None, chunk_workers: int = None,
+                 embed_workers: int = None, write_workers: int = None,
+                 queue_size: int = None, batch_size: int = None,
+                 deduplicator: NearDuplicateIndex = None, collection=None):
+        """
+        Initialize pipeline
+        
+        Args:
+            store: VectorStore the chunks are embedded with and written to
+            loader: PDFLoader used for extraction and chunking
+            extract_workers: PDFs parsed at once (each in its own worker
+                process, see PDFExtractor)
+            chunk_workers: Threads splitting page text
+            embed_workers: Threads running the embedding model
+            write_workers: Threads writing to the collection
+            queue_size: Capacity of each stage's input queue
+            batch_size: Chunks per embed/write batch
+            deduplicator: Drop near-duplicate chunks before they are embedded
+                (see NearDuplicateIndex); None stores every chunk
+            collection: Collection to write to (defaults to the store's live one)
+        """
+        self.store = store
+        self.loader = loader
+        self.workers = {
+            "extract": config.INGEST_EXTRACT_WORKERS if extract_workers is None else extract_workers,
+            "chunk": config.INGEST_CHUNK_WORKERS if chunk_workers is None else chunk_workers,
+            "embed": config.INGEST_EMBED_WORKERS if embed_workers is None else embed_workers,
+            "write": config.INGEST_WRITE_WORKERS if write_workers is None else write_workers
+        }
+        self.queue_size = config.INGEST_QUEUE_SIZE if queue_size is None else queue_size
+        self.batch_size = max(1, config.INGEST_BATCH_SIZE if batch_size is None else batch_size)
+        self.deduplicator = deduplicator
+        self.collection = collection
+        
+        self._lock = threading.Lock()
+        self.chunks_written = 0
+        self.written_ids: Dict[str, Set[str]] = {}  # Chunk IDs written per file path
+        self.failed_files: Set[str] = set()
+        self.duplicates: Dict[str, List[dict]] = {}  # Collapsed chunks per canonical chunk ID
+    
+    def _extract(self, pdf_path: Path):
+        file_hash = file_sha256(pdf_path)
+        pages = self.loader.extract_pages(pdf_path, file_hash)
+        return [(pdf_path, file_hash, pages)]
+    
+    def _chunk(self, item: tuple):
+        pdf_path, file_hash, pages = item
+        documents = self.loader.chunk_pages(pages, pdf_path, file_hash)
+        with self._lock:
+            # A file whose chunks are all duplicates still counts as indexed
+            self.written_ids.setdefault(str(pdf_path), set())
+        return [documents.slice(start, start + self.batch_size)
+                for start in range(0, len(documents), self.batch_size)]
+    
+    def _dedup(self, batch: ChunkBatch):
+        kept, duplicates = split_duplicates(self.deduplicator, batch)
+        with self._lock:
+            for canonical_id, entries in duplicates.items():
+                self.duplicates.setdefault(canonical_id, []).extend(entries)
+        return [kept] if len(kept) else []
+    
+    def _embed(self, batch: ChunkBatch):
+        return [(batch, self.store.embed_texts(batch.contents))]
+    
+    def _write(self, item: tuple):
+        batch, embeddings = item
+        self.store._upsert_batch(batch, embeddings, collection=self.collection)
+        with self._lock:
+            self.chunks_written += len(batch)
+            # Batches never span files
+            self.written_ids.setdefault(batch[0].file_path, set()).update(batch.ids())
+        return ()
+    
+    def run(self, pdf_paths: List[Path]) -> dict:
+        """
+        Ingest files through all stages
+        
+        Args:
+            pdf_paths: PDFs to index
+        
+        Returns:
+            Files and chunks written, wall time and per-stage stats
+        """
+        stages = [
+            Stage("extract", self._extract, self.workers["extract"], self.queue_size),
+            Stage("chunk", self._chunk, self.workers["chunk"], self.queue_size),
+            # One worker: the first of two near-identical chunks must stay canonical
+            Stage("dedup", self._dedup, 1, self.queue_size),
+            Stage("embed", self._embed, self.workers["embed"], self.queue_size),
+            Stage("write", self._write, self.workers["write"], self.queue_size)
+        ]
+        if self.deduplicator is None:
+            stages = [stage for stage in stages if stage.name != "dedup"]
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next = next_stage
+        
+        start = time.perf_counter()
+        threads = [thread for stage in stages for thread in stage.start()]
+        
+        # Feeding blocks while the extract queue is full (backpressure)
+        for pdf_path in pdf_paths:
+            stages[0].queue.put(Path(pdf_path))
+        for _ in range(stages[0].workers):
+            stages[0].queue.put(_DONE)
+        
+        for thread in threads:
+            thread.join()
+        wall_seconds = time.perf_counter() - start
+        
+        stage_stats = {stage.name: stage.get_stats(wall_seconds) for stage in stages}
+        # A stage's own time if it ran alone: busy time spread over its workers
+        stage_seconds = {stage.name: stage.busy_seconds / stage.workers for stage in stages}
+        self.failed_files = set().union(*(stage.failed_files for stage in stages))
+        stats = {
+            "files": len(pdf_paths),
+            "files_indexed": len(set(self.written_ids) - self.failed_files),
+            "chunks": self.chunks_written,
+            "errors": sum(stage.errors for stage in stages),
+            "failed_files": sorted(Path(path).name for path in self.failed_files),
+            "wall_s": round(wall_seconds, 3),
+            "sequential_s": round(sum(stage_seconds.values()), 3),
+            "bottleneck": max(stage_seconds, key=stage_seconds.get),
+            "stages": stage_stats
+        }
+        if self.deduplicator is not None:
+            stats["dedup"] = self.deduplicator.get_stats()
+        return stats
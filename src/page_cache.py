@@ -0,0 +1,187 @@
+"""
+Page Text Cache - On-disk cache of extracted PDF page text
+"""
+import hashlib
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Optional
+from src.config import config
+
+# File layout: magic, page count, one compressed length per page, then the
+# zlib-compressed UTF-8 text of each page back to back.
+CACHE_MAGIC = b"EMPC\x01"
+CACHE_SUFFIX = ".pgz"
+_COUNT = struct.Struct("<I")
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> Optional[str]:
+    """
+    Hash a file's contents
+
+    Args:
+        path: File to hash
+        block_size: Bytes read per iteration
+
+    Returns:
+        Hex digest, or None if the file cannot be read
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """Compressed page text keyed by file hash and page number"""
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        """
+        Initialize page cache
+
+        Args:
+            cache_dir: Directory holding cache files
+            max_bytes: Size limit before least recently used files are evicted
+                (0 disables the cache)
+        """
+        self.cache_dir = Path(cache_dir or config.PAGE_CACHE_PATH)
+        self.max_bytes = config.PAGE_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.enabled = self.max_bytes > 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, file_hash: str) -> Path:
+        return self.cache_dir / f"{file_hash}{CACHE_SUFFIX}"
+
+    def _read_index(self, f) -> List[int]:
+        """Read the header and return the compressed length of every page"""
+        if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            raise ValueError("not a page cache file")
+        (page_count,) = _COUNT.unpack(f.read(_COUNT.size))
+        raw = f.read(_COUNT.size * page_count)
+        return list(struct.unpack(f"<{page_count}I", raw))
+
+    def get_pages(self, file_hash: str) -> Optional[List[str]]:
+        """
+        Get the text of every page of a cached file
+
+        Args:
+            file_hash: Content hash of the PDF
+
+        Returns:
+            Page texts in order, or None on a cache miss
+        """
+        if not self.enabled:
+            return None
+        path = self._path(file_hash)
+        try:
+            with open(path, "rb") as f:
+                lengths = self._read_index(f)
+                pages = [zlib.decompress(f.read(n)).decode("utf-8") for n in lengths]
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError, zlib.error, struct.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pages
+
+    def get_page(self, file_hash: str, page_num: int) -> Optional[str]:
+        """
+        Get the text of a single cached page without decompressing the rest
+
+        Args:
+            file_hash: Content hash of the PDF
+            page_num: Zero-based page number
+
+        Returns:
+            Page text, or None if the file or page is not cached
+        """
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(file_hash), "rb") as f:
+                lengths = self._read_index(f)
+                if not 0 <= page_num < len(lengths):
+                    return None
+                f.seek(sum(lengths[:page_num]), os.SEEK_CUR)
+                return zlib.decompress(f.read(lengths[page_num])).decode("utf-8")
+        except (OSError, ValueError, zlib.error, struct.error):
+            return None
+
+    def put_pages(self, file_hash: str, pages: List[str]):
+        """
+        Store the page texts of a file, evicting old entries if over the limit
+
+        Args:
+            file_hash: Content hash of the PDF
+            pages: Extracted text of each page
+        """
+        if not self.enabled:
+            return
+        blobs = [zlib.compress(text.encode("utf-8"), 6) for text in pages]
+        header = CACHE_MAGIC + _COUNT.pack(len(blobs)) + struct.pack(
+            f"<{len(blobs)}I", *[len(b) for b in blobs]
+        )
+        path = self._path(file_hash)
+        tmp_path = path.with_suffix(f".tmp{threading.get_ident()}")
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+                for blob in blobs:
+                    f.write(blob)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used files until the cache fits its limit"""
+        entries = []
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        """Delete all cached files"""
+        with self._lock:
+            for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+                path.unlink(missing_ok=True)
+
+    def get_stats(self) -> dict:
+        """Get cache usage statistics"""
+        files = list(self.cache_dir.glob(f"*{CACHE_SUFFIX}")) if self.enabled else []
+        return {
+            "enabled": self.enabled,
+            "entries": len(files),
+            "size_bytes": sum(p.stat().st_size for p in files if p.exists()),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+# Global instance
+page_cache = PageTextCache()
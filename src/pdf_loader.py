@@ -3,32 +3,41 @@ PDF Loader - Extract and process course PDFs
 """
 from pathlib import Path
 from typing import List
-from pypdf import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from src.config import config
+from src.page_cache import page_cache, file_sha256
+from src.records import ChunkBatch
+from src.extraction import ExtractionError, pdf_extractor
+from src.quarantine import TRANSIENT_REASONS, quarantine
 
 class PDFLoader:
     """Load and process PDF files"""
     
-    def __init__(self):
-        """Initialize PDF loader"""
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None):
+        """
+        Initialize PDF loader
+        
+        Args:
+            chunk_size: Characters per chunk (defaults to CHUNK_SIZE)
+            chunk_overlap: Overlap between chunks (defaults to CHUNK_OVERLAP)
+        """
         self.pdf_folder = Path(config.PDF_FOLDER_PATH)
-        self.chunk_size = 1000  # Characters per chunk
-        self.chunk_overlap = 200  # Overlap between chunks
+        self.chunk_size = config.CHUNK_SIZE if chunk_size is None else chunk_size
+        self.chunk_overlap = config.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
             separators=["\n\n", "\n", " ", ""]
         )
     
-    def load_all_pdfs(self) -> List[dict]:
+    def load_all_pdfs(self) -> ChunkBatch:
         """
         Load all PDFs from the PDF folder
         
         Returns:
-            List of documents with metadata
+            Chunks of every PDF with their metadata
         """
-        documents = []
+        documents = ChunkBatch()
         
         # Get all PDF files
         pdf_files = list(self.pdf_folder.glob("*.pdf"))
@@ -51,7 +60,7 @@ class PDFLoader:
         print(f"\n Total chunks created: {len(documents)}")
         return documents
     
-    def _load_pdf(self, pdf_path: Path) -> List[dict]:
+    def _load_pdf(self, pdf_path: Path) -> ChunkBatch:
         """
         Load a single PDF file
         
@@ -59,36 +68,85 @@ class PDFLoader:
             pdf_path: Path to PDF file
         
         Returns:
-            List of text chunks with metadata
+            Text chunks with metadata
         """
-        documents = []
-        
-        # Read PDF
-        pdf_reader = PdfReader(pdf_path)
-        pdf_name = pdf_path.stem  # Filename without extension
+        file_hash = file_sha256(pdf_path)
         
         # Extract text from all pages
-        full_text = ""
-        for page_num, page in enumerate(pdf_reader.pages):
-            text = page.extract_text()
-            full_text += text + "\n"
+        pages = self.extract_pages(pdf_path, file_hash)
+        return self.chunk_pages(pages, pdf_path, file_hash)
+    
+    def chunk_pages(self, pages: List[str], pdf_path: Path, file_hash: str = None) -> ChunkBatch:
+        """
+        Split extracted page text into chunks with metadata
+        
+        Args:
+            pages: Text of each page in order
+            pdf_path: Path the pages were extracted from
+            file_hash: Content hash of the file
+        
+        Returns:
+            Text chunks with metadata
+        """
+        full_text = "".join(text + "\n" for text in pages)
         
         # Split into chunks
         chunks = self.text_splitter.split_text(full_text)
         
-        # Create documents with metadata
-        for chunk_idx, chunk in enumerate(chunks):
-            doc = {
-                "content": chunk,
-                "metadata": {
-                    "source": pdf_name,
-                    "chunk_index": chunk_idx,
-                    "file_path": str(pdf_path)
-                }
-            }
-            documents.append(doc)
-        
+        documents = ChunkBatch()
+        documents.add_file(pdf_path.stem, str(pdf_path), file_hash or "", chunks)
         return documents
+    
+    def extract_pages(self, pdf_path: Path, file_hash: str = None) -> List[str]:
+        """
+        Extract the text of every page, reusing the page cache when the
+        file content is unchanged
+        
+        Extraction runs under the time budgets of pdf_extractor; a file that
+        fails is quarantined and not parsed again until it changes (after
+        one retry, and only for a while, when the failure was an error). A file
+        with pages over the page budget is used without them but not cached,
+        so it is extracted again next time.
+        
+        Args:
+            pdf_path: Path to PDF file
+            file_hash: Content hash if already computed
+        
+        Returns:
+            Text of each page in order
+        
+        Raises:
+            ExtractionError: The file is (now) quarantined
+        """
+        file_hash = file_hash or file_sha256(pdf_path)
+        if file_hash:
+            cached = page_cache.get_pages(file_hash)
+            if cached is not None:
+                return cached
+            entry = quarantine.get(file_hash)
+            if entry is not None:
+                raise ExtractionError(f"{Path(pdf_path).name} is quarantined ({entry['reason']})",
+                                      entry["reason"], entry["attempts"])
+        
+        try:
+            try:
+                pages, missing_pages = pdf_extractor.extract_with_gaps(pdf_path)
+            except ExtractionError as e:
+                if e.reason not in TRANSIENT_REASONS:
+                    raise
+                # A crashed worker says little about the file: try once more
+                print(f" Retrying {Path(pdf_path).name} after: {e}")
+                pages, missing_pages = pdf_extractor.extract_with_gaps(pdf_path)
+        except ExtractionError as e:
+            if file_hash:
+                quarantine.add(file_hash, pdf_path, e.reason, e.attempts)
+            raise
+        
+        if missing_pages:
+            print(f" {Path(pdf_path).name}: page(s) {missing_pages} over the page budget were left out")
+        elif file_hash:
+            page_cache.put_pages(file_hash, pages)
+        return pages
 
 
 # Global instance
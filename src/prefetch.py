@@ -0,0 +1,212 @@
+"""
+Prefetch - Warm retrieval for a question while the student is still typing
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from src.config import config
+
+# Runs the retrieval for a (partial) question; returns the search key it
+# warmed, or None if the question needs no search
+WarmFn = Callable[[str, str], Optional[str]]
+
+
+class _SessionState:
+    """Prefetch bookkeeping for one session"""
+    
+    __slots__ = ("text", "due", "generation", "warmed_key")
+    
+    def __init__(self):
+        self.text = ""
+        self.due = 0.0
+        self.generation = 0  # Bumped by every submit/cancel; stale work is dropped
+        self.warmed_key: Optional[str] = None
+
+
+class Prefetcher:
+    """
+    Debounced, per-session retrieval warming
+    
+    Each submit replaces the session's pending text and restarts its
+    debounce timer, so only the text the student pauses on is searched. A
+    single scheduler thread hands due sessions to a small worker pool;
+    newer keystrokes or the real query cancel anything not yet started.
+    """
+    
+    def __init__(self, warm_fn: WarmFn, debounce_ms: float = None, min_chars: int = None,
+                 workers: int = None, max_sessions: int = None):
+        """
+        Initialize prefetcher
+        
+        Args:
+            warm_fn: Warms the caches for a question in a session
+            debounce_ms: Pause in typing before a prefetch runs
+            min_chars: Shorter partial questions are ignored
+            workers: Threads running prefetches
+            max_sessions: Sessions tracked before the oldest is dropped
+        """
+        self.warm_fn = warm_fn
+        self.debounce = (config.PREFETCH_DEBOUNCE_MS if debounce_ms is None else debounce_ms) / 1000
+        self.min_chars = config.PREFETCH_MIN_CHARS if min_chars is None else min_chars
+        self.max_sessions = config.MAX_SESSIONS if max_sessions is None else max_sessions
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.PREFETCH_WORKERS if workers is None else workers,
+            thread_name_prefix="prefetch"
+        )
+        
+        self._sessions: "OrderedDict[str, _SessionState]" = OrderedDict()
+        self._heap = []  # (due, session_id, generation)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        
+        self.counts: Dict[str, int] = {
+            "requests": 0, "ignored": 0, "superseded": 0, "cancelled": 0,
+            "executed": 0, "errors": 0, "hits": 0, "misses": 0, "wasted": 0
+        }
+        self.warm_seconds = 0.0
+    
+    def _session(self, session_id: str) -> _SessionState:
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = self._sessions[session_id] = _SessionState()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return state
+    
+    def submit(self, session_id: str, text: str) -> str:
+        """
+        Schedule warming for the text a student has typed so far
+        
+        Args:
+            session_id: Conversation the question belongs to
+            text: Partial question
+        
+        Returns:
+            "scheduled" or "ignored"
+        """
+        text = text.strip()
+        with self._lock:
+            self.counts["requests"] += 1
+            if len(text) < self.min_chars:
+                self.counts["ignored"] += 1
+                return "ignored"
+            
+            state = self._session(session_id)
+            if state.due:
+                self.counts["superseded"] += 1
+            state.text = text
+            state.generation += 1
+            state.due = time.monotonic() + self.debounce
+            heapq.heappush(self._heap, (state.due, session_id, state.generation))
+            self._wakeup.notify()
+        
+        self._ensure_scheduler()
+        return "scheduled"
+    
+    def cancel(self, session_id: str) -> bool:
+        """
+        Drop a session's pending prefetch (the real query has arrived)
+        
+        Returns:
+            Whether a pending prefetch was cancelled
+        """
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or not state.due:
+                return False
+            state.generation += 1
+            state.due = 0.0
+            self.counts["cancelled"] += 1
+            return True
+    
+    def on_query(self, session_id: str, search_key: Optional[str]):
+        """
+        Record whether a real query used what was prefetched for its session
+        
+        Args:
+            session_id: Conversation the query belongs to
+            search_key: Search key the query used (None if it did not search)
+        """
+        self.cancel(session_id)
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or state.warmed_key is None:
+                return
+            if search_key is not None and search_key == state.warmed_key:
+                self.counts["hits"] += 1
+            else:
+                self.counts["misses"] += 1
+                self.counts["wasted"] += 1
+            state.warmed_key = None
+    
+    def _ensure_scheduler(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._schedule, name="prefetch-scheduler",
+                                                    daemon=True)
+                    self._thread.start()
+    
+    def _schedule(self):
+        while True:
+            with self._lock:
+                while not self._heap:
+                    self._wakeup.wait()
+                due, session_id, generation = self._heap[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._wakeup.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                state = self._sessions.get(session_id)
+                if state is None or state.generation != generation:
+                    continue  # Superseded or cancelled
+                state.due = 0.0
+                text = state.text
+            self._executor.submit(self._execute, session_id, text, generation)
+    
+    def _execute(self, session_id: str, text: str, generation: int):
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or state.generation != generation:
+                return  # Cancelled while queued for a worker
+        
+        start = time.perf_counter()
+        try:
+            key = self.warm_fn(text, session_id)
+        except Exception as e:
+            print(f" Prefetch error: {e}")
+            with self._lock:
+                self.counts["errors"] += 1
+            return
+        
+        with self._lock:
+            self.counts["executed"] += 1
+            self.warm_seconds += time.perf_counter() - start
+            state = self._sessions.get(session_id)
+            if state is None or key is None:
+                return
+            if state.warmed_key is not None and state.warmed_key != key:
+                self.counts["wasted"] += 1  # Replaced before any query used it
+            state.warmed_key = key
+    
+    def get_stats(self) -> dict:
+        """Get prefetch effectiveness statistics"""
+        with self._lock:
+            counts = dict(self.counts)
+            pending = sum(1 for state in self._sessions.values() if state.due)
+        judged = counts["hits"] + counts["misses"]
+        return {
+            **counts,
+            "pending": pending,
+            "hit_rate": round(counts["hits"] / judged, 3) if judged else 0.0,
+            "wasted_rate": round(counts["wasted"] / counts["executed"], 3) if counts["executed"] else 0.0,
+            "avg_warm_ms": round(self.warm_seconds * 1000 / counts["executed"], 2) if counts["executed"] else 0.0,
+            "config": {"debounce_ms": self.debounce * 1000, "min_chars": self.min_chars}
+        }
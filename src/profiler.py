@@ -0,0 +1,188 @@
+"""
+Sampling Profiler - Opt-in, per-request stack sampling
+
+When a request is selected for profiling (a sampled fraction, or a request
+carrying the profiling header), instrumented code sections start a thread
+that periodically captures the stack of the thread doing the work. Stacks
+are stored in collapsed format ("frame;frame;frame count"), which
+flamegraph.pl, speedscope and inferno read directly.
+
+Work handed to other threads is sampled when those threads open a section
+in a copy of the request's context (copy_context().run), or when a shared
+worker passes the profiles of the requests it serves to section().
+
+Sections outside a profiled request only pay for one ContextVar lookup.
+"""
+import contextvars
+import functools
+import itertools
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+from src.config import config
+
+_current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+class Profile:
+    """Stack samples collected for one request"""
+    
+    def __init__(self, profile_id: int, label: str):
+        self.id = profile_id
+        self.label = label
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.stacks = Counter()
+        self.sampled_threads = set()
+        self._lock = threading.Lock()
+    
+    def add(self, stack: str):
+        with self._lock:
+            self.stacks[stack] += 1
+    
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+    
+    def collapsed(self) -> str:
+        """Render samples as collapsed stacks for flamegraph tools"""
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(self.stacks.items())) + "\n"
+    
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 1),
+            "samples": self.samples
+        }
+
+
+def _frame_label(frame) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+class SamplingProfiler:
+    """Collect and keep stack profiles of selected requests"""
+    
+    def __init__(self, interval_ms: float = None, sample_rate: float = None, max_profiles: int = None):
+        """
+        Initialize profiler
+        
+        Args:
+            interval_ms: Time between stack samples
+            sample_rate: Fraction of requests profiled without the header
+            max_profiles: Finished profiles kept for the admin endpoint
+        """
+        self.interval = (config.PROFILE_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.sample_rate = config.PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.profiles = deque(maxlen=config.PROFILE_MAX_STORED if max_profiles is None else max_profiles)
+        self._ids = itertools.count(1)
+    
+    def should_profile(self, header_value: Optional[str] = None) -> bool:
+        """Decide whether a request is profiled"""
+        if header_value and header_value.lower() not in ("0", "false", "no"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+    
+    @contextmanager
+    def request(self, label: str):
+        """
+        Mark the enclosed work as a profiled request
+        
+        Yields:
+            The Profile being collected
+        """
+        profile = Profile(next(self._ids), label)
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.duration_ms = (time.perf_counter() - start) * 1000
+            _current_profile.reset(token)
+            self.profiles.append(profile)
+    
+    def current(self) -> Optional[Profile]:
+        """The profile of the request running in this context, if it is profiled"""
+        return _current_profile.get()
+    
+    @contextmanager
+    def section(self, name: str, profiles: Iterable[Optional[Profile]] = None):
+        """
+        Sample the calling thread while inside a profiled request
+        
+        Args:
+            name: Root frame name for the samples (e.g. "query", "index")
+            profiles: Profiles to add the samples to, for work a thread does
+                on behalf of other requests (defaults to the current one);
+                work shared by several requests is counted in each of them
+        """
+        if profiles is None:
+            profiles = [_current_profile.get()]
+        thread_id = threading.get_ident()
+        profiles = [profile for profile in dict.fromkeys(profiles)
+                    if profile is not None and thread_id not in profile.sampled_threads]
+        if not profiles:
+            yield
+            return
+        
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample, args=(profiles, name, thread_id, stop),
+            name="profiler-sampler", daemon=True
+        )
+        for profile in profiles:
+            profile.sampled_threads.add(thread_id)
+        sampler.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+            for profile in profiles:
+                profile.sampled_threads.discard(thread_id)
+    
+    def profiled(self, name: str):
+        """Decorator form of section() for instrumenting whole methods"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _current_profile.get() is None:
+                    return func(*args, **kwargs)
+                with self.section(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+    
+    def _sample(self, profiles: List[Profile], name: str, thread_id: int, stop: threading.Event):
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                collapsed = ";".join([name] + stack[::-1])
+                for profile in profiles:
+                    profile.add(collapsed)
+    
+    def get(self, profile_id: int) -> Optional[Profile]:
+        """Look up a stored profile"""
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+    
+    def list_profiles(self) -> list:
+        """Summaries of stored profiles, newest first"""
+        return [profile.summary() for profile in reversed(self.profiles)]
+
+
+# Global instance
+profiler = SamplingProfiler()
@@ -0,0 +1,383 @@
+"""
+Quantized Vector Index - int8 scalar-quantized vectors with exact rescoring
+
+Vectors are L2-normalised and stored as int8 with one scale per dimension
+(scale_d = max |x_d| / 127), a quarter of the float32 size. A query is
+scored against every int8 vector (processed in blocks), the best
+k * rescore_factor candidates are then rescored exactly against the
+full-precision vectors, which stay on disk and are memory-mapped so only the
+candidate rows are paged in.
+"""
+import argparse
+import heapq
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from src.config import config
+
+# Rows upcast per step: the float32 copy of a block (512 x 384 x 4 bytes)
+# stays in L2 cache, so only the int8 codes travel from main memory
+BLOCK_ROWS = 512
+# Delta rows plus deleted rows beyond this share of the base call for a full rebuild
+COMPACT_RATIO = 0.25
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class _Snapshot:
+    """
+    One consistent view of the index
+    
+    A base segment (int8 codes plus memory-mapped float32 vectors) that is
+    never modified once written, the base rows deleted since, and a small
+    float32 delta segment of chunks added since. Searches take a reference
+    to the current snapshot, so a rebuild never changes arrays under them.
+    """
+    
+    __slots__ = ("base", "delta", "ids", "codes", "scales", "full", "info", "row_of",
+                 "deleted", "deleted_rows", "delta_ids", "delta_full")
+    
+    def __init__(self):
+        self.base: Optional[str] = None
+        self.delta: Optional[str] = None
+        self.ids: List[str] = []
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.full: Optional[np.ndarray] = None
+        self.info = {}
+        self.row_of = {}
+        self.deleted: List[str] = []
+        self.deleted_rows = np.empty(0, dtype=np.int64)
+        self.delta_ids: List[str] = []
+        self.delta_full = np.empty((0, 0), dtype=np.float32)
+    
+    @property
+    def count(self) -> int:
+        return len(self.ids) - len(self.deleted) + len(self.delta_ids)
+
+
+class QuantizedIndex:
+    """int8 first pass plus memory-mapped float32 rescoring"""
+    
+    def __init__(self, index_dir: str = None):
+        """
+        Initialize (and load, if present) an index
+        
+        Args:
+            index_dir: Directory holding the index files
+        """
+        self.index_dir = Path(index_dir or config.QUANTIZED_INDEX_PATH)
+        self.current_path = self.index_dir / "current.json"
+        self._snapshot = _Snapshot()
+        self._write_lock = threading.Lock()
+        self.load()
+    
+    @property
+    def ready(self) -> bool:
+        return self._snapshot.codes is not None and self._snapshot.count > 0
+    
+    @property
+    def ids(self) -> List[str]:
+        """Chunk IDs of the base rows"""
+        return self._snapshot.ids
+    
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        return self._snapshot.codes
+    
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        return self._snapshot.scales
+    
+    @property
+    def full(self) -> Optional[np.ndarray]:
+        return self._snapshot.full
+    
+    @property
+    def info(self) -> dict:
+        return self._snapshot.info
+    
+    @property
+    def count(self) -> int:
+        """Chunks currently searchable"""
+        return self._snapshot.count
+    
+    def searchable(self, ids: List[str]) -> List[str]:
+        """The given chunk IDs that searches can currently return"""
+        snapshot = self._snapshot
+        deleted, delta = set(snapshot.deleted), set(snapshot.delta_ids)
+        return [chunk_id for chunk_id in ids
+                if chunk_id in delta or (chunk_id in snapshot.row_of and chunk_id not in deleted)]
+    
+    def _new_dir(self, kind: str) -> Path:
+        path = self.index_dir / f"{kind}_{time.time_ns()}"
+        path.mkdir(parents=True)
+        return path
+    
+    def _publish(self, base: str, delta: Optional[str]):
+        """Point current.json at a base and delta, load them and drop older files"""
+        tmp_path = self.current_path.with_name("current.json.tmp")
+        tmp_path.write_text(json.dumps({"base": base, "delta": delta}))
+        os.replace(tmp_path, self.current_path)
+        self.load()
+        # Unlinking files a search still has memory-mapped is safe: the
+        # mapping keeps the data until it is released
+        for path in self.index_dir.iterdir():
+            if path.is_dir() and path.name.startswith(("base_", "delta_")) and path.name not in (base, delta):
+                shutil.rmtree(path, ignore_errors=True)
+    
+    def build(self, ids: List[str], embeddings, info: dict = None):
+        """
+        Quantize vectors and write a new base segment
+        
+        The files go into a fresh directory that is switched to by an atomic
+        rename of current.json, so searches never read a half-written file.
+        
+        Args:
+            ids: Chunk IDs, one per vector
+            embeddings: (n, dimension) vectors
+            info: Extra metadata stored with the index
+        """
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        scales = np.abs(vectors).max(axis=0) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+        
+        with self._write_lock:
+            base = self._new_dir("base")
+            np.save(base / "codes.npy", codes)
+            np.save(base / "scales.npy", scales.astype(np.float32))
+            np.save(base / "full.npy", vectors)
+            (base / "ids.json").write_text(json.dumps(ids))
+            (base / "info.json").write_text(json.dumps({
+                "count": len(ids),
+                "dimension": int(vectors.shape[1]) if len(ids) else 0,
+                "built_at": time.time(),
+                **(info or {})
+            }))
+            self._publish(base.name, None)
+    
+    def update(self, add_ids: List[str], add_embeddings, remove_ids: List[str]) -> bool:
+        """
+        Apply a small change without rewriting the base segment
+        
+        Removed base rows are masked out and added chunks go into the delta
+        segment, which is searched exactly. Only the delta files are
+        written, so a single-file change costs the size of the delta.
+        
+        Args:
+            add_ids: IDs of added chunks (IDs already searchable are skipped;
+                a chunk ID always stands for the same content)
+            add_embeddings: Vectors of the added chunks
+            remove_ids: IDs of deleted chunks
+        
+        Returns:
+            False if there is no base segment or the change has grown past
+            COMPACT_RATIO of it, in which case the caller should rebuild
+        """
+        with self._write_lock:
+            snapshot = self._snapshot
+            if snapshot.base is None:
+                return False
+            removed = set(remove_ids)
+            deleted = set(snapshot.deleted) | {chunk_id for chunk_id in removed if chunk_id in snapshot.row_of}
+            delta = {chunk_id: vector for chunk_id, vector in zip(snapshot.delta_ids, snapshot.delta_full)
+                     if chunk_id not in removed}
+            vectors = _normalize(np.asarray(add_embeddings, dtype=np.float32)) if len(add_ids) else []
+            for chunk_id, vector in zip(add_ids, vectors):
+                if chunk_id not in snapshot.row_of or chunk_id in deleted:
+                    delta[chunk_id] = vector
+            
+            if len(delta) + len(deleted) > COMPACT_RATIO * len(snapshot.ids):
+                return False
+            if delta.keys() == set(snapshot.delta_ids) and len(deleted) == len(snapshot.deleted):
+                return True
+            
+            path = self._new_dir("delta")
+            dimension = snapshot.codes.shape[1]
+            np.save(path / "full.npy", np.asarray(list(delta.values()), dtype=np.float32).reshape(-1, dimension))
+            (path / "ids.json").write_text(json.dumps(list(delta)))
+            (path / "deleted.json").write_text(json.dumps(sorted(deleted)))
+            self._publish(snapshot.base, path.name)
+            return True
+    
+    def load(self) -> bool:
+        """Load the index from disk if it exists"""
+        try:
+            current = json.loads(self.current_path.read_text())
+        except (OSError, ValueError):
+            current = {"base": None, "delta": None}  # Flat layout of older builds
+        
+        previous = self._snapshot
+        snapshot = _Snapshot()
+        snapshot.base, snapshot.delta = current["base"], current["delta"]
+        try:
+            if snapshot.base is not None and snapshot.base == previous.base:
+                # Only the delta changed: reuse the loaded base
+                for name in ("ids", "codes", "scales", "full", "info", "row_of"):
+                    setattr(snapshot, name, getattr(previous, name))
+            else:
+                base_dir = self.index_dir / snapshot.base if snapshot.base else self.index_dir
+                snapshot.ids = json.loads((base_dir / "ids.json").read_text())
+                snapshot.info = json.loads((base_dir / "info.json").read_text())
+                snapshot.codes = np.load(base_dir / "codes.npy")
+                snapshot.scales = np.load(base_dir / "scales.npy")
+                snapshot.full = np.load(base_dir / "full.npy", mmap_mode="r")
+                snapshot.row_of = {chunk_id: row for row, chunk_id in enumerate(snapshot.ids)}
+            if snapshot.delta:
+                delta_dir = self.index_dir / snapshot.delta
+                snapshot.delta_ids = json.loads((delta_dir / "ids.json").read_text())
+                snapshot.delta_full = np.load(delta_dir / "full.npy")
+                snapshot.deleted = json.loads((delta_dir / "deleted.json").read_text())
+                snapshot.deleted_rows = np.asarray([snapshot.row_of[chunk_id] for chunk_id in snapshot.deleted],
+                                                   dtype=np.int64)
+        except (OSError, ValueError, KeyError):
+            self._snapshot = _Snapshot()
+            return False
+        self._snapshot = snapshot
+        return True
+    
+    def approximate_scores(self, query: np.ndarray, snapshot: _Snapshot = None) -> np.ndarray:
+        """Cosine scores of a normalised query against the int8 base vectors"""
+        snapshot = snapshot or self._snapshot
+        scaled_query = (query * snapshot.scales).astype(np.float32)
+        scores = np.empty(len(snapshot.ids), dtype=np.float32)
+        # One reused buffer, and BLAS writing straight into the scores, so a
+        # block costs an int8 read and a cache-resident float32 matvec
+        buffer = np.empty((min(BLOCK_ROWS, len(snapshot.ids)), snapshot.codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(snapshot.ids), BLOCK_ROWS):
+            block = snapshot.codes[start:start + BLOCK_ROWS]
+            rows = buffer[:len(block)]
+            np.copyto(rows, block, casting="unsafe")
+            np.dot(rows, scaled_query, out=scores[start:start + len(block)])
+        return scores
+    
+    def search(self, query_embedding: List[float], k: int,
+               rescore_factor: int = None) -> List[Tuple[str, float]]:
+        """
+        Find the nearest chunks to a query
+        
+        Args:
+            query_embedding: Query vector
+            k: Number of results
+            rescore_factor: Candidates rescored exactly = k * rescore_factor
+        
+        Returns:
+            (chunk ID, cosine distance) pairs, nearest first
+        """
+        snapshot = self._snapshot
+        if snapshot.codes is None or not snapshot.count:
+            return []
+        rescore_factor = rescore_factor or config.QUANTIZED_RESCORE_FACTOR
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        
+        hits = []
+        live_rows = len(snapshot.ids) - len(snapshot.deleted_rows)
+        if live_rows:
+            scores = self.approximate_scores(query, snapshot)
+            scores[snapshot.deleted_rows] = -np.inf
+            n_candidates = min(live_rows, max(k, k * rescore_factor))
+            candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+            candidates.sort()  # Sequential reads from the memory-mapped file
+            exact = np.asarray(snapshot.full[candidates]) @ query
+            hits = [(snapshot.ids[row], float(1.0 - score)) for row, score in zip(candidates, exact)]
+        if snapshot.delta_ids:
+            exact = snapshot.delta_full @ query
+            hits += [(chunk_id, float(1.0 - score)) for chunk_id, score in zip(snapshot.delta_ids, exact)]
+        return heapq.nsmallest(k, hits, key=lambda hit: hit[1])
+    
+    def exact_search(self, query_embedding: List[float], k: int) -> List[Tuple[str, float]]:
+        """Brute-force float32 search, the baseline for recall measurements"""
+        snapshot = self._snapshot
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        scores = np.asarray(snapshot.full) @ query
+        scores[snapshot.deleted_rows] = -np.inf
+        hits = [(snapshot.ids[row], float(1.0 - scores[row])) for row in np.argsort(-scores)[:k]
+                if np.isfinite(scores[row])]
+        if snapshot.delta_ids:
+            exact = snapshot.delta_full @ query
+            hits += [(chunk_id, float(1.0 - score)) for chunk_id, score in zip(snapshot.delta_ids, exact)]
+        return heapq.nsmallest(k, hits, key=lambda hit: hit[1])
+    
+    def memory_report(self) -> dict:
+        """Resident vector memory of the quantized index against float32"""
+        if not self.ready:
+            return {}
+        float_bytes = len(self.ids) * self.codes.shape[1] * 4
+        quantized_bytes = self.codes.nbytes + self.scales.nbytes
+        return {
+            "vectors": len(self.ids),
+            "dimension": int(self.codes.shape[1]),
+            "float32_bytes": float_bytes,
+            "int8_bytes": quantized_bytes,
+            "savings_ratio": round(1 - quantized_bytes / float_bytes, 3)
+        }
+    
+    def evaluate(self, queries, k: int = 10, rescore_factor: int = None) -> dict:
+        """
+        Measure recall@k and latency against exact float32 search
+        
+        Args:
+            queries: (m, dimension) query vectors
+            k: Results per query
+            rescore_factor: Candidate multiplier for the quantized search
+        
+        Returns:
+            Recall, per-query latency of both searches and memory savings
+        """
+        recalls, quantized_ms, exact_ms = [], [], []
+        for query in np.asarray(queries, dtype=np.float32):
+            start = time.perf_counter()
+            approx = {chunk_id for chunk_id, _ in self.search(query, k, rescore_factor)}
+            quantized_ms.append((time.perf_counter() - start) * 1000)
+            
+            start = time.perf_counter()
+            truth = {chunk_id for chunk_id, _ in self.exact_search(query, k)}
+            exact_ms.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(approx & truth) / len(truth) if truth else 1.0)
+        
+        return {
+            "k": k,
+            "queries": len(recalls),
+            "recall_at_k": round(float(np.mean(recalls)), 4) if recalls else 0.0,
+            "quantized_ms_mean": round(float(np.mean(quantized_ms)), 3) if recalls else 0.0,
+            "exact_ms_mean": round(float(np.mean(exact_ms)), 3) if recalls else 0.0,
+            **self.memory_report()
+        }
+
+
+def main(argv: list = None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Build or evaluate the int8 quantized vector index")
+    parser.add_argument("command", choices=["build", "report"])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="Stored vectors reused as queries")
+    parser.add_argument("--rescore-factor", type=int, default=None)
+    args = parser.parse_args(argv)
+    
+    from src.vector_store import vector_store
+    if args.command == "build":
+        print(json.dumps(vector_store.build_quantized_index(), indent=2))
+        return
+    
+    index = vector_store.quantized_index
+    if not index.ready:
+        print(" No quantized index found; run 'python -m src.quantized_store build' first")
+        return
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(index.ids), size=min(args.queries, len(index.ids)), replace=False)
+    # Perturb stored vectors so queries do not coincide with indexed points
+    queries = np.asarray(index.full[np.sort(rows)]) + rng.normal(0, 0.02, size=(len(rows), index.full.shape[1]))
+    print(json.dumps(index.evaluate(queries, args.k, args.rescore_factor), indent=2))
+
+
+if __name__ == "__main__":
+    main()
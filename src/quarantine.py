@@ -0,0 +1,117 @@
+"""
+Quarantine - PDFs whose text could not be extracted, skipped until released
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from src.config import config
+
+# Failures that may not be the file's fault (a crashed or killed worker, a
+# restarted forkserver): their entries expire instead of lasting forever
+TRANSIENT_REASONS = {"error"}
+
+
+class QuarantineRegistry:
+    """
+    Files that failed extraction, keyed by content hash
+    
+    A quarantined file is not parsed again, so one pathological PDF costs its
+    time budget once rather than on every index run. Replacing the file
+    (new content, new hash) or releasing the entry lets it be tried again,
+    and entries for transient reasons expire after error_ttl seconds.
+    """
+    
+    def __init__(self, path: str = None, error_ttl: float = None):
+        """
+        Initialize registry
+        
+        Args:
+            path: JSON file the entries are kept in
+            error_ttl: Seconds a transient failure keeps a file quarantined
+        """
+        self.path = Path(path or config.QUARANTINE_PATH)
+        self.error_ttl = config.QUARANTINE_ERROR_TTL_S if error_ttl is None else error_ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = self._load()
+    
+    def _load(self) -> Dict[str, dict]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f" Ignoring unreadable quarantine file {self.path}: {e}")
+            return {}
+    
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._entries, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+    
+    def add(self, file_hash: str, file_path: Path, reason: str, attempts: List[str] = None):
+        """
+        Quarantine a file
+        
+        Args:
+            file_hash: Content hash of the file
+            file_path: Path it was read from
+            reason: "timeout", "page_timeout", "no_text" or "error"
+            attempts: What each extraction engine reported
+        """
+        now = time.time()
+        with self._lock:
+            self._entries[file_hash] = {
+                "file_hash": file_hash,
+                "filename": Path(file_path).name,
+                "file_path": str(file_path),
+                "reason": reason,
+                "attempts": list(attempts or []),
+                "quarantined_at": now,
+                "expires_at": now + self.error_ttl if reason in TRANSIENT_REASONS else None
+            }
+            self._save()
+        print(f" Quarantined {Path(file_path).name}: {reason}")
+    
+    def get(self, file_hash: str) -> Optional[dict]:
+        """Quarantine entry of a file, or None (also once the entry has expired)"""
+        with self._lock:
+            entry = self._entries.get(file_hash)
+            if entry is not None and self._expired(entry):
+                del self._entries[file_hash]
+                self._save()
+                return None
+            return entry
+    
+    def _expired(self, entry: dict) -> bool:
+        expires_at = entry.get("expires_at")
+        return expires_at is not None and time.time() >= expires_at
+    
+    def release(self, file_hash: str) -> bool:
+        """
+        Remove a file from quarantine so it is extracted again
+        
+        Returns:
+            Whether the file was quarantined
+        """
+        with self._lock:
+            if self._entries.pop(file_hash, None) is None:
+                return False
+            self._save()
+            return True
+    
+    def list(self) -> List[dict]:
+        """All entries, most recent first"""
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if not self._expired(entry)]
+        return sorted(entries, key=lambda entry: -entry["quarantined_at"])
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Global instance
+quarantine = QuarantineRegistry()
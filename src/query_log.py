@@ -0,0 +1,254 @@
+"""
+Query Log - Compact, rotating record of asked questions, replayed to warm caches at startup
+"""
+import hashlib
+import json
+import re
+import secrets
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, List, Optional
+from src.cache import normalize_query
+from src.config import config
+
+# Questions containing anything that looks personal are not logged at all
+_PERSONAL = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.]+"          # Email addresses
+    r"|\d[\d \-]{4,}\d"                  # Student IDs, phone numbers
+    r"|https?://\S+"                     # Links (may carry tokens)
+)
+
+
+class QueryLog:
+    """
+    Append-only log of standalone questions, rotated by size
+    
+    Each line holds the normalized question, the time rounded down to the
+    minute and a short hash of the session salted with a key that lives only
+    in memory, so records from one run can be counted per session but never
+    linked to a student. Questions that look like they contain personal
+    data are dropped, and old entries age out through rotation.
+    """
+    
+    def __init__(self, path: str = None, max_kb: int = None, backups: int = None,
+                 enabled: bool = None):
+        """
+        Initialize log
+        
+        Args:
+            path: File the current entries are appended to
+            max_kb: Size at which the file is rotated
+            backups: Rotated files kept (path.1 is the newest)
+            enabled: Whether questions are recorded
+        """
+        self.path = Path(path or config.QUERY_LOG_PATH)
+        self.max_bytes = (config.QUERY_LOG_MAX_KB if max_kb is None else max_kb) * 1024
+        self.backups = config.QUERY_LOG_BACKUPS if backups is None else backups
+        self.enabled = config.QUERY_LOG_ENABLED if enabled is None else enabled
+        self._salt = secrets.token_bytes(16)
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.skipped = 0
+    
+    def _files(self) -> List[Path]:
+        """Log files, newest first"""
+        rotated = [self.path.with_name(f"{self.path.name}.{i}") for i in range(1, self.backups + 1)]
+        return [path for path in [self.path] + rotated if path.exists()]
+    
+    def _rotate(self):
+        for i in range(self.backups, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{i - 1}") if i > 1 else self.path
+            if source.exists():
+                source.replace(self.path.with_name(f"{self.path.name}.{i}"))
+        if self.path.exists():  # No backups kept
+            self.path.unlink()
+    
+    def record(self, question: str, session_id: str = ""):
+        """
+        Log a question
+        
+        Args:
+            question: Question as the student sent it
+            session_id: Session it came from (stored only as a salted hash)
+        """
+        if not self.enabled:
+            return
+        text = normalize_query(question)
+        if not text or _PERSONAL.search(text):
+            self.skipped += 1
+            return
+        
+        session = hashlib.sha256(self._salt + session_id.encode()).hexdigest()[:8]
+        line = json.dumps({"t": int(time.time() // 60 * 60), "s": session, "q": text},
+                          ensure_ascii=False) + "\n"
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if self.path.exists() and self.path.stat().st_size + len(line) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as log_file:
+                    log_file.write(line)
+                self.recorded += 1
+        except OSError as e:
+            print(f" Query log write failed: {e}")
+    
+    def top_queries(self, limit: int, lookback_s: float = None, min_sessions: int = 1) -> List[str]:
+        """
+        Most frequently asked recent questions
+        
+        Args:
+            limit: Questions to return
+            lookback_s: Ignore entries older than this (None keeps all)
+            min_sessions: Ignore questions asked in fewer distinct sessions
+        
+        Returns:
+            Normalized questions, most asked first
+        """
+        since = time.time() - lookback_s if lookback_s else 0
+        counts, sessions, last_seen = defaultdict(int), defaultdict(set), {}
+        with self._lock:
+            files = self._files()
+        for path in files:
+            try:
+                lines = path.read_text(encoding="utf-8").splitlines()
+            except OSError:
+                continue
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                    if entry["t"] < since:
+                        continue
+                    question = entry["q"]
+                except (ValueError, KeyError, TypeError):
+                    continue  # A line cut short by a crash
+                counts[question] += 1
+                sessions[question].add(entry.get("s"))
+                last_seen[question] = max(last_seen.get(question, 0), entry["t"])
+        
+        ranked = sorted(
+            (question for question in counts if len(sessions[question]) >= min_sessions),
+            key=lambda question: (-counts[question], -last_seen[question], question)
+        )
+        return ranked[:limit]
+    
+    def get_stats(self) -> dict:
+        """Log size and counters"""
+        with self._lock:
+            files = self._files()
+            return {
+                "enabled": self.enabled,
+                "files": len(files),
+                "bytes": sum(path.stat().st_size for path in files),
+                "recorded": self.recorded,
+                "skipped": self.skipped
+            }
+
+
+class CacheWarmer:
+    """
+    Replay the most asked recent questions before the service reports ready
+    
+    The embedding model is loaded first, then each logged question is run
+    through warm_fn (most asked first) until the time budget is spent. A
+    question that is still running when the budget ends is finished, so
+    readiness can come at most one question late.
+    """
+    
+    def __init__(self, query_log: QueryLog, warm_model_fn: Callable[[], None],
+                 warm_fn: Callable[[str], None], budget_s: float = None,
+                 max_queries: int = None, lookback_hours: float = None,
+                 min_sessions: int = None):
+        """
+        Initialize warmer
+        
+        Args:
+            query_log: Log the questions are taken from
+            warm_model_fn: Loads the embedding model
+            warm_fn: Warms the caches for one question
+            budget_s: Time allowed for warming (0 skips the questions)
+            max_queries: Questions replayed at most
+            lookback_hours: Only questions asked this recently are replayed
+            min_sessions: Only questions asked in this many sessions are replayed
+        """
+        self.query_log = query_log
+        self.warm_model_fn = warm_model_fn
+        self.warm_fn = warm_fn
+        self.budget_s = config.WARM_BUDGET_S if budget_s is None else budget_s
+        self.max_queries = config.WARM_MAX_QUERIES if max_queries is None else max_queries
+        self.lookback_hours = config.WARM_LOOKBACK_HOURS if lookback_hours is None else lookback_hours
+        self.min_sessions = config.WARM_MIN_SESSIONS if min_sessions is None else min_sessions
+        
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.report = {"state": "pending"}
+    
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+    
+    def start(self):
+        """Warm in a background thread; ready is set when it finishes"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="cache-warmer", daemon=True)
+            self._thread.start()
+    
+    def skip(self):
+        """Report ready without warming"""
+        self.report = {"state": "skipped"}
+        self._ready.set()
+    
+    def wait(self, timeout: float = None) -> bool:
+        """Wait until warming has finished"""
+        return self._ready.wait(timeout)
+    
+    def run(self) -> dict:
+        """
+        Warm the model and the caches within the time budget
+        
+        Returns:
+            Report with the questions warmed, failed and left over
+        """
+        start = time.monotonic()
+        deadline = start + self.budget_s
+        self.report = {"state": "warming", "warmed": 0, "failed": 0}
+        try:
+            try:
+                self.warm_model_fn()
+            except Exception as e:
+                print(f" Warm-up could not load the embedding model: {e}")
+            model_s = time.monotonic() - start
+            
+            questions = self.query_log.top_queries(
+                self.max_queries, self.lookback_hours * 3600, self.min_sessions
+            )
+            warmed = failed = 0
+            for question in questions:
+                if time.monotonic() >= deadline:
+                    break
+                try:
+                    self.warm_fn(question)
+                    warmed += 1
+                except Exception as e:
+                    failed += 1
+                    print(f" Warm-up failed for a logged question: {e}")
+            
+            self.report = {
+                "state": "done",
+                "candidates": len(questions),
+                "warmed": warmed,
+                "failed": failed,
+                "skipped_by_budget": len(questions) - warmed - failed,
+                "model_s": round(model_s, 3),
+                "elapsed_s": round(time.monotonic() - start, 3)
+            }
+            print(f" Cache warm-up: {warmed}/{len(questions)} logged questions in "
+                  f"{self.report['elapsed_s']} s")
+        finally:
+            self._ready.set()
+        return self.report
+    
+    def get_stats(self) -> dict:
+        """Warm-up state and report"""
+        return {"ready": self.ready, **self.report}
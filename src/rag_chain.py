@@ -4,11 +4,22 @@ RAG Chain with Conversation Memory - Multi-turn conversations
 from langchain_groq import ChatGroq
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
-from langchain.memory import ConversationBufferMemory
 from src.config import config
 from src.vector_store import vector_store
+from src.context_compressor import ContextCompressor
+from src.profiler import profiler
+from src.conversation_store import ConversationStore, DEFAULT_SESSION
+from src.context_selection import select_context
+from src.followup import classify_followup, condense_query
+from src.prefetch import Prefetcher
+from src.generation import DeadlineExceeded, HedgedGenerator, extractive_answer
+from src.cache import LRUCache, normalize_query
+from src.query_log import CacheWarmer, QueryLog
 from typing import List, Dict
 
+# Throwaway conversation used when answering logged questions at startup
+WARMUP_SESSION = "__warmup__"
+
 class RAGChain:
     """RAG pipeline with conversation memory: Retrieve + Generate + Remember"""
     
@@ -17,23 +28,20 @@ class RAGChain:
         Initialize RAG chain with conversation memory
         
         Args:
-            max_memory_messages: Number of previous messages to remember
+            max_memory_messages: Number of previous messages included in the prompt
         """
         # Initialize Groq LLM
         self.llm = ChatGroq(
             api_key=config.GROQ_API_KEY,
             model_name=config.GROQ_MODEL,
             temperature=0.7,
-            max_tokens=1000
+            max_tokens=1000,
+            # Calls abandoned at the deadline should not hold a thread for long
+            request_timeout=config.GENERATION_DEADLINE_MS / 1000 or None
         )
         
-        # Initialize conversation memory
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=False,
-            human_prefix="Student",
-            ai_prefix="Assistant"
-        )
+        # Initialize conversation memory (structured, per session)
+        self.conversations = ConversationStore()
         
         # Create prompt template with conversation history
         self.prompt_template = PromptTemplate(
@@ -66,118 +74,295 @@ Answer:"""
         # Create chain
         self.chain = LLMChain(llm=self.llm, prompt=self.prompt_template)
         self.max_memory = max_memory_messages
+        
+        # Latency deadline and hedging for the LLM call
+        self.generator = HedgedGenerator()
+        
+        # Optional sentence-level compression of the retrieved chunks
+        self.compressor = ContextCompressor(vector_store.embed_texts)
+        
+        # Type-ahead warming of the embedding and search caches
+        self.prefetcher = Prefetcher(self.warm)
+        
+        # Answers to first-turn questions, keyed by index generation so any
+        # index change retires them
+        self.answer_cache = LRUCache(config.ANSWER_CACHE_SIZE)
+        
+        # Asked questions, replayed at startup to warm all of the above
+        self.query_log = QueryLog()
+        self.warmer = CacheWarmer(self.query_log, self.warm_model, self.warm_answer)
     
-    def query(self, question: str, num_context_docs: int = 3) -> dict:
+    @profiler.profiled("query")
+    def query(self, question: str, num_context_docs: int = None,
+              session_id: str = DEFAULT_SESSION) -> dict:
         """
         Query the RAG system with conversation memory
         
         Args:
             question: Student's question
-            num_context_docs: Number of relevant documents to retrieve
+            num_context_docs: Fixed number of documents to retrieve
+                (None selects adaptively from the result distances)
+            session_id: Conversation the question belongs to
         
         Returns:
             Dictionary with answer, sources, and conversation context
+            ("degraded" is True when the LLM missed its deadline and the
+            answer quotes the retrieved chunks instead; "answer_cached" when
+            an earlier answer to the same first-turn question was reused)
+        
+        Raises:
+            SessionBusy: Too many requests of this session are already in flight
         """
+        # Turns of one session run in arrival order, so each reads the
+        # history the previous one wrote; other sessions are not held up
+        with self.conversations.turn(session_id):
+            return self._run_turn(question, num_context_docs, session_id)
+    
+    def _run_turn(self, question: str, num_context_docs: int, session_id: str) -> dict:
+        """Answer a question while holding its session (see query)"""
         print(f"\n🔍 Processing question: {question}")
+        self.prefetcher.cancel(session_id)
+        index_generation = vector_store.index_generation
         
         # Get conversation history
-        chat_history = self.memory.buffer if hasattr(self.memory, 'buffer') else ""
+        conversation = self.conversations.get(session_id)
+        chat_history = conversation.render_history(self.max_memory)
         
-        # Step 1: Retrieve relevant documents
+        # Step 1: Retrieve relevant documents (or reuse them for a follow-up)
         print("   📚 Retrieving relevant documents...")
-        retrieved_docs = vector_store.search(question, num_results=num_context_docs)
+        retrieved_docs, query_embedding, retrieval_mode, search_query = self._retrieve(
+            question, conversation, num_context_docs
+        )
+        self.prefetcher.on_query(session_id, normalize_query(search_query) if search_query else None)
+        if retrieval_mode != "reused":
+            conversation.last_context = retrieved_docs or None
+        
+        # Without history the answer depends only on the question and the index
+        answer_key = None
+        if not chat_history and retrieval_mode == "search" and num_context_docs is None:
+            answer_key = (index_generation, normalize_query(question))
+        cached = self.answer_cache.get(answer_key) if answer_key else None
+        
+        # Step 1b: Compress chunks down to the sentences that match the question
+        compression = None
+        generation = None
+        degraded = False
+        cacheable = False
+        if (config.CONTEXT_COMPRESSION and retrieved_docs and query_embedding is not None
+                and cached is None):
+            retrieved_docs, compression = self.compressor.compress(
+                query_embedding, retrieved_docs, config.COMPRESSED_CONTEXT_TOKENS
+            )
+            print(f" Compressed context {compression['original_tokens']} -> "
+                  f"{compression['compressed_tokens']} tokens in {compression['elapsed_ms']} ms")
         
-        if not retrieved_docs:
+        if not retrieved_docs and not chat_history:
+            # Nothing relevant and nothing to follow up on: skip the LLM call
             answer = "I couldn't find relevant course materials to answer this question."
             sources = []
+        elif cached is not None:
+            print(" Answer served from cache")
+            answer, sources = cached
         else:
             print(f" Found {len(retrieved_docs)} relevant documents")
             
             # Step 2: Prepare context
             context = "\n\n---\n\n".join([
-                f"[{doc['metadata']['source']}] {doc['content']}"
+                f"[{doc.source}] {doc.content}"
                 for doc in retrieved_docs
-            ])
+            ]) or "(No course materials matched this question.)"
             
             # Step 3: Generate answer with conversation history
             print(" Generating answer with Groq...")
             try:
-                answer = self.chain.run(
+                answer, generation = self.generator.run(
+                    self.chain.run,
                     context=context,
                     question=question,
                     chat_history=chat_history
                 )
                 answer = str(answer).strip()
+                cacheable = answer_key is not None
+            except DeadlineExceeded as e:
+                print(f" {e}, answering from the retrieved documents")
+                answer = extractive_answer(question, retrieved_docs)
+                degraded = True
             except Exception as e:
                 print(f" Error generating answer: {e}")
                 answer = f"Error: {str(e)}"
             
             # Step 4: Prepare sources
-            sources = list(set([doc['metadata']['source'] for doc in retrieved_docs]))
+            sources = list(set(source for doc in retrieved_docs for source in doc.all_sources))
+            if cacheable:
+                self.answer_cache.put(answer_key, (answer, sources))
         
         # Step 5: Save to memory for next conversation
-        self.memory.save_context(
-            {"input": question},
-            {"output": answer}
-        )
-        
-        # Count turns
-        buffer_text = self.memory.buffer if hasattr(self.memory, 'buffer') else ""
-        conversation_turn = buffer_text.count('Student:')
+        conversation_turn = conversation.add_turn(question, answer)
         
         result = {
             "question": question,
             "answer": answer,
             "sources": sources,
             "num_context_docs": len(retrieved_docs),
-            "conversation_turn": conversation_turn
+            "conversation_turn": conversation_turn,
+            "retrieval_mode": retrieval_mode,
+            "compression": compression,
+            "generation": generation,
+            "degraded": degraded,
+            "answer_cached": cached is not None
         }
         
         print(f" Answer generated (Turn {conversation_turn})")
         return result
     
-    def get_conversation_history(self) -> List[Dict]:
-        """Get the current conversation history"""
-        history = []
-        
-        # Get buffer from memory
-        buffer_text = self.memory.buffer if hasattr(self.memory, 'buffer') else ""
-        
-        # Parse the conversation from buffer
-        lines = buffer_text.split('\n')
-        for line in lines:
-            if line.strip().startswith('Student:'):
-                history.append({
-                    "role": "student",
-                    "content": line.replace('Student:', '').strip()
-                })
-            elif line.strip().startswith('Assistant:'):
-                history.append({
-                    "role": "assistant",
-                    "content": line.replace('Assistant:', '').strip()
-                })
-        
-        return history
+    def _retrieve(self, question: str, conversation, num_context_docs: int = None):
+        """
+        Get context for a question, reusing the previous turn's chunks for
+        follow-ups
+        
+        "tell me more" / "why?" reuse the cached chunks without embedding or
+        searching. Short questions that refer back ("what are its
+        advantages?") search with the session topic prepended, and the
+        results are merged with the cached chunks.
+        
+        Args:
+            question: Student's question
+            conversation: The session's Conversation
+            num_context_docs: Fixed number of documents to retrieve
+        
+        Returns:
+            Documents, the query embedding (None if not computed), the
+            retrieval mode ("search", "reused" or "condensed") and the
+            search query (None if nothing was searched)
+        """
+        followup, search_query = self._plan_search(question, conversation)
+        if followup == "continuation":
+            print(" Follow-up detected: reusing previous context")
+            return conversation.last_context, None, "reused", None
+        
+        if followup == "reference":
+            print(f" Follow-up detected: searching for '{search_query}'")
+        else:
+            conversation.topic_question = question
+        
+        try:
+            query_embedding = vector_store.embed_query(search_query)
+        except Exception as e:
+            print(f" Embedding error: {e}")
+            query_embedding = None
+        
+        if num_context_docs is None:
+            docs, selection = vector_store.search_adaptive(
+                search_query, query_embedding=query_embedding
+            )
+            print(f" Selected {selection['selected']}/{selection['candidates']} candidates "
+                  f"(stopped by {selection['stopped_by']})")
+        else:
+            docs = vector_store.search(
+                search_query, num_results=num_context_docs, query_embedding=query_embedding
+            )
+        
+        if followup != "reference":
+            return docs, query_embedding, "search", search_query
+        
+        # Extend the previous context with whatever the condensed query adds
+        seen = {doc.content for doc in docs}
+        merged = docs + [doc for doc in conversation.last_context if doc.content not in seen]
+        merged, _ = select_context(
+            merged, max_distance=float("inf"), min_gap=float("inf"),
+            max_tokens=config.MAX_CONTEXT_TOKENS
+        )
+        return merged, query_embedding, "condensed", search_query
     
-    def clear_memory(self):
-        """Clear conversation memory (start fresh conversation)"""
-        self.memory.clear()
+    def _plan_search(self, question: str, conversation):
+        """
+        Decide how a question is retrieved, without changing the conversation
+        
+        Returns:
+            The follow-up kind (see classify_followup) and the query to
+            search with (None for a continuation)
+        """
+        followup = classify_followup(question, bool(conversation.last_context))
+        if followup == "continuation":
+            return followup, None
+        if followup == "reference":
+            return followup, condense_query(question, conversation.topic_question)
+        return followup, question
+    
+    def warm(self, question: str, session_id: str = DEFAULT_SESSION):
+        """
+        Embed and search a (partial) question so the real query hits the caches
+        
+        Args:
+            question: Text typed so far
+            session_id: Conversation the question belongs to
+        
+        Returns:
+            Cache key of the search that was warmed, or None if the
+            question would reuse the previous context
+        """
+        _, search_query = self._plan_search(question, self.conversations.peek(session_id))
+        if search_query is None:
+            return None
+        vector_store.search_adaptive(search_query, query_embedding=vector_store.embed_query(search_query))
+        return normalize_query(search_query)
+    
+    def warm_model(self):
+        """Load the embedding model by embedding a throwaway text"""
+        vector_store.embed_texts(["warm up"])
+    
+    def warm_answer(self, question: str):
+        """
+        Warm the caches for a logged question
+        
+        The question is run through retrieval, which fills the embedding and
+        search caches. With WARM_ANSWERS it is also answered in a throwaway
+        conversation, which fills the answer cache at the cost of an LLM call.
+        
+        Args:
+            question: Question taken from the query log
+        """
+        if not config.WARM_ANSWERS:
+            self.warm(question, WARMUP_SESSION)
+            return
+        with self.conversations.turn(WARMUP_SESSION):
+            try:
+                self._run_turn(question, None, WARMUP_SESSION)
+            finally:
+                self.conversations.clear(WARMUP_SESSION)
+    
+    def get_conversation_history(self, session_id: str = DEFAULT_SESSION,
+                                 after: int = None, limit: int = None) -> List[Dict]:
+        """
+        Get the conversation history of a session
+        
+        Args:
+            session_id: Conversation to read
+            after: Only return messages newer than this message ID
+            limit: Maximum number of messages (None returns all)
+        
+        Returns:
+            Messages with id, role, content and created_at
+        """
+        conversation = self.conversations.peek(session_id)
+        page, _, _ = conversation.page(after, limit if limit is not None else len(conversation.messages))
+        return [message.to_dict() for message in page]
+    
+    def clear_memory(self, session_id: str = DEFAULT_SESSION):
+        """Clear conversation memory (start fresh conversation, after any turn in flight)"""
+        with self.conversations.turn(session_id):
+            self.conversations.clear(session_id)
         print(" Conversation memory cleared")
     
-    def get_memory_summary(self) -> dict:
+    def get_memory_summary(self, session_id: str = DEFAULT_SESSION) -> dict:
         """Get summary of current conversation"""
-        buffer_text = self.memory.buffer if hasattr(self.memory, 'buffer') else ""
-        
-        # Count turns
-        student_count = buffer_text.count('Student:')
-        assistant_count = buffer_text.count('Assistant:')
+        conversation = self.conversations.peek(session_id)
         
         return {
-            "total_turns": max(student_count, assistant_count),
-            "total_messages": student_count + assistant_count,
-            "messages": buffer_text[:500] + "..." if len(buffer_text) > 500 else buffer_text
+            "total_turns": conversation.turns,
+            "total_messages": len(conversation.messages),
+            "messages": conversation.preview(500)
         }
 
-
 # Global instance
 rag_chain = RAGChain()
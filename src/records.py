@@ -0,0 +1,233 @@
+"""
+Records - Compact chunk and search-hit types shared by the pipeline
+"""
+import json
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Iterator, List
+
+# Metadata key listing the near-duplicate chunks collapsed into a stored
+# chunk (see src.dedup)
+DUPLICATES_KEY = "duplicates"
+
+# Metadata key marking chunks loaded from a snapshot, with the snapshot's
+# creation time (see src.snapshot); such files were not indexed locally
+SNAPSHOT_KEY = "snapshot"
+
+
+class Chunk:
+    """One chunk of course text and where it came from"""
+    
+    __slots__ = ("content", "source", "chunk_index", "file_path", "file_hash")
+    
+    def __init__(self, content: str, source: str, chunk_index: int = 0,
+                 file_path: str = "", file_hash: str = ""):
+        self.content = content
+        self.source = source
+        self.chunk_index = chunk_index
+        self.file_path = file_path
+        self.file_hash = file_hash
+    
+    @classmethod
+    def from_metadata(cls, content: str, metadata: dict):
+        """Build a record from a Chroma document and its metadata"""
+        metadata = metadata or {}
+        return cls(
+            content,
+            metadata.get("source", ""),
+            metadata.get("chunk_index", 0),
+            metadata.get("file_path", ""),
+            metadata.get("file_hash", "")
+        )
+    
+    @property
+    def chunk_id(self) -> str:
+        """Stable ID: same file content and position, same ID"""
+        return f"{self.source}_{self.file_hash[:12]}_{self.chunk_index}"
+    
+    @property
+    def metadata(self) -> dict:
+        """Metadata dict in the form Chroma stores it"""
+        return {
+            "source": self.source,
+            "chunk_index": self.chunk_index,
+            "file_path": self.file_path,
+            "file_hash": self.file_hash
+        }
+    
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self._fields()
+        )
+    
+    def __hash__(self) -> int:
+        # Consistent with __eq__; records are not changed once built
+        return hash((type(self),) + tuple(getattr(self, name) for name in self._fields()))
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.source!r}, #{self.chunk_index}, {len(self.content)} chars)"
+    
+    @classmethod
+    def _fields(cls) -> tuple:
+        return tuple(name for klass in reversed(cls.__mro__) for name in getattr(klass, "__slots__", ()))
+
+
+class Hit(Chunk):
+    """A retrieved chunk with its cosine distance to the query"""
+    
+    __slots__ = ("distance", "also_in")
+    
+    def __init__(self, content: str, source: str, chunk_index: int = 0,
+                 file_path: str = "", file_hash: str = "", distance: float = 0.0,
+                 also_in: tuple = ()):
+        # Assigned inline rather than via super(): hits are built per result
+        self.content = content
+        self.source = source
+        self.chunk_index = chunk_index
+        self.file_path = file_path
+        self.file_hash = file_hash
+        self.distance = distance
+        self.also_in = also_in  # Sources of near-duplicates collapsed into this chunk
+    
+    @classmethod
+    def from_metadata(cls, content: str, metadata: dict, distance: float = 0.0):
+        """Build a hit from a Chroma query result"""
+        get = (metadata or {}).get
+        duplicates = get(DUPLICATES_KEY)
+        also_in = tuple(entry["source"] for entry in json.loads(duplicates)) if duplicates else ()
+        return cls(content, get("source", ""), get("chunk_index", 0),
+                   get("file_path", ""), get("file_hash", ""), distance, also_in)
+    
+    @property
+    def all_sources(self) -> List[str]:
+        """This chunk's source and those of its collapsed duplicates, without repeats"""
+        return list(dict.fromkeys((self.source,) + self.also_in))
+    
+    def with_content(self, content: str) -> "Hit":
+        """Copy of this hit with different text (same source and distance)"""
+        return Hit(content, self.source, self.chunk_index, self.file_path, self.file_hash,
+                   self.distance, self.also_in)
+
+
+class ChunkBatch:
+    """
+    Column-oriented chunks for bulk indexing
+    
+    Texts and chunk indexes are stored as columns, and the per-file fields
+    (source, path, hash) once per file rather than once per chunk, so a
+    corpus of many chunks costs a few containers instead of one object and
+    one metadata dict per chunk. Iterating yields Chunk rows.
+    """
+    
+    __slots__ = ("contents", "chunk_indexes", "_files", "_file_ends")
+    
+    def __init__(self):
+        self.contents: List[str] = []
+        self.chunk_indexes = array("l")
+        self._files: List[tuple] = []  # (source, file_path, file_hash) per file
+        self._file_ends = array("l")  # Row after the last chunk of each file
+    
+    def add_file(self, source: str, file_path: str, file_hash: str, contents: List[str],
+                 chunk_indexes: Iterable[int] = None):
+        """
+        Append the chunks of one file
+        
+        Args:
+            source: Document name shown to students
+            file_path: Path the file was read from
+            file_hash: Content hash of the file
+            contents: Chunk texts in order
+            chunk_indexes: Position of each chunk in the file (defaults to 0, 1, ...)
+        """
+        if not contents:
+            return
+        self.contents.extend(contents)
+        self.chunk_indexes.extend(range(len(contents)) if chunk_indexes is None else chunk_indexes)
+        self._files.append((source, file_path, file_hash))
+        self._file_ends.append(len(self.contents))
+    
+    def extend(self, other: "ChunkBatch"):
+        """Append all chunks of another batch"""
+        start = 0
+        for (source, file_path, file_hash), end in zip(other._files, other._file_ends):
+            self.contents.extend(other.contents[start:end])
+            self.chunk_indexes.extend(other.chunk_indexes[start:end])
+            self._files.append((source, file_path, file_hash))
+            self._file_ends.append(len(self.contents))
+            start = end
+    
+    @classmethod
+    def from_chunks(cls, chunks: List[Chunk]) -> "ChunkBatch":
+        """Build a batch from chunk records"""
+        batch = cls()
+        for chunk in chunks:
+            if batch._files and batch._files[-1] == (chunk.source, chunk.file_path, chunk.file_hash):
+                batch.contents.append(chunk.content)
+                batch.chunk_indexes.append(chunk.chunk_index)
+                batch._file_ends[-1] += 1
+            else:
+                batch.add_file(chunk.source, chunk.file_path, chunk.file_hash,
+                               [chunk.content], [chunk.chunk_index])
+        return batch
+    
+    def __len__(self) -> int:
+        return len(self.contents)
+    
+    def _file_at(self, row: int) -> tuple:
+        return self._files[bisect_right(self._file_ends, row)]
+    
+    def __getitem__(self, row: int) -> Chunk:
+        if row < 0:
+            row += len(self.contents)
+        if not 0 <= row < len(self.contents):
+            raise IndexError("ChunkBatch index out of range")
+        source, file_path, file_hash = self._file_at(row)
+        return Chunk(self.contents[row], source, self.chunk_indexes[row], file_path, file_hash)
+    
+    def __iter__(self) -> Iterator[Chunk]:
+        start = 0
+        for (source, file_path, file_hash), end in zip(self._files, self._file_ends):
+            for row in range(start, end):
+                yield Chunk(self.contents[row], source, self.chunk_indexes[row], file_path, file_hash)
+            start = end
+    
+    def slice(self, start: int, stop: int) -> "ChunkBatch":
+        """Rows [start, stop) as a new batch (texts are shared, not copied)"""
+        part = ChunkBatch()
+        stop = min(stop, len(self.contents))
+        first = bisect_right(self._file_ends, start)
+        row = start
+        for file_idx in range(first, len(self._files)):
+            if row >= stop:
+                break
+            end = min(self._file_ends[file_idx], stop)
+            source, file_path, file_hash = self._files[file_idx]
+            part.add_file(source, file_path, file_hash, self.contents[row:end], self.chunk_indexes[row:end])
+            row = end
+        return part
+    
+    def ids(self) -> List[str]:
+        """Chunk IDs in row order (see Chunk.chunk_id)"""
+        ids = []
+        start = 0
+        for (source, _, file_hash), end in zip(self._files, self._file_ends):
+            prefix = f"{source}_{file_hash[:12]}_"
+            ids.extend(prefix + str(index) for index in self.chunk_indexes[start:end])
+            start = end
+        return ids
+    
+    def metadatas(self) -> List[dict]:
+        """Chroma metadata dicts in row order, built only when writing"""
+        metadatas = []
+        start = 0
+        for (source, file_path, file_hash), end in zip(self._files, self._file_ends):
+            metadatas.extend(
+                {"source": source, "chunk_index": index, "file_path": file_path, "file_hash": file_hash}
+                for index in self.chunk_indexes[start:end]
+            )
+            start = end
+        return metadatas
+    
+    def sources(self) -> List[str]:
+        """Names of the files in the batch"""
+        return [source for source, _, _ in self._files]
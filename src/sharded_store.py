@@ -0,0 +1,441 @@
+"""
+Sharded Vector Index - Chunks partitioned across shard processes, searched scatter-gather
+
+Each shard process holds its own QuantizedIndex over a slice of the corpus.
+A query is sent to every shard at once, the shards search their slices in
+parallel on separate cores, and their top-k lists are merged into the
+global top-k. With one core per shard, a corpus that grows by a shard's
+worth of chunks per added core keeps the same search latency.
+
+A single-file change only touches the shards that hold its chunks, plus the
+smallest shard, which takes its new chunks; a full re-index rebalances.
+"""
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from src.config import config
+from src.quantized_store import QuantizedIndex
+
+
+class ShardError(RuntimeError):
+    """A shard failed or stopped while serving a request"""
+
+
+def _shard_main(index_dir: str, conn):
+    """Shard process: answer load/update/search requests for one slice"""
+    index = QuantizedIndex(index_dir)
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        command = request[0]
+        try:
+            if command == "stop":
+                conn.send(("ok", None))
+                return
+            if command == "load":
+                index = QuantizedIndex(request[1])
+                conn.send(("ok", index.count))
+            elif command == "contains":
+                conn.send(("ok", index.searchable(request[1])))
+            elif command == "update":
+                applied = index.update(request[1], request[2], request[3])
+                conn.send(("ok", (applied, index.count)))
+            elif command == "search":
+                start = time.perf_counter()
+                hits = index.search(request[1], request[2])
+                conn.send(("ok", (hits, (time.perf_counter() - start) * 1000)))
+            else:
+                conn.send(("error", f"unknown command {command!r}"))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def partition(ids: List[str], num_shards: int) -> List[np.ndarray]:
+    """
+    Split rows evenly across shards
+    
+    Rows are dealt out in ID order, so every shard gets the same number of
+    chunks (within one) whatever the corpus looks like.
+    
+    Args:
+        ids: Chunk IDs
+        num_shards: Number of shards
+    
+    Returns:
+        Row numbers assigned to each shard
+    """
+    order = np.argsort(np.asarray(ids, dtype=object), kind="stable")
+    return [np.sort(order[shard::num_shards]) for shard in range(num_shards)]
+
+
+class ShardedIndex:
+    """Coordinator for the shard processes"""
+    
+    def __init__(self, num_shards: int = None, index_root: str = None):
+        """
+        Initialize coordinator (processes start on first use)
+        
+        Args:
+            num_shards: Shard processes to run
+            index_root: Directory holding one subdirectory per index
+                build, with one QuantizedIndex per shard
+        """
+        self.num_shards = max(1, config.SHARD_COUNT if num_shards is None else num_shards)
+        self.index_root = Path(index_root or config.SHARD_INDEX_PATH)
+        # The current build is recorded on disk so a restarted server can
+        # load it without re-reading every vector from Chroma
+        self.current_path = self.index_root / "current.json"
+        self.current_build: Optional[str] = None  # Build directory the shards serve
+        self.collection: Optional[str] = None
+        self.sizes: List[int] = []
+        try:
+            current = json.loads(self.current_path.read_text())
+            if len(current["shard_sizes"]) == self.num_shards:
+                self.current_build, self.sizes = current["build"], current["shard_sizes"]
+                self.collection = current.get("collection")
+        except (OSError, ValueError, KeyError):
+            pass
+        
+        # Spawned, not forked: shards must not inherit the parent's
+        # threads, ONNX sessions or Chroma client
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = []
+        self._conns = []
+        self._locks: List[threading.Lock] = []
+        self._start_lock = threading.Lock()
+        
+        self._stats_lock = threading.Lock()
+        self.queries = 0
+        self.total_ms = 0.0
+        self.shard_ms = [0.0] * self.num_shards
+        self.restarts = 0
+    
+    @property
+    def ready(self) -> bool:
+        """Whether the shards hold a loaded index"""
+        return self.current_build is not None and sum(self.sizes) > 0
+    
+    def _shard_dir(self, build: str, shard: int) -> Path:
+        """Directory of one shard's QuantizedIndex within a build"""
+        return self.index_root / build / f"shard_{shard}"
+    
+    def _save_current(self):
+        """Record the current build and shard sizes for restarts"""
+        tmp_path = self.current_path.with_name("current.json.tmp")
+        tmp_path.write_text(json.dumps({"build": self.current_build, "collection": self.collection,
+                                        "shard_sizes": self.sizes}))
+        os.replace(tmp_path, self.current_path)
+    
+    def _spawn(self, shard: int):
+        """Start one shard process on its slice of the current build"""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_shard_main,
+            args=(str(self._shard_dir(self.current_build or "_empty", shard)), child_conn),
+            name=f"vector-shard-{shard}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+    
+    def _restart(self, shard: int):
+        """Replace a shard process that died or lost its place (caller holds the shard's lock)"""
+        process = self._processes[shard]
+        if process.is_alive():
+            process.terminate()
+        process.join(timeout=5)
+        self._conns[shard].close()
+        self._processes[shard], self._conns[shard] = self._spawn(shard)
+        with self._stats_lock:
+            self.restarts += 1
+        print(f" Restarted search shard {shard}")
+    
+    def start(self):
+        """Start the shard processes if they are not running"""
+        with self._start_lock:
+            if self._processes:
+                return
+            for shard in range(self.num_shards):
+                process, conn = self._spawn(shard)
+                self._processes.append(process)
+                self._conns.append(conn)
+                self._locks.append(threading.Lock())
+            print(f" Started {self.num_shards} search shard process(es)")
+    
+    def stop(self):
+        """Stop the shard processes"""
+        with self._start_lock:
+            for conn, lock, process in zip(self._conns, self._locks, self._processes):
+                with lock:
+                    try:
+                        conn.send(("stop",))
+                        conn.recv()
+                    except (EOFError, OSError):
+                        pass
+                process.join(timeout=5)
+            self._processes, self._conns, self._locks = [], [], []
+    
+    def _scatter(self, request) -> list:
+        """
+        Send a request to every shard, then collect every reply
+        
+        A shard process found dead is restarted before it is sent the
+        request. One that dies while serving it is restarted afterwards and
+        the request fails, so the caller can fall back to Chroma.
+        
+        Args:
+            request: One request for all shards, or a list with one per
+                shard (None skips that shard)
+        
+        Returns:
+            Reply values in shard order (None for skipped shards)
+        
+        Raises:
+            ShardError: If a shard failed or stopped
+        """
+        self.start()
+        requests = request if isinstance(request, list) else [request] * self.num_shards
+        replies = [None] * self.num_shards
+        taken, sent, lost = [], [], []
+        try:
+            # Locks are taken in shard order, so concurrent scatters cannot deadlock
+            for shard, shard_request in enumerate(requests):
+                if shard_request is None:
+                    continue
+                self._locks[shard].acquire()
+                taken.append(shard)
+                if not self._processes[shard].is_alive():
+                    self._restart(shard)
+                try:
+                    self._conns[shard].send(shard_request)
+                    sent.append(shard)
+                except OSError:
+                    lost.append(shard)
+            for shard in sent:
+                try:
+                    replies[shard] = self._conns[shard].recv()
+                except (EOFError, OSError):
+                    lost.append(shard)
+        finally:
+            try:
+                for shard in lost:
+                    self._restart(shard)
+            finally:
+                for shard in taken:
+                    self._locks[shard].release()
+        
+        if lost:
+            raise ShardError(f"shard {lost[0]} stopped and was restarted")
+        errors = [reply[1] for reply in replies if reply is not None and reply[0] == "error"]
+        if errors:
+            raise ShardError(f"shard error: {errors[0]}")
+        return [reply if reply is None else reply[1] for reply in replies]
+    
+    def build(self, ids: List[str], embeddings, collection: str) -> dict:
+        """
+        Partition vectors evenly across the shards and load them
+        
+        Every build re-partitions the whole corpus, so shards stay balanced
+        as files are added and removed, and a changed SHARD_COUNT takes
+        effect on the next re-index.
+        
+        Args:
+            ids: Chunk IDs, one per vector
+            embeddings: (n, dimension) vectors
+            collection: Name of the collection the vectors came from
+        
+        Returns:
+            Shard sizes and build time
+        """
+        start = time.perf_counter()
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        build_dir = f"{collection}_{int(time.time() * 1000)}"
+        sizes = []
+        for shard, rows in enumerate(partition(ids, self.num_shards)):
+            if len(rows):  # A shard left empty (fewer chunks than shards) just returns nothing
+                QuantizedIndex(str(self._shard_dir(build_dir, shard))).build(
+                    [ids[row] for row in rows], vectors[rows], {"collection": collection, "shard": shard}
+                )
+            sizes.append(len(rows))
+        
+        # Each shard switches to its new slice between two searches
+        self._scatter([("load", str(self._shard_dir(build_dir, shard))) for shard in range(self.num_shards)])
+        previous, self.current_build, self.sizes = self.current_build, build_dir, sizes
+        self.collection = collection
+        self._save_current()
+        if previous and previous != build_dir:
+            shutil.rmtree(self.index_root / previous, ignore_errors=True)
+        
+        report = {
+            "shards": self.num_shards,
+            "vectors": len(ids),
+            "shard_sizes": sizes,
+            "imbalance": round(max(sizes) / (len(ids) / self.num_shards), 3) if ids else 1.0,
+            "build_s": round(time.perf_counter() - start, 3)
+        }
+        print(f" Sharded index built: {len(ids)} vectors over {self.num_shards} shard(s) {sizes}")
+        return report
+    
+    def update(self, add_ids: List[str], add_embeddings, remove_ids: List[str]) -> bool:
+        """
+        Apply a single-file change to the shards it touches
+        
+        Removals go to every shard and change only those holding the chunks.
+        New chunks all go to the smallest shard, so shards drift apart only
+        until the next full build re-partitions the corpus.
+        
+        Args:
+            add_ids: IDs of added chunks (IDs already searchable are skipped)
+            add_embeddings: Vectors of the added chunks
+            remove_ids: IDs of deleted chunks
+        
+        Returns:
+            False if there is no index or a shard's change has grown too
+            large for an update, in which case the caller should rebuild
+        """
+        if not self.ready:
+            return False
+        add_ids, remove_ids = list(add_ids), list(remove_ids)
+        held = set()
+        if add_ids:
+            for found in self._scatter(("contains", add_ids)):
+                held.update(found)
+        rows = [row for row, chunk_id in enumerate(add_ids) if chunk_id not in held]
+        if not rows and not remove_ids:
+            return True
+        
+        vectors = np.asarray(add_embeddings, dtype=np.float32)
+        target = min((shard for shard in range(self.num_shards) if self.sizes[shard]),
+                     key=lambda shard: self.sizes[shard])
+        requests = []
+        for shard in range(self.num_shards):
+            if shard == target and rows:
+                requests.append(("update", [add_ids[row] for row in rows], vectors[rows], remove_ids))
+            else:
+                requests.append(("update", [], [], remove_ids) if remove_ids else None)
+        
+        replies = self._scatter(requests)
+        applied = [reply for reply in replies if reply is not None]
+        for shard, reply in enumerate(replies):
+            if reply is not None:
+                self.sizes[shard] = reply[1]
+        self._save_current()
+        return all(done for done, _ in applied)
+    
+    def search(self, query_embedding: List[float], k: int) -> List[Tuple[str, float]]:
+        """
+        Search every shard in parallel and merge their results
+        
+        Args:
+            query_embedding: Query vector
+            k: Number of results
+        
+        Returns:
+            Global top-k (chunk ID, cosine distance) pairs, nearest first
+        """
+        if not self.ready:
+            return []
+        start = time.perf_counter()
+        replies = self._scatter(("search", np.asarray(query_embedding, dtype=np.float32), k))
+        merged = heapq.nsmallest(k, (hit for hits, _ in replies for hit in hits), key=lambda hit: hit[1])
+        
+        with self._stats_lock:
+            self.queries += 1
+            self.total_ms += (time.perf_counter() - start) * 1000
+            for shard, (_, elapsed_ms) in enumerate(replies):
+                self.shard_ms[shard] += elapsed_ms
+        return merged
+    
+    def get_stats(self) -> dict:
+        """Shard sizes and fan-out latency"""
+        with self._stats_lock:
+            queries = self.queries
+            return {
+                "shards": self.num_shards,
+                "running": sum(process.is_alive() for process in self._processes),
+                "restarts": self.restarts,
+                "build": self.current_build,
+                "shard_sizes": list(self.sizes),
+                "queries": queries,
+                "avg_search_ms": round(self.total_ms / queries, 3) if queries else 0.0,
+                "avg_shard_ms": [round(ms / queries, 3) if queries else 0.0 for ms in self.shard_ms]
+            }
+
+
+def benchmark(sizes: List[int], shard_counts: List[int], dimension: int = 384,
+              queries: int = 50, k: int = 8) -> List[dict]:
+    """
+    Measure search latency over synthetic corpora and shard counts
+    
+    Args:
+        sizes: Corpus sizes (vectors)
+        shard_counts: Shard counts to try for each size
+        dimension: Vector dimension
+        queries: Queries per measurement
+        k: Results per query
+    
+    Returns:
+        One row per (size, shards) with p50/p95 latency
+    """
+    import tempfile
+    rng = np.random.default_rng(0)
+    rows = []
+    for size in sizes:
+        vectors = rng.normal(size=(size, dimension)).astype(np.float32)
+        ids = [f"chunk_{i}" for i in range(size)]
+        probes = vectors[rng.choice(size, queries)] + rng.normal(0, 0.05, size=(queries, dimension))
+        for num_shards in shard_counts:
+            with tempfile.TemporaryDirectory() as root:
+                index = ShardedIndex(num_shards, root)
+                try:
+                    index.build(ids, vectors, "bench")
+                    latencies = []
+                    for probe in probes:
+                        start = time.perf_counter()
+                        index.search(probe, k)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                finally:
+                    index.stop()
+            latencies.sort()
+            rows.append({
+                "vectors": size,
+                "shards": num_shards,
+                "p50_ms": round(latencies[len(latencies) // 2], 2),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2)
+            })
+            print(f" {size:>9} vectors  {num_shards:>2} shard(s)  p50 {rows[-1]['p50_ms']:>8.2f} ms  "
+                  f"p95 {rows[-1]['p95_ms']:>8.2f} ms")
+    return rows
+
+
+def main(argv: list = None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Build or benchmark the sharded vector index")
+    parser.add_argument("command", choices=["build", "bench"])
+    parser.add_argument("--sizes", default="100000,200000,400000", help="Corpus sizes for bench")
+    parser.add_argument("--shards", default="1,2,4", help="Shard counts for bench")
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args(argv)
+    
+    if args.command == "build":
+        from src.vector_store import vector_store
+        print(json.dumps(vector_store.build_sharded_index(), indent=2))
+        return
+    
+    benchmark([int(size) for size in args.sizes.split(",")],
+              [int(count) for count in args.shards.split(",")], queries=args.queries)
+
+
+if __name__ == "__main__":
+    main()
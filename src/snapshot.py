@@ -0,0 +1,338 @@
+"""
+Index Snapshots - Portable export/import of the indexed corpus
+
+A snapshot holds everything needed to serve queries without touching the
+PDFs or the embedding model: vectors, chunk text, metadata and the ID of the
+model that produced the vectors.
+
+Layout (version 1, little-endian):
+    b"EDUSNAP" + version byte
+    u32 header length + JSON header
+    frames: b"B" + u32 rows + u32 records length + u32 vectors length
+            + sha256(records + vectors) + zlib(JSON records) + float32 vectors
+    trailer: b"E" + u32 total rows + sha256 of all frame digests
+"""
+import argparse
+import hashlib
+import json
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+from urllib.request import urlopen
+import numpy as np
+from src.records import SNAPSHOT_KEY
+
+SNAPSHOT_MAGIC = b"EDUSNAP"
+SNAPSHOT_VERSION = 1
+DEFAULT_BATCH_SIZE = 1000
+
+_U32 = struct.Struct("<I")
+_FRAME = struct.Struct("<cIII32s")
+_TRAILER = struct.Struct("<cI32s")
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot is malformed, corrupt or incompatible"""
+
+
+def iter_snapshot_bytes(collection, embedding_model: str,
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Serialize a collection as a stream of snapshot bytes
+    
+    Args:
+        collection: ChromaDB collection to export
+        embedding_model: ID of the model that produced the stored vectors
+        batch_size: Rows per frame
+    
+    Yields:
+        Consecutive pieces of the snapshot file
+    """
+    count = collection.count()
+    peek = collection.get(limit=1, include=["embeddings"])
+    dimension = len(peek["embeddings"][0]) if peek["embeddings"] else 0
+    
+    header = json.dumps({
+        "format_version": SNAPSHOT_VERSION,
+        "embedding_model": embedding_model,
+        "dimension": dimension,
+        "count": count,
+        "collection_metadata": collection.metadata,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }).encode("utf-8")
+    yield SNAPSHOT_MAGIC + bytes([SNAPSHOT_VERSION]) + _U32.pack(len(header)) + header
+    
+    frame_digests = hashlib.sha256()
+    total = 0
+    for offset in range(0, count, batch_size):
+        batch = collection.get(
+            limit=batch_size,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        if not batch["ids"]:
+            break
+        records = zlib.compress(json.dumps({
+            "ids": batch["ids"],
+            "documents": batch["documents"],
+            "metadatas": batch["metadatas"]
+        }, ensure_ascii=False).encode("utf-8"), 6)
+        vectors = np.asarray(batch["embeddings"], dtype="<f4").tobytes()
+        digest = hashlib.sha256(records + vectors).digest()
+        frame_digests.update(digest)
+        total += len(batch["ids"])
+        yield _FRAME.pack(b"B", len(batch["ids"]), len(records), len(vectors), digest)
+        yield records
+        yield vectors
+    
+    yield _TRAILER.pack(b"E", total, frame_digests.digest())
+
+
+def export_snapshot(collection, path: str, embedding_model: str,
+                    batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """
+    Write a collection snapshot to disk
+    
+    Args:
+        collection: ChromaDB collection to export
+        path: Output file path
+        embedding_model: ID of the model that produced the stored vectors
+        batch_size: Rows per frame
+    
+    Returns:
+        Snapshot header plus file size
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".part")
+    with open(tmp_path, "wb") as f:
+        for piece in iter_snapshot_bytes(collection, embedding_model, batch_size):
+            f.write(piece)
+    tmp_path.replace(path)
+    
+    info = verify_snapshot(str(path))
+    info["size_bytes"] = path.stat().st_size
+    return info
+
+
+def export_store_snapshot(store, path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """
+    Write a snapshot of a vector store's live collection
+    
+    The collection is paged through by offset, so it is held still for the
+    whole export: uploads, deletions and swaps wait until the file is
+    written, and the header's count always matches the rows exported.
+    
+    Args:
+        store: VectorStore to export
+        path: Output file path
+        batch_size: Rows per frame
+    
+    Returns:
+        Snapshot header plus file size
+    """
+    with store.frozen() as collection:
+        return export_snapshot(collection, path, store.embedding_model_id, batch_size)
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise SnapshotError("Snapshot is truncated")
+    return data
+
+
+def read_snapshot(f: BinaryIO) -> Iterator[dict]:
+    """
+    Parse a snapshot stream, verifying every frame as it is read
+    
+    Args:
+        f: Binary file object positioned at the start of a snapshot
+    
+    Yields:
+        The header first, then one dict per frame with ids, documents,
+        metadatas and an (n, dimension) float32 array of embeddings
+    """
+    if _read_exact(f, len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+        raise SnapshotError("Not an EduMate snapshot")
+    version = _read_exact(f, 1)[0]
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version}")
+    (header_len,) = _U32.unpack(_read_exact(f, _U32.size))
+    try:
+        header = json.loads(_read_exact(f, header_len))
+        dimension, expected_count = int(header["dimension"]), int(header["count"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise SnapshotError(f"Malformed snapshot header: {e}") from e
+    yield header
+    
+    frame_digests = hashlib.sha256()
+    total = 0
+    while True:
+        kind = _read_exact(f, 1)
+        if kind == b"E":
+            rest = _read_exact(f, _TRAILER.size - 1)
+            _, trailer_total, trailer_digest = _TRAILER.unpack(kind + rest)
+            if trailer_total != total or trailer_total != expected_count:
+                raise SnapshotError(
+                    f"Row count mismatch: header {expected_count}, "
+                    f"trailer {trailer_total}, read {total}"
+                )
+            if trailer_digest != frame_digests.digest():
+                raise SnapshotError("Snapshot checksum mismatch")
+            return
+        if kind != b"B":
+            raise SnapshotError("Corrupt frame marker")
+        
+        rest = _read_exact(f, _FRAME.size - 1)
+        _, rows, records_len, vectors_len, digest = _FRAME.unpack(kind + rest)
+        records = _read_exact(f, records_len)
+        vectors = _read_exact(f, vectors_len)
+        if hashlib.sha256(records + vectors).digest() != digest:
+            raise SnapshotError(f"Checksum mismatch in frame starting at row {total}")
+        frame_digests.update(digest)
+        
+        try:
+            data = json.loads(zlib.decompress(records))
+            embeddings = np.frombuffer(vectors, dtype="<f4").reshape(rows, dimension)
+            consistent = all(len(data[key]) == rows for key in ("ids", "documents", "metadatas"))
+        except (ValueError, KeyError, TypeError, zlib.error) as e:
+            raise SnapshotError(f"Malformed frame starting at row {total}: {e}") from e
+        if not consistent:
+            raise SnapshotError(f"Frame starting at row {total} has inconsistent length")
+        data["embeddings"] = embeddings
+        total += rows
+        yield data
+
+
+def verify_snapshot(path: str) -> dict:
+    """
+    Check a snapshot file end to end without importing it
+    
+    Args:
+        path: Snapshot file path
+    
+    Returns:
+        Snapshot header
+    """
+    with open(path, "rb") as f:
+        frames = read_snapshot(f)
+        header = next(frames)
+        for _ in frames:
+            pass
+    return header
+
+
+def import_snapshot(store, path: str) -> dict:
+    """
+    Replace the contents of a vector store with a snapshot
+    
+    The file is verified in full and then loaded into a shadow collection
+    that is swapped in once validated (see VectorStore.rebuild), so a
+    corrupt or incompatible snapshot leaves the current index in place
+    and queries are served throughout.
+    
+    Args:
+        store: VectorStore to load into
+        path: Snapshot file path
+    
+    Returns:
+        Snapshot header plus the imported row count
+    """
+    header = verify_snapshot(path)
+    if header.get("embedding_model") != store.embedding_model_id:
+        raise SnapshotError(
+            f"Snapshot was built with {header.get('embedding_model')}, "
+            f"this node uses {store.embedding_model_id}"
+        )
+    
+    def fill(collection) -> int:
+        imported = 0
+        with open(path, "rb") as f:
+            frames = read_snapshot(f)
+            next(frames)
+            origin = header.get("created_at") or "unknown"
+            for frame in frames:
+                collection.add(
+                    ids=frame["ids"],
+                    embeddings=frame["embeddings"].tolist(),
+                    documents=frame["documents"],
+                    # Marked so the folder watcher leaves them alone
+                    metadatas=[{**(metadata or {}), SNAPSHOT_KEY: origin} for metadata in frame["metadatas"]]
+                )
+                imported += len(frame["ids"])
+                print(f" Imported {imported}/{header['count']} documents")
+        return imported
+    
+    # Loaded into a shadow collection; an explicit import may shrink the index.
+    # The shadow gets this node's HNSW settings, not the exporting node's
+    # (which stay in the header as "collection_metadata")
+    report = store.rebuild(fill, min_count_ratio=0)
+    if not report["ok"]:
+        raise SnapshotError(f"Imported index failed validation: {'; '.join(report['problems'])}")
+    header["imported"] = report["count"]
+    return header
+
+
+def download_snapshot(url: str, path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Stream a snapshot from another node to a local file
+    
+    Args:
+        url: Export URL (e.g. http://node-1:8000/api/snapshot/export)
+        path: Destination file path
+        chunk_size: Bytes read per iteration
+    
+    Returns:
+        The destination path
+    """
+    with urlopen(url) as response, open(path, "wb") as f:
+        for block in iter(lambda: response.read(chunk_size), b""):
+            f.write(block)
+    return path
+
+
+def main(argv: Optional[list] = None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(
+        description="Export or import an EduMate index snapshot",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m src.snapshot export corpus.edusnap
+  python -m src.snapshot verify corpus.edusnap
+  python -m src.snapshot import corpus.edusnap
+  python -m src.snapshot import http://node-1:8000/api/snapshot/export
+        """
+    )
+    parser.add_argument("command", choices=["export", "import", "verify"])
+    parser.add_argument("path", help="Snapshot file (or URL for import)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.command == "verify":
+            info = verify_snapshot(args.path)
+        else:
+            from src.vector_store import vector_store
+            
+            if args.command == "export":
+                info = export_store_snapshot(vector_store, args.path, args.batch_size)
+            elif args.path.startswith(("http://", "https://")):
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    local_path = download_snapshot(args.path, str(Path(tmp_dir) / "snapshot.edusnap"))
+                    info = import_snapshot(vector_store, local_path)
+            else:
+                info = import_snapshot(vector_store, args.path)
+    except (SnapshotError, OSError) as e:
+        print(f" Snapshot error: {e}")
+        sys.exit(1)
+    
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,33 @@
 """
 Vector Store - ChromaDB integration for RAG
 """
-from typing import List
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import chromadb
+from chromadb.utils import embedding_functions
 from pathlib import Path
 from src.config import config
 from src.pdf_loader import pdf_loader
+from src.records import DUPLICATES_KEY, SNAPSHOT_KEY, ChunkBatch, Hit
+from src.context_selection import select_context
+from src.profiler import profiler
+from src.quantized_store import QuantizedIndex
+from src.sharded_store import ShardedIndex, ShardError
+from src.embedding_service import EmbeddingBatcher, ThreadedONNXEmbedding
+from src.cache import LRUCache, embedding_key, normalize_query
+from src.ingest_pipeline import IngestPipeline
+from src.dedup import NearDuplicateIndex, dump_duplicates, load_duplicates, split_duplicates
+
+# Vectors are produced by ChromaDB's default embedding function; snapshots
+# record this so they are never loaded into a node using a different model
+EMBEDDING_MODEL_ID = "chromadb-default/all-MiniLM-L6-v2"
+
+# Chroma's values for HNSW parameters a collection was created without
+HNSW_DEFAULTS = {"M": 16, "construction_ef": 100, "search_ef": 10}
 
 class VectorStore:
     """Manage ChromaDB vector database"""
@@ -21,86 +43,861 @@ class VectorStore:
         )
         
         self.collection_name = "course_materials"
+        self.collection_metadata = self.hnsw_metadata()
+        self.embedding_model_id = EMBEDDING_MODEL_ID
+        if config.EMBED_INTRA_OP_THREADS or config.EMBED_INTER_OP_THREADS:
+            self.embedding_function = ThreadedONNXEmbedding(config.EMBED_INTRA_OP_THREADS,
+                                                            config.EMBED_INTER_OP_THREADS)
+        else:
+            self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
         
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
+        # Concurrent query embeddings share one forward pass
+        # (late-bound so a replaced embed_texts is picked up)
+        self.query_embedder = (
+            EmbeddingBatcher(lambda texts: self.embed_texts(texts)) if config.EMBED_BATCHING else None
         )
+        
+        # Query embeddings never go stale; search results are keyed by the
+        # index generation, which every write and every swap bumps
+        self.embedding_cache = LRUCache(config.QUERY_EMBEDDING_CACHE_SIZE)
+        self.search_cache = LRUCache(config.SEARCH_CACHE_SIZE)
+        self.index_generation = 0
+        self.last_ingest_stats: Optional[dict] = None
+        
+        # MinHash signatures of the stored chunks, built on first single-file
+        # update and dropped when the collection is rebuilt
+        self._dedup_index: Optional[NearDuplicateIndex] = None
+        self._dedup_lock = threading.Lock()
+        
+        # Optional int8 index used instead of Chroma's HNSW (VECTOR_BACKEND=quantized)
+        self.quantized_index = QuantizedIndex()
+        
+        # Optional scatter-gather index over shard processes (VECTOR_BACKEND=sharded)
+        self.sharded_index = ShardedIndex()
+        
+        # Full rebuilds go into a shadow collection that is swapped in once
+        # validated; the live and previous collection names are persisted
+        self.generations_path = Path(config.CHROMA_DB_PATH) / "generations.json"
+        self.generations = self._load_generations()
+        self._swap_lock = threading.Lock()  # One rebuild or rollback at a time
+        # Single-file writes to the live collection; exports hold it so the
+        # collection stays still while it is paged through
+        self._write_lock = threading.RLock()
+        self._pending_changes: Optional[set] = None  # Files changed during a rebuild
+        
+        # Get or create collection. An existing collection is opened as is:
+        # passing changed HNSW settings would rewrite its metadata without
+        # changing the index it was built with
+        try:
+            self.collection = self._get_collection(self.generations["live"])
+        except ValueError:
+            self.collection = self.client.create_collection(
+                name=self.generations["live"],
+                metadata=self.collection_metadata,
+                embedding_function=self.embedding_function
+            )
+        changes = self.hnsw_changes()
+        if changes:
+            print(f" HNSW settings differ from the live index {changes}; "
+                  f"they apply after POST /api/index/hnsw or a re-index")
     
-    def index_pdfs(self):
+    def hnsw_metadata(self, params: dict = None) -> dict:
+        """
+        Collection metadata with the configured HNSW parameters
+        
+        Args:
+            params: Overrides for "M", "construction_ef" and "search_ef"
+        
+        Returns:
+            Chroma collection metadata
+        """
+        settings = {"M": config.HNSW_M, "construction_ef": config.HNSW_CONSTRUCTION_EF,
+                    "search_ef": config.HNSW_SEARCH_EF}
+        settings.update(config.HNSW_COLLECTION_PARAMS.get(self.collection_name, {}))
+        settings.update(params or {})
+        unknown = set(settings) - set(HNSW_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown HNSW parameter(s): {', '.join(sorted(unknown))}")
+        return {"hnsw:space": "cosine", **{f"hnsw:{key}": int(value) for key, value in settings.items()}}
+    
+    def hnsw_changes(self) -> Dict[str, tuple]:
+        """HNSW parameters whose configured value differs from the live collection's (live, configured)"""
+        live = self.collection.metadata or {}
+        changes = {}
+        for key, default in HNSW_DEFAULTS.items():
+            current = live.get(f"hnsw:{key}", default)
+            wanted = self.collection_metadata[f"hnsw:{key}"]
+            if current != wanted:
+                changes[key] = (current, wanted)
+        return changes
+    
+    def rebuild_hnsw(self, batch_size: int = 1000) -> dict:
+        """
+        Rebuild the live collection's HNSW index with the configured parameters
+        
+        The stored vectors, documents and metadata are copied into a shadow
+        collection (nothing is re-extracted or re-embedded), which is
+        validated and swapped in like a re-index.
+        
+        Returns:
+            Rebuild report (see rebuild), plus the old and new parameters
+        """
+        source = self.collection
+        changes = self.hnsw_changes()
+        
+        def fill(shadow) -> int:
+            copied = 0
+            for offset in range(0, source.count(), batch_size):
+                batch = source.get(limit=batch_size, offset=offset,
+                                   include=["embeddings", "documents", "metadatas"])
+                if batch["ids"]:
+                    shadow.add(ids=batch["ids"], embeddings=batch["embeddings"],
+                               documents=batch["documents"], metadatas=batch["metadatas"])
+                    copied += len(batch["ids"])
+            return copied
+        
+        start = time.time()
+        report = self.rebuild(fill, metadata=self.collection_metadata)
+        report["hnsw_changes"] = changes
+        report["build_s"] = round(time.time() - start, 2)
+        return report
+    
+    def _load_generations(self) -> dict:
+        try:
+            return json.loads(self.generations_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f" Ignoring unreadable index generation file {self.generations_path}: {e}")
+        return {"generation": 0, "live": self.collection_name, "previous": None}
+    
+    def _save_generations(self):
+        tmp_path = self.generations_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.generations, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.generations_path)
+    
+    def _get_collection(self, name: str):
+        return self.client.get_collection(name=name, embedding_function=self.embedding_function)
+    
+    def _drop_collection(self, name: str):
+        try:
+            self.client.delete_collection(name)
+        except ValueError:
+            pass  # Already gone
+    
+    def rebuild(self, fill: Callable[[object], int], metadata: dict = None,
+                min_count_ratio: float = None) -> dict:
+        """
+        Build a new index generation in a shadow collection and swap it in
+        
+        Queries keep being served from the live collection while the shadow
+        is filled. The shadow is validated (chunk count and sample queries)
+        and only then replaces the live collection, which is kept as the
+        previous generation for rollback. A shadow that fails validation is
+        dropped and the live collection is left as it was.
+        
+        Args:
+            fill: Writes the new index into the given collection and returns
+                the number of chunks it wrote
+            metadata: Collection metadata (defaults to the standard settings)
+            min_count_ratio: Reject a shadow with fewer chunks than this
+                fraction of the live collection (defaults to config)
+        
+        Returns:
+            Validation report, with "ok" telling whether the swap happened
+        """
+        with self._swap_lock:
+            generation = self.generations["generation"] + 1
+            name = f"{self.collection_name}_g{generation}"
+            self._drop_collection(name)  # Left over from an interrupted rebuild
+            shadow = self.client.create_collection(
+                name=name,
+                metadata=metadata or self.collection_metadata,
+                embedding_function=self.embedding_function
+            )
+            self._pending_changes = set()
+            try:
+                expected = fill(shadow)
+                report = self.validate_shadow(shadow, expected, min_count_ratio)
+                if report["ok"]:
+                    self._swap_in(shadow, previous=self.generations["live"], generation=generation)
+                else:
+                    print(f" Shadow index rejected: {'; '.join(report['problems'])}")
+                    self._drop_collection(name)
+            except Exception:
+                self._drop_collection(name)
+                raise
+            finally:
+                changed, self._pending_changes = self._pending_changes, None
+        
+        if report["ok"]:
+            # Uploads and deletions made while the shadow was being filled
+            # went to the old collection; apply them to the new one
+            for file_path in sorted(changed):
+                if Path(file_path).exists():
+                    self.index_file(Path(file_path))
+                else:
+                    self.remove_file(Path(file_path))
+        report["replayed_changes"] = len(changed) if report["ok"] else 0
+        return report
+    
+    def validate_shadow(self, shadow, expected_count: int = None, min_count_ratio: float = None) -> dict:
+        """
+        Check a shadow collection before it is put into service
+        
+        Args:
+            shadow: Collection to check
+            expected_count: Chunks that were written to it
+            min_count_ratio: Minimum size relative to the live collection
+        
+        Returns:
+            Report with the counts, sample query results and any problems
+        """
+        min_count_ratio = config.SHADOW_MIN_COUNT_RATIO if min_count_ratio is None else min_count_ratio
+        count = shadow.count()
+        live_count = self.collection.count()
+        problems = []
+        if count == 0:
+            problems.append("shadow collection is empty")
+        if expected_count is not None and count != expected_count:
+            problems.append(f"{count} chunks stored, {expected_count} written")
+        if live_count and count < min_count_ratio * live_count:
+            problems.append(f"{count} chunks vs {live_count} live (below {min_count_ratio:.0%})")
+        
+        # Sample queries: stored vectors, spread over the collection, must
+        # find their own chunk through the new HNSW index
+        samples = min(config.SHADOW_VALIDATION_QUERIES, count)
+        found = 0
+        for i in range(samples):
+            row = shadow.get(limit=1, offset=i * count // samples, include=["embeddings"])
+            result = shadow.query(query_embeddings=row["embeddings"], n_results=1, include=["distances"])
+            if result["ids"][0] and (result["ids"][0][0] == row["ids"][0] or result["distances"][0][0] < 1e-4):
+                found += 1
+        if found < samples:
+            problems.append(f"{samples - found} of {samples} sample queries missed their chunk")
+        
+        return {
+            "ok": not problems,
+            "collection": shadow.name,
+            "count": count,
+            "expected_count": expected_count,
+            "live_count": live_count,
+            "sample_queries": samples,
+            "sample_hits": found,
+            "problems": problems
+        }
+    
+    def _swap_in(self, collection, previous: Optional[str], generation: int):
+        """Put a collection into service (caller holds _swap_lock)"""
+        if config.VECTOR_BACKEND == "quantized":
+            self.build_quantized_index(collection=collection)
+        elif config.VECTOR_BACKEND == "sharded":
+            self.build_sharded_index(collection=collection)
+        
+        old = self.generations
+        # Assign before bumping the generation, so no search can cache the
+        # old collection's results under the new generation
+        self.collection = collection
+        with self._dedup_lock:
+            self._dedup_index = None
+        self._invalidate_search_cache()
+        
+        self.generations = {"generation": generation, "live": collection.name,
+                            "previous": previous, "swapped_at": time.time()}
+        self._save_generations()
+        
+        # Keep one generation back for rollback
+        for name in {old["live"], old.get("previous")} - {collection.name, previous, None}:
+            self._drop_collection(name)
+        print(f" Index generation {collection.name} is live ({collection.count()} chunks), "
+              f"previous: {previous}")
+    
+    @contextmanager
+    def frozen(self):
+        """
+        Hold the live collection still while it is read in full
+        
+        No rebuild, rollback or single-file write changes it until the block
+        exits; those wait for it.
+        
+        Yields:
+            The live collection
+        """
+        with self._swap_lock, self._write_lock:
+            yield self.collection
+    
+    def rollback(self) -> dict:
+        """
+        Put the previous index generation back into service
+        
+        The generation rolled back from becomes the previous one, so the
+        rollback itself can be undone.
+        
+        Returns:
+            The generation state after the rollback
+        
+        Raises:
+            ValueError: There is no previous generation
+        """
+        with self._swap_lock:
+            previous = self.generations.get("previous")
+            if not previous:
+                raise ValueError("No previous index generation to roll back to")
+            self._swap_in(self._get_collection(previous), previous=self.generations["live"],
+                          generation=self.generations["generation"])
+        return self.get_generations()
+    
+    def get_generations(self) -> dict:
+        """Live and previous index generations with their sizes"""
+        state = dict(self.generations)
+        state["live_count"] = self.collection.count()
+        previous = state.get("previous")
+        try:
+            state["previous_count"] = self._get_collection(previous).count() if previous else None
+        except ValueError:
+            state["previous_count"] = None
+        state["index_generation"] = self.index_generation
+        state["rebuilding"] = self._pending_changes is not None
+        state["hnsw_changes"] = self.hnsw_changes()
+        return state
+    
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts with the same model used for the stored chunks
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            One embedding per text
+        """
+        return self.embedding_function(texts)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a single search query (cached, batched with concurrent queries)"""
+        key = embedding_key(query)
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            if self.query_embedder is not None:
+                embedding = self.query_embedder.embed(query)
+            else:
+                embedding = self.embed_texts([query])[0]
+            self.embedding_cache.put(key, embedding)
+        return embedding
+    
+    @profiler.profiled("index")
+    def index_pdfs(self) -> bool:
         """
         Load PDFs and create vector embeddings
+        
+        Extraction, chunking, embedding and writing run as concurrent
+        pipeline stages (see IngestPipeline); the run's stats are kept in
+        last_ingest_stats. With DEDUP_ENABLED, near-duplicate chunks are
+        stored once, listing every place they occur.
+        
+        The new index is built in a shadow collection and swapped in once
+        validated (see rebuild), so queries never see a half-built index.
+        
+        Returns:
+            Whether a new index generation was put into service
         """
         print("Starting PDF indexing...")
         
-        # Load all PDFs
-        documents = pdf_loader.load_all_pdfs()
-        
-        if not documents:
-            print(" No documents to index")
+        # Largest first, so the longest extraction is not left for last;
+        # files deleted since the glob are left out
+        sizes = {}
+        for path in pdf_loader.pdf_folder.glob("*.pdf"):
+            try:
+                sizes[path] = path.stat().st_size
+            except OSError:
+                continue
+        pdf_files = sorted(sizes, key=lambda path: -sizes[path])
+        if not pdf_files:
+            print(f" No PDFs found in {pdf_loader.pdf_folder}")
             return False
         
-        # Add documents to ChromaDB
-        # ChromaDB automatically creates embeddings using its default model
-        print(f" Adding {len(documents)} documents to ChromaDB...")
+        print(f" Found {len(pdf_files)} PDF(s)")
+        stats = {}
         
-        for idx, doc in enumerate(documents):
-            try:
-                self.collection.add(
-                    ids=[f"{doc['metadata']['source']}_{doc['metadata']['chunk_index']}_{idx}"],
-                    documents=[doc["content"]],
-                    metadatas=[doc["metadata"]]
-                )
-                
-                if (idx + 1) % 10 == 0:
-                    print(f" Indexed {idx + 1}/{len(documents)} documents")
+        def fill(shadow) -> int:
+            deduplicator = NearDuplicateIndex() if config.DEDUP_ENABLED else None
+            pipeline = IngestPipeline(self, pdf_loader, deduplicator=deduplicator, collection=shadow)
+            stats.update(pipeline.run(pdf_files))
+            self._record_duplicates(pipeline.duplicates, collection=shadow)
+            
+            # A file that failed part way keeps the chunks it has now: drop
+            # the batches it got into the shadow before copying the live ones
+            failed = sorted(pipeline.failed_files)
+            discarded = promoted = 0
+            for file_path in failed:
+                ids = shadow.get(where={"file_path": file_path}, include=[])["ids"]
+                if ids:
+                    discarded += len(ids)
+                    promoted += len(self._delete_chunks(ids, removed_files=failed, collection=shadow))
+            self._strip_duplicates_of(failed, collection=shadow)
+            kept = sum(self._copy_file_chunks(file_path, shadow) for file_path in failed)
+            stats["kept_chunks"] = kept
+            stats["discarded_chunks"] = discarded
             
-            except Exception as e:
-                print(f" Error indexing document {idx}: {e}")
+            print(f" Indexing complete! {stats['chunks']} chunks from {stats['files_indexed']} file(s) "
+                  f"in {stats['wall_s']} s (stages alone: {stats['sequential_s']} s, "
+                  f"bottleneck: {stats['bottleneck']})")
+            if deduplicator is not None:
+                dedup = stats["dedup"]
+                print(f" Near-duplicates: {dedup['duplicates']} of {dedup['chunks_checked']} chunks collapsed "
+                      f"({dedup['text_reduction']:.1%} less text stored)")
+            return stats["chunks"] - discarded + promoted + kept
         
-        print(f" Indexing complete! Total documents: {len(documents)}")
-        return True
+        stats["swap"] = self.rebuild(fill)
+        self.last_ingest_stats = stats
+        return stats["swap"]["ok"]
+    
+    def _copy_file_chunks(self, file_path: str, target) -> int:
+        """Copy a file's live chunks (with their vectors) into another collection"""
+        stored = self.collection.get(where={"file_path": str(file_path)},
+                                     include=["documents", "metadatas", "embeddings"])
+        if not stored["ids"]:
+            return 0
+        # Its duplicate lists belong to the old generation
+        metadatas = [{**metadata, DUPLICATES_KEY: ""} if metadata.get(DUPLICATES_KEY) else metadata
+                     for metadata in stored["metadatas"]]
+        target.upsert(ids=stored["ids"], embeddings=stored["embeddings"],
+                      documents=stored["documents"], metadatas=metadatas)
+        return len(stored["ids"])
+    
+    def _upsert_batch(self, batch: ChunkBatch, embeddings: List[List[float]] = None, collection=None):
+        """Upsert one batch of chunks, with precomputed embeddings if given"""
+        (self.collection if collection is None else collection).upsert(
+            ids=batch.ids(),
+            embeddings=embeddings,
+            documents=batch.contents,
+            metadatas=batch.metadatas()
+        )
     
-    def search(self, query: str, num_results: int = 3) -> List[dict]:
+    def _add_documents(self, documents: ChunkBatch, batch_size: int = 256):
+        """Upsert chunks into the collection in batches"""
+        for start in range(0, len(documents), batch_size):
+            self._upsert_batch(documents.slice(start, start + batch_size))
+    
+    def _file_chunk_ids(self, pdf_path: Path) -> List[str]:
+        """IDs of all chunks currently stored for a file"""
+        return self.collection.get(where={"file_path": str(pdf_path)}, include=[])["ids"]
+    
+    def _near_duplicate_index(self) -> NearDuplicateIndex:
+        """MinHash index of the stored chunks (built on first use)"""
+        if self._dedup_index is None:
+            index = NearDuplicateIndex()
+            stored = self.collection.get(include=["documents"])
+            for chunk_id, document in zip(stored["ids"], stored["documents"]):
+                index.add(chunk_id, document or "")
+            self._dedup_index = index
+        return self._dedup_index
+    
+    def _strip_duplicates_of(self, file_paths: Iterable[str], collection=None):
+        """Remove the collapsed chunks of the given files from every stored chunk"""
+        file_paths = set(file_paths)
+        if not file_paths:
+            return
+        collection = self.collection if collection is None else collection
+        stored = collection.get(where={DUPLICATES_KEY: {"$ne": ""}}, include=["metadatas"])
+        ids, metadatas = [], []
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            duplicates = load_duplicates(metadata)
+            kept = [entry for entry in duplicates if entry["file_path"] not in file_paths]
+            if len(kept) != len(duplicates):
+                ids.append(chunk_id)
+                # Chroma merges metadata on update, so "" clears the key
+                metadatas.append({DUPLICATES_KEY: dump_duplicates(kept)})
+        if ids:
+            collection.update(ids=ids, metadatas=metadatas)
+    
+    def _record_duplicates(self, duplicates: Dict[str, List[dict]], collection=None):
+        """Add collapsed chunks to the duplicate lists of their stored chunks"""
+        if not duplicates:
+            return
+        collection = self.collection if collection is None else collection
+        stored = collection.get(ids=list(duplicates), include=["metadatas"])
+        metadatas = [
+            {DUPLICATES_KEY: dump_duplicates(load_duplicates(metadata) + duplicates[chunk_id])}
+            for chunk_id, metadata in zip(stored["ids"], stored["metadatas"])
+        ]
+        if metadatas:
+            collection.update(ids=stored["ids"], metadatas=metadatas)
+    
+    def _delete_chunks(self, ids: List[str], removed_files: Iterable[str] = (), collection=None) -> List[str]:
+        """
+        Delete chunks without losing the near-duplicates collapsed into them
+        
+        A deleted chunk whose duplicate list names other files is stored
+        again under the first of those chunks' own ID, carrying the rest of
+        the list, so those files stay searchable.
+        
+        Args:
+            ids: IDs of the chunks to delete
+            removed_files: Files whose collapsed chunks are dropped with them
+            collection: Collection to delete from (defaults to the live one)
+        
+        Returns:
+            IDs of the chunks stored again in their place
+        """
+        removed_files = set(removed_files)
+        live = collection is None
+        collection = self.collection if live else collection
+        stored = collection.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+        promoted, embeddings, promoted_duplicates = ChunkBatch(), [], {}
+        for document, metadata, embedding in zip(stored["documents"], stored["metadatas"], stored["embeddings"]):
+            remaining = [entry for entry in load_duplicates(metadata) if entry["file_path"] not in removed_files]
+            if not remaining:
+                continue
+            heir = remaining[0]
+            promoted.add_file(heir["source"], heir["file_path"], heir["file_hash"],
+                              [document], [heir["chunk_index"]])
+            embeddings.append(embedding)
+            promoted_duplicates[promoted.ids()[-1]] = remaining[1:]
+        
+        collection.delete(ids=ids)
+        if promoted:
+            self._upsert_batch(promoted, embeddings, collection=collection)
+            self._record_duplicates({key: value for key, value in promoted_duplicates.items() if value},
+                                    collection=collection)
+        if not live:
+            return promoted.ids()
+        
+        with self._dedup_lock:
+            if self._dedup_index is not None:
+                self._dedup_index.remove(ids)
+                for chunk_id, document in zip(promoted.ids(), promoted.contents):
+                    self._dedup_index.add(chunk_id, document)
+        return promoted.ids()
+    
+    @profiler.profiled("index_file")
+    def index_file(self, pdf_path: Path) -> int:
+        """
+        Index (or re-index) a single PDF
+        
+        New chunks are written before the file's old chunks are deleted, so
+        the file never disappears from search results while it is replaced.
+        
+        Args:
+            pdf_path: Path to PDF file
+        
+        Returns:
+            Number of chunks stored for the file (near-duplicates of stored
+            chunks are not stored again)
+        """
+        pdf_path = Path(pdf_path)
+        if self._pending_changes is not None:
+            self._pending_changes.add(str(pdf_path))
+        documents = pdf_loader._load_pdf(pdf_path)
+        with self._write_lock:
+            old_ids = self._file_chunk_ids(pdf_path)
+            
+            duplicates = {}
+            if config.DEDUP_ENABLED:
+                with self._dedup_lock:
+                    index = self._near_duplicate_index()
+                    # The file's old chunks must not absorb its new version
+                    index.remove(old_ids)
+                    documents, duplicates = split_duplicates(index, documents)
+            
+            new_ids = documents.ids()
+            self._add_documents(documents)
+            self._strip_duplicates_of([str(pdf_path)])
+            self._record_duplicates(duplicates)
+            
+            stale_ids = sorted(set(old_ids) - set(new_ids))
+            promoted_ids = self._delete_chunks(stale_ids, removed_files=[str(pdf_path)]) if stale_ids else []
+            
+            collapsed = sum(len(entries) for entries in duplicates.values())
+            print(f" Indexed {pdf_path.name}: {len(documents)} chunks ({len(stale_ids)} replaced"
+                  f"{f', {collapsed} near-duplicates collapsed' if collapsed else ''})")
+            self.after_index_update(added=new_ids + promoted_ids, removed=stale_ids)
+            return len(documents)
+    
+    def remove_file(self, pdf_path: Path) -> int:
+        """
+        Remove all chunks of a PDF from the index
+        
+        Args:
+            pdf_path: Path the file was indexed from
+        
+        Returns:
+            Number of chunks removed
+        """
+        if self._pending_changes is not None:
+            self._pending_changes.add(str(pdf_path))
+        with self._write_lock:
+            ids = self._file_chunk_ids(Path(pdf_path))
+            self._strip_duplicates_of([str(pdf_path)])
+            promoted_ids = self._delete_chunks(ids, removed_files=[str(pdf_path)]) if ids else []
+            self.after_index_update(added=promoted_ids, removed=ids)
+        print(f" Removed {Path(pdf_path).name}: {len(ids)} chunks")
+        return len(ids)
+    
+    def get_indexed_files(self, imported: bool = True) -> dict:
+        """
+        Get the content hash recorded for every indexed file
+        
+        Args:
+            imported: Include files whose chunks came from a snapshot import
+        
+        Returns:
+            Mapping of file path to file hash (including files whose chunks
+            were all collapsed into other files' chunks)
+        """
+        files = {}
+        for metadata in self.collection.get(include=["metadatas"])["metadatas"]:
+            if not imported and metadata and metadata.get(SNAPSHOT_KEY):
+                continue
+            if metadata and "file_path" in metadata:
+                files[metadata["file_path"]] = metadata.get("file_hash", "")
+            for entry in load_duplicates(metadata):
+                files.setdefault(entry["file_path"], entry["file_hash"])
+        return files
+    
+    def list_documents(self) -> List[dict]:
+        """
+        Summarize the indexed documents
+        
+        Returns:
+            One entry per file with its source name, hash, stored chunk count
+            and the number of its chunks collapsed into another chunk
+        """
+        documents = {}
+        
+        def file_entry(metadata: dict) -> dict:
+            key = metadata.get("file_path") or metadata.get("source", "")
+            return documents.setdefault(key, {
+                "source": metadata.get("source", ""),
+                "file_path": metadata.get("file_path", ""),
+                "file_hash": metadata.get("file_hash", ""),
+                "chunks": 0,
+                "duplicate_chunks": 0
+            })
+        
+        for metadata in self.collection.get(include=["metadatas"])["metadatas"]:
+            if not metadata:
+                continue
+            file_entry(metadata)["chunks"] += 1
+            for duplicate in load_duplicates(metadata):
+                file_entry(duplicate)["duplicate_chunks"] += 1
+        return sorted(documents.values(), key=lambda entry: entry["source"])
+    
+    def _invalidate_search_cache(self):
+        self.index_generation += 1
+        self.search_cache.clear()
+    
+    def after_index_update(self, added: List[str] = (), removed: List[str] = ()):
+        """
+        Bring the indexes derived from the collection up to date after it changes
+        
+        Args:
+            added: IDs of the chunks stored (unchanged IDs may be included)
+            removed: IDs of the chunks deleted
+        """
+        if config.VECTOR_BACKEND == "quantized":
+            self.update_quantized_index(added, removed)
+        elif config.VECTOR_BACKEND == "sharded":
+            self.update_sharded_index(added, removed)
+        self._invalidate_search_cache()
+    
+    def update_quantized_index(self, added: List[str], removed: List[str]) -> bool:
+        """
+        Apply a single-file change to the quantized index
+        
+        Only the vectors of the added chunks are read; the index falls back
+        to a full build when it has none yet or its delta has grown too large.
+        
+        Returns:
+            Whether the change was applied without a full build
+        """
+        added = list(added)
+        stored = self.collection.get(ids=added, include=["embeddings"]) if added else {"ids": [], "embeddings": []}
+        if self.quantized_index.update(stored["ids"], stored["embeddings"], list(removed)):
+            return True
+        self.build_quantized_index()
+        return False
+    
+    def update_sharded_index(self, added: List[str], removed: List[str]) -> bool:
+        """
+        Apply a single-file change to the shards that it touches
+        
+        Falls back to a full re-partition when the shards hold no index yet,
+        a shard's delta has grown too large or a shard failed.
+        
+        Returns:
+            Whether the change was applied without a full build
+        """
+        added = list(added)
+        stored = self.collection.get(ids=added, include=["embeddings"]) if added else {"ids": [], "embeddings": []}
+        try:
+            if self.sharded_index.update(stored["ids"], stored["embeddings"], list(removed)):
+                return True
+        except ShardError as e:
+            print(f" Shard update failed, re-partitioning: {e}")
+        self.build_sharded_index()
+        return False
+    
+    def build_quantized_index(self, batch_size: int = 1000, collection=None) -> dict:
+        """
+        Build the int8 quantized index from the vectors stored in Chroma
+        
+        Returns:
+            Memory report of the new index
+        """
+        collection = self.collection if collection is None else collection
+        ids, embeddings = self._collection_vectors(collection, batch_size)
+        
+        if not ids:
+            print(" No vectors to quantize")
+            return {}
+        self.quantized_index.build(ids, embeddings, {"collection": collection.name})
+        report = self.quantized_index.memory_report()
+        print(f" Quantized index built: {report['vectors']} vectors, "
+              f"{report['int8_bytes']} bytes vs {report['float32_bytes']} float32")
+        return report
+    
+    def build_sharded_index(self, batch_size: int = 1000, collection=None) -> dict:
+        """
+        Re-partition the vectors stored in Chroma evenly across the search shards
+        
+        Returns:
+            Shard sizes of the new index
+        """
+        collection = self.collection if collection is None else collection
+        ids, embeddings = self._collection_vectors(collection, batch_size)
+        
+        if not ids:
+            print(" No vectors to shard")
+            return {}
+        return self.sharded_index.build(ids, embeddings, collection.name)
+    
+    def _collection_vectors(self, collection, batch_size: int) -> Tuple[List[str], list]:
+        """All chunk IDs and embeddings of a collection, read in batches"""
+        ids, embeddings = [], []
+        for offset in range(0, collection.count(), batch_size):
+            batch = collection.get(limit=batch_size, offset=offset, include=["embeddings"])
+            ids.extend(batch["ids"])
+            embeddings.extend(batch["embeddings"])
+        return ids, embeddings
+    
+    def _query_chroma(self, query_embedding: List[float], num_results: int) -> List[Hit]:
+        results = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=num_results
+        )
+        
+        documents = []
+        if results["documents"] and len(results["documents"]) > 0:
+            for i, doc in enumerate(results["documents"][0]):
+                documents.append(Hit.from_metadata(
+                    doc,
+                    results["metadatas"][0][i],
+                    results["distances"][0][i] if results["distances"] else 0
+                ))
+        return documents
+    
+    def _query_quantized(self, query_embedding: List[float], num_results: int) -> List[Hit]:
+        hits = self.quantized_index.search(query_embedding, num_results)
+        return self._hits_from_ids(hits)
+    
+    def _query_sharded(self, query_embedding: List[float], num_results: int) -> List[Hit]:
+        try:
+            hits = self.sharded_index.search(query_embedding, num_results)
+        except ShardError as e:
+            # The failed shard has been restarted for the next query
+            print(f" Sharded search failed, using Chroma: {e}")
+            return self._query_chroma(query_embedding, num_results)
+        return self._hits_from_ids(hits)
+    
+    def _hits_from_ids(self, hits: List[Tuple[str, float]]) -> List[Hit]:
+        """Fetch the documents of (chunk ID, distance) pairs, keeping their order"""
+        if not hits:
+            return []
+        stored = self.collection.get(ids=[chunk_id for chunk_id, _ in hits],
+                                     include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: (doc, metadata)
+            for chunk_id, doc, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+        }
+        return [
+            Hit.from_metadata(by_id[chunk_id][0], by_id[chunk_id][1], distance)
+            for chunk_id, distance in hits if chunk_id in by_id
+        ]
+    
+    def search(self, query: str, num_results: int = 3, max_distance: float = None,
+               query_embedding: List[float] = None) -> List[Hit]:
         """
         Search for relevant documents
         
         Args:
             query: Search query
             num_results: Number of results to return
+            max_distance: Drop results with a larger cosine distance
+            query_embedding: Precomputed embedding of the query
         
         Returns:
             List of relevant documents with scores
         """
+        cache_key = (self.index_generation, normalize_query(query), num_results, max_distance)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=num_results
-            )
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
             
-            # Format results
-            documents = []
-            if results["documents"] and len(results["documents"]) > 0:
-                for i, doc in enumerate(results["documents"][0]):
-                    documents.append({
-                        "content": doc,
-                        "metadata": results["metadatas"][0][i],
-                        "distance": results["distances"][0][i] if results["distances"] else 0
-                    })
+            if config.VECTOR_BACKEND == "quantized" and self.quantized_index.ready:
+                documents = self._query_quantized(query_embedding, num_results)
+            elif config.VECTOR_BACKEND == "sharded" and self.sharded_index.ready:
+                documents = self._query_sharded(query_embedding, num_results)
+            else:
+                documents = self._query_chroma(query_embedding, num_results)
             
-            return documents
+            if max_distance is not None:
+                documents = [doc for doc in documents if doc.distance <= max_distance]
         
         except Exception as e:
             print(f" Search error: {e}")
             return []
+        
+        self.search_cache.put(cache_key, documents)
+        return list(documents)
+    
+    def search_adaptive(self, query: str, max_results: int = None,
+                        query_embedding: List[float] = None) -> Tuple[List[Hit], dict]:
+        """
+        Search and keep only as many results as the distances justify
+        
+        Args:
+            query: Search query
+            max_results: Upper bound on candidates (defaults to config)
+            query_embedding: Precomputed embedding of the query
+        
+        Returns:
+            Selected documents and the selection report
+        """
+        candidates = self.search(
+            query,
+            num_results=max_results or config.RETRIEVAL_MAX_RESULTS,
+            query_embedding=query_embedding
+        )
+        return select_context(
+            candidates,
+            max_distance=config.RETRIEVAL_MAX_DISTANCE,
+            min_gap=config.RETRIEVAL_ELBOW_GAP,
+            max_tokens=config.MAX_CONTEXT_TOKENS
+        )
     
     def get_collection_info(self) -> dict:
         """Get information about the collection"""
         return {
-            "collection_name": self.collection_name,
+            "collection_name": self.collection.name,
+            "generation": self.generations["generation"],
             "count": self.collection.count(),
-            "metadata": self.collection.metadata
+            "metadata": self.collection.metadata,
+            "hnsw_rebuild_needed": bool(self.hnsw_changes())
         }
 
 
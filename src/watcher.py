@@ -0,0 +1,293 @@
+"""
+PDF Folder Watcher - Live incremental ingestion of added, changed and
+deleted course PDFs
+"""
+import argparse
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+from src.config import config
+from src.page_cache import file_sha256
+
+# (modification time in ns, size in bytes) - cheap change detection
+Signature = Tuple[int, int]
+
+
+class PDFWatcher:
+    """Poll the PDF folder and ingest only the files that changed"""
+    
+    def __init__(self, store, folder: str = None, poll_interval: float = None,
+                 debounce_seconds: float = None):
+        """
+        Initialize watcher
+        
+        Args:
+            store: VectorStore that chunks are written to
+            folder: Folder to watch (defaults to PDF_FOLDER_PATH)
+            poll_interval: Seconds between folder scans
+            debounce_seconds: How long a file must stay unchanged before it
+                is ingested, so partially copied files are skipped
+        """
+        self.store = store
+        self.folder = Path(folder or config.PDF_FOLDER_PATH)
+        self.poll_interval = config.WATCH_POLL_SECONDS if poll_interval is None else poll_interval
+        self.debounce_seconds = config.WATCH_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        
+        self._indexed: Dict[str, Signature] = {}
+        self._pending: Dict[str, Tuple[Signature, float]] = {}
+        self._failed: Dict[str, Signature] = {}
+        # All of the state above and below is guarded by _lock. _held holds
+        # files an API thread is updating, _busy the file the watcher is
+        # indexing or removing; neither side touches the other's files
+        self._held: Set[str] = set()
+        self._busy: Set[str] = set()
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.events = deque(maxlen=50)
+        self.counts = {"added": 0, "modified": 0, "deleted": 0, "failed": 0}
+    
+    def _scan_folder(self) -> Dict[str, Signature]:
+        """Current signature of every PDF in the folder"""
+        files = {}
+        for pdf_path in self.folder.glob("*.pdf"):
+            try:
+                stat = pdf_path.stat()
+            except OSError:
+                continue  # Deleted between glob and stat
+            files[str(pdf_path)] = (stat.st_mtime_ns, stat.st_size)
+        return files
+    
+    def sync(self):
+        """
+        Reconcile the folder with the index once
+        
+        Files whose content hash already matches the index are marked as
+        ingested; anything else is queued, and files indexed from this
+        folder that no longer exist are removed. Chunks loaded from a
+        snapshot, or indexed from another folder, are left alone.
+        """
+        indexed_hashes = self.store.get_indexed_files()
+        current = self._scan_folder()
+        
+        for path, signature in current.items():
+            if indexed_hashes.get(path) and indexed_hashes[path] == file_sha256(Path(path)):
+                with self._lock:
+                    self._indexed[path] = signature
+        
+        own_files = {path for path in self.store.get_indexed_files(imported=False)
+                     if Path(path).parent == self.folder}
+        for path in own_files - set(current):
+            self._remove(path)
+    
+    def scan_once(self, now: float = None) -> int:
+        """
+        Scan the folder and process files whose debounce period has passed
+        
+        Args:
+            now: Current time (monotonic seconds); used by tests
+        
+        Returns:
+            Number of files ingested or removed
+        """
+        now = time.monotonic() if now is None else now
+        current = self._scan_folder()
+        processed = 0
+        
+        for path, signature in current.items():
+            with self._lock:
+                if path in self._held:
+                    continue
+                if self._indexed.get(path) == signature or self._failed.get(path) == signature:
+                    continue
+                pending = self._pending.get(path)
+                if pending is None or pending[0] != signature:
+                    # New or still being written: restart the debounce timer
+                    self._pending[path] = (signature, now)
+                    continue
+                if now - pending[1] < self.debounce_seconds:
+                    continue
+                del self._pending[path]
+            processed += self._ingest(path, signature)
+        
+        with self._lock:
+            for path in list(self._pending):
+                if path not in current:
+                    del self._pending[path]
+            removed = set(self._indexed) - set(current)
+        
+        for path in removed:
+            processed += self._remove(path)
+        
+        return processed
+    
+    @contextmanager
+    def hold(self, path: Path):
+        """
+        Keep the watcher away from a file another component is updating
+        
+        Waits for the watcher to finish with the file if it is indexing
+        or removing it. If the block succeeds, the file's current state is
+        recorded as handled, so the watcher does not ingest (or remove) it
+        a second time; if it fails, the watcher reconciles the file as usual.
+        
+        Args:
+            path: File being written or deleted
+        """
+        path = str(path)
+        with self._lock:
+            while path in self._busy:
+                self._released.wait()
+            self._held.add(path)
+        try:
+            yield
+            try:
+                stat = Path(path).stat()
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signature = None
+            with self._lock:
+                self._pending.pop(path, None)
+                self._failed.pop(path, None)
+                if signature is None:
+                    self._indexed.pop(path, None)
+                else:
+                    self._indexed[path] = signature
+        finally:
+            with self._lock:
+                self._held.discard(path)
+    
+    def _claim(self, path: str) -> bool:
+        """Mark a file as being processed by the watcher, unless it is held"""
+        with self._lock:
+            if path in self._held:
+                return False
+            self._busy.add(path)
+            return True
+    
+    def _release(self, path: str):
+        with self._lock:
+            self._busy.discard(path)
+            self._released.notify_all()
+    
+    def _ingest(self, path: str, signature: Signature) -> int:
+        if not self._claim(path):
+            return 0
+        try:
+            with self._lock:
+                event = "modified" if path in self._indexed else "added"
+            try:
+                chunks = self.store.index_file(Path(path))
+            except Exception as e:
+                print(f" Watcher failed to ingest {Path(path).name}: {e}")
+                with self._lock:
+                    self._failed[path] = signature
+                    self.counts["failed"] += 1
+                    self._record("failed", path, error=str(e))
+                return 0
+            with self._lock:
+                self._failed.pop(path, None)
+                self._indexed[path] = signature
+                self.counts[event] += 1
+                self._record(event, path, chunks=chunks)
+            return 1
+        finally:
+            self._release(path)
+    
+    def _remove(self, path: str) -> int:
+        if not self._claim(path):
+            return 0
+        try:
+            try:
+                chunks = self.store.remove_file(Path(path))
+            except Exception as e:
+                print(f" Watcher failed to remove {Path(path).name}: {e}")
+                return 0
+            with self._lock:
+                self._indexed.pop(path, None)
+                self._failed.pop(path, None)
+                self.counts["deleted"] += 1
+                self._record("deleted", path, chunks=chunks)
+            return 1
+        finally:
+            self._release(path)
+    
+    def _record(self, event: str, path: str, **details):
+        self.events.append({"event": event, "file": Path(path).name, "time": time.time(), **details})
+    
+    def _run(self):
+        try:
+            self.sync()
+        except Exception as e:
+            print(f" Watcher initial sync failed: {e}")
+        while not self._stop.is_set():
+            try:
+                self.scan_once()
+            except Exception as e:
+                print(f" Watcher scan error: {e}")
+            self._stop.wait(self.poll_interval)
+    
+    def start(self):
+        """Start watching in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pdf-watcher", daemon=True)
+        self._thread.start()
+        print(f" Watching {self.folder} for PDF changes")
+    
+    def stop(self, timeout: float = 5.0):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+    
+    def get_status(self) -> dict:
+        """Get watcher state and recent events"""
+        with self._lock:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "folder": str(self.folder),
+                "poll_interval": self.poll_interval,
+                "debounce_seconds": self.debounce_seconds,
+                "tracked_files": len(self._indexed),
+                "pending_files": len(self._pending),
+                "counts": dict(self.counts),
+                "recent_events": list(self.events)[-10:]
+            }
+
+
+def main(argv: list = None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Watch the PDF folder and index changes as they land")
+    parser.add_argument("--interval", type=float, default=None, help="Seconds between scans")
+    parser.add_argument("--debounce", type=float, default=None, help="Seconds a file must be stable")
+    parser.add_argument("--once", action="store_true", help="Sync the folder once and exit")
+    args = parser.parse_args(argv)
+    
+    from src.vector_store import vector_store
+    watcher = PDFWatcher(vector_store, poll_interval=args.interval, debounce_seconds=args.debounce)
+    
+    if args.once:
+        watcher.sync()
+        watcher.debounce_seconds = 0
+        watcher.scan_once()
+        watcher.scan_once()
+        print(watcher.get_status()["counts"])
+        return
+    
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+        print("\n Watcher stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Tests for extractive context compression
+"""
+import pytest
+from pathlib import Path
+import sys
+import zlib
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from src.context_compressor import ContextCompressor, split_sentences
+from src.records import Hit
+
+VOCAB = 64
+
+
+def bag_of_words(texts):
+    """Deterministic stand-in for the embedding model"""
+    vectors = []
+    for text in texts:
+        vector = np.zeros(VOCAB)
+        for word in text.lower().replace(".", " ").split():
+            vector[zlib.crc32(word.encode()) % VOCAB] += 1
+        vectors.append(vector.tolist())
+    return vectors
+
+
+DOCS = [
+    Hit(
+        "The course runs for fourteen weeks. "
+        "A deadlock occurs when processes wait on each other forever. "
+        "Lab sessions are held on Sundays.",
+        "Operating Systems Lecture Notes",
+        distance=0.3
+    ),
+    Hit(
+        "Grading is based on a final exam. "
+        "Deadlock prevention removes one of the four necessary conditions.",
+        "OS Slides",
+        distance=0.35
+    ),
+]
+
+
+@pytest.mark.unit
+class TestContextCompressor:
+    """Test sentence scoring, budgeting and reporting"""
+    
+    def test_split_sentences_merges_fragments(self):
+        """Short fragments are attached to their neighbour"""
+        sentences = split_sentences("Intro.\nA deadlock occurs when processes wait forever. Ok.")
+        assert sentences == ["Intro. A deadlock occurs when processes wait forever. Ok."]
+    
+    def test_keeps_relevant_sentences_with_sources(self):
+        """Only sentences about the question survive, tagged with their source"""
+        compressor = ContextCompressor(bag_of_words)
+        query = bag_of_words(["what is a deadlock when processes wait"])[0]
+        compressed, report = compressor.compress(query, DOCS, max_tokens=20)
+        
+        text = " ".join(doc.content for doc in compressed)
+        assert "deadlock occurs" in text
+        assert "Sundays" not in text
+        assert compressed[0].source == "Operating Systems Lecture Notes"
+        assert report["compressed_tokens"] <= 20
+        assert report["compression_ratio"] < 1.0
+        assert report["elapsed_ms"] >= 0
+    
+    def test_sentence_embeddings_are_cached(self):
+        """Repeated chunks are not re-embedded"""
+        calls = []
+        
+        def counting_embed(texts):
+            calls.append(len(texts))
+            return bag_of_words(texts)
+        
+        compressor = ContextCompressor(counting_embed)
+        query = bag_of_words(["deadlock"])[0]
+        compressor.compress(query, DOCS, max_tokens=50)
+        compressor.compress(query, DOCS, max_tokens=50)
+        assert len(calls) == 1
+    
+    def test_empty_input(self):
+        """No documents produce an empty result"""
+        compressed, report = ContextCompressor(bag_of_words).compress([1.0] * VOCAB, [], 100)
+        assert compressed == []
+        assert report["sentences_total"] == 0
@@ -0,0 +1,80 @@
+"""
+Tests for adaptive context selection
+"""
+import pytest
+from unittest.mock import Mock, patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.context_selection import estimate_tokens, select_context
+from src.records import Hit
+
+
+def doc(distance: float, chars: int = 400) -> Hit:
+    return Hit("x" * chars, "lecture", distance=distance)
+
+
+@pytest.mark.unit
+class TestSelectContext:
+    """Test the cutoff, elbow and token budget rules"""
+    
+    def test_threshold_drops_weak_matches(self):
+        """Results beyond the distance cutoff are dropped"""
+        selected, report = select_context([doc(0.2), doc(0.25), doc(0.9)], 0.5, 1.0, 10000)
+        assert len(selected) == 2
+        assert report["stopped_by"] == "threshold"
+    
+    def test_elbow_cuts_at_large_gap(self):
+        """Selection stops at the first big jump in distance"""
+        docs = [doc(0.20), doc(0.22), doc(0.24), doc(0.40), doc(0.41)]
+        selected, report = select_context(docs, 0.6, 0.1, 10000)
+        assert [d.distance for d in selected] == [0.20, 0.22, 0.24]
+        assert report["stopped_by"] == "elbow"
+    
+    def test_token_budget_caps_context(self):
+        """Total context never exceeds the token budget"""
+        docs = [doc(0.1 + i * 0.01, chars=1000) for i in range(8)]
+        selected, report = select_context(docs, 0.6, 0.5, 600)
+        assert len(selected) == 2
+        assert report["context_tokens"] <= 600
+        assert report["stopped_by"] == "token_budget"
+    
+    def test_hard_questions_get_more_context(self):
+        """Many close matches are all kept"""
+        docs = [doc(0.30 + i * 0.01) for i in range(8)]
+        selected, report = select_context(docs, 0.6, 0.1, 10000)
+        assert len(selected) == 8
+        assert report["stopped_by"] == "max_results"
+    
+    def test_nothing_relevant(self):
+        """No result passes a strict cutoff"""
+        selected, report = select_context([doc(0.8), doc(0.9)], 0.5, 0.1, 10000)
+        assert selected == []
+        assert report["best_distance"] == 0.8
+    
+    def test_estimate_tokens(self):
+        """Token estimate scales with length"""
+        assert estimate_tokens("") == 1
+        assert estimate_tokens("a" * 400) == 100
+
+
+@pytest.mark.unit
+class TestRAGChainSelection:
+    """Test that irrelevant questions skip generation"""
+    
+    def test_llm_skipped_when_nothing_passes(self):
+        """No LLM call is made when retrieval finds nothing relevant"""
+        from src.rag_chain import RAGChain
+        chain = RAGChain()
+        chain.chain = Mock()
+        report = {"selected": 0, "candidates": 8, "stopped_by": "threshold"}
+        
+        with patch('src.rag_chain.vector_store.embed_query', return_value=[0.1] * 8), \
+                patch('src.rag_chain.vector_store.search_adaptive', return_value=([], report)):
+            result = chain.query("What is the weather today?")
+        
+        chain.chain.run.assert_not_called()
+        assert result["num_context_docs"] == 0
+        assert result["sources"] == []
@@ -0,0 +1,120 @@
+"""
+Tests for structured conversation storage
+"""
+import pytest
+from unittest.mock import Mock, patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.conversation_store import Conversation, ConversationStore
+from src.records import Hit
+
+
+@pytest.mark.unit
+class TestConversation:
+    """Test per-turn records, counters and cursors"""
+    
+    def test_turn_counts_ignore_message_content(self):
+        """Answers with newlines or 'Student:' do not confuse the counts"""
+        conversation = Conversation("s1")
+        conversation.add_turn("What is paging?", "Line one\nStudent: quoted\nAssistant: also quoted")
+        conversation.add_turn("Why?", "Because.")
+        assert conversation.turns == 2
+        assert len(conversation.messages) == 4
+        assert conversation.messages[1].content.count("\n") == 2
+    
+    def test_cursor_pagination(self):
+        """Clients fetch only messages newer than their cursor"""
+        conversation = Conversation("s1")
+        for i in range(5):
+            conversation.add_turn(f"q{i}", f"a{i}")
+        
+        page, cursor, has_more = conversation.page(limit=4)
+        assert [m.content for m in page] == ["q0", "a0", "q1", "a1"]
+        assert has_more
+        
+        page, cursor, has_more = conversation.page(after=cursor, limit=100)
+        assert len(page) == 6
+        assert not has_more
+        
+        page, same_cursor, _ = conversation.page(after=cursor)
+        assert page == [] and same_cursor == cursor
+        
+        page, _, has_more = conversation.page(after=5, limit=2)
+        assert [m.seq for m in page] == [6, 7] and has_more
+        assert len(conversation.page(after=0)[0]) == 10
+    
+    def test_cursors_survive_clear(self):
+        """Message IDs keep increasing after a clear"""
+        conversation = Conversation("s1")
+        conversation.add_turn("q", "a")
+        _, cursor, _ = conversation.page()
+        conversation.clear()
+        conversation.add_turn("new", "answer")
+        page, _, _ = conversation.page(after=cursor)
+        assert [m.content for m in page] == ["new", "answer"]
+        assert conversation.turns == 1
+    
+    def test_render_history_is_bounded(self):
+        """Only the most recent messages go into the prompt"""
+        conversation = Conversation("s1")
+        for i in range(10):
+            conversation.add_turn(f"q{i}", f"a{i}")
+        assert conversation.render_history(2) == "Student: q9\nAssistant: a9"
+
+
+@pytest.mark.unit
+class TestConversationStore:
+    """Test session isolation and eviction"""
+    
+    def test_sessions_are_isolated(self):
+        store = ConversationStore(max_sessions=10)
+        store.get("a").add_turn("q", "a")
+        assert store.get("b").turns == 0
+        store.clear("a")
+        assert store.get("a").turns == 0
+    
+    def test_least_recent_session_evicted(self):
+        store = ConversationStore(max_sessions=2)
+        store.get("a").add_turn("q", "a")
+        store.get("b")
+        store.get("a")
+        store.get("c")
+        assert len(store) == 2
+        assert store.get("a").turns == 1
+    
+    def test_reads_do_not_start_sessions(self):
+        """Reading or clearing unknown sessions cannot evict real ones"""
+        store = ConversationStore(max_sessions=1)
+        store.get("a").add_turn("q", "a")
+        for i in range(5):
+            assert store.peek(f"stranger-{i}").turns == 0
+            store.clear(f"other-{i}")
+        assert len(store) == 1 and store.peek("a").turns == 1
+
+
+@pytest.mark.unit
+class TestRAGChainSessions:
+    """Test that RAGChain keeps separate histories per session"""
+    
+    def test_query_records_turns_per_session(self):
+        from src.rag_chain import RAGChain
+        chain = RAGChain()
+        chain.chain = Mock()
+        chain.chain.run.return_value = "Answer with\nStudent: in it"
+        docs = [Hit("Paging text", "OS", distance=0.2)]
+        report = {"selected": 1, "candidates": 1, "stopped_by": "max_results"}
+        
+        with patch('src.rag_chain.vector_store.embed_query', return_value=[0.1] * 8), \
+                patch('src.rag_chain.vector_store.search_adaptive', return_value=(docs, report)):
+            chain.query("What is paging?", session_id="alice")
+            result = chain.query("Why?", session_id="alice")
+            chain.query("What is a process?", session_id="bob")
+        
+        assert result["conversation_turn"] == 2
+        assert chain.get_memory_summary("alice")["total_turns"] == 2
+        assert chain.get_memory_summary("bob")["total_messages"] == 2
+        history = chain.get_conversation_history("alice", after=2)
+        assert [m["role"] for m in history] == ["student", "assistant"]
@@ -0,0 +1,237 @@
+"""
+Tests for near-duplicate chunk elimination
+"""
+import pytest
+import uuid
+from unittest.mock import patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import chromadb
+import numpy as np
+from tools.common import stub_embeddings
+from src.dedup import MinHasher, NearDuplicateIndex, dump_duplicates, split_duplicates
+from src.ingest_pipeline import IngestPipeline
+from src.records import DUPLICATES_KEY, ChunkBatch, Hit
+
+WORDS = ("process thread memory page frame kernel scheduler deadlock semaphore mutex "
+         "cache disk block inode file socket packet router queue stack heap pointer "
+         "interrupt signal register buffer latency throughput virtual physical").split()
+
+
+def lecture_text(seed: int, words: int = 150) -> str:
+    """Random but reproducible course-like text"""
+    rng = np.random.default_rng(seed)
+    return " ".join(rng.choice(WORDS, words))
+
+
+def revise(text: str, every: int = 40) -> str:
+    """The same text with a few words changed, like a lightly edited slide"""
+    words = text.split()
+    for i in range(0, len(words), every):
+        words[i] = "revised"
+    return " ".join(words)
+
+
+def batch_of(source: str, texts, file_hash: str = "hash") -> ChunkBatch:
+    batch = ChunkBatch()
+    batch.add_file(source, f"/pdfs/{source}.pdf", file_hash, list(texts))
+    return batch
+
+
+@pytest.mark.unit
+class TestMinHash:
+    """Test signature similarity and LSH lookups"""
+    
+    def similarity(self, hasher, a, b):
+        return float(np.mean(hasher.signature(a) == hasher.signature(b)))
+    
+    def test_similarity_tracks_overlap(self):
+        hasher = MinHasher(num_perm=128, shingle_words=3)
+        text = lecture_text(1)
+        assert self.similarity(hasher, text, text) == 1.0
+        assert self.similarity(hasher, text, text.upper() + "!") == 1.0  # Case and punctuation ignored
+        assert self.similarity(hasher, text, revise(text)) > 0.8
+        assert self.similarity(hasher, text, lecture_text(2)) < 0.2
+    
+    def test_index_finds_revised_copies_only(self):
+        index = NearDuplicateIndex(threshold=0.8, num_perm=128, bands=16)
+        originals = [lecture_text(seed) for seed in range(20)]
+        for i, text in enumerate(originals):
+            assert index.check(f"a_{i}", text) is None
+        
+        assert index.check("b_3", revise(originals[3])) == "a_3"
+        assert index.check("c_0", lecture_text(99)) is None
+        assert index.check("a_5", originals[5]) is None  # Re-checking a stored chunk keeps it
+        
+        stats = index.get_stats()
+        assert (stats["chunks_checked"], stats["duplicates"], stats["chunks_stored"]) == (23, 1, 22)
+        assert len(index) == 21
+    
+    def test_removed_chunks_are_not_matched(self):
+        index = NearDuplicateIndex(threshold=0.8, num_perm=64, bands=16)
+        text = lecture_text(7)
+        index.add("old_0", text)
+        index.remove(["old_0"])
+        assert index.check("new_0", text) is None
+    
+    def test_bands_must_divide_signature(self):
+        with pytest.raises(ValueError):
+            NearDuplicateIndex(num_perm=100, bands=16)
+    
+    def test_split_duplicates(self):
+        index = NearDuplicateIndex(threshold=0.8)
+        split_duplicates(index, batch_of("week1", [lecture_text(1), lecture_text(2)]))
+        kept, duplicates = split_duplicates(index, batch_of("week1_v2", [revise(lecture_text(2)), lecture_text(3)]))
+        assert [chunk.content for chunk in kept] == [lecture_text(3)]
+        assert duplicates == {"week1_hash_1": [
+            {"source": "week1_v2", "file_path": "/pdfs/week1_v2.pdf", "file_hash": "hash", "chunk_index": 0}
+        ]}
+
+
+class StubEmbeddingFunction:
+    """Chroma embedding function that needs no model download"""
+    
+    def __call__(self, input):
+        return stub_embeddings(input)
+
+
+class TextLoader:
+    """Loader serving fixed chunk texts per file name"""
+    
+    def __init__(self, texts: dict):
+        self.texts = texts
+    
+    def extract_pages(self, pdf_path, file_hash=None):
+        return self.texts[Path(pdf_path).stem]
+    
+    def chunk_pages(self, pages, pdf_path, file_hash=None):
+        batch = ChunkBatch()
+        batch.add_file(Path(pdf_path).stem, str(pdf_path), file_hash or "", pages)
+        return batch
+
+
+class MemoryStore:
+    """Store keeping written chunks in a dict"""
+    
+    def __init__(self):
+        self.rows = {}
+    
+    def embed_texts(self, texts):
+        return [[0.0] for _ in texts]
+    
+    def _upsert_batch(self, batch, embeddings=None, collection=None):
+        for chunk_id, text in zip(batch.ids(), batch.contents):
+            self.rows[chunk_id] = text
+
+
+@pytest.mark.unit
+class TestPipelineDedup:
+    """Test that the dedup stage drops duplicates before they are embedded"""
+    
+    def test_revised_copy_is_collapsed(self, tmp_path):
+        texts = {
+            "lecture": [lecture_text(seed) for seed in range(6)],
+            "lecture_2023": [revise(lecture_text(seed)) for seed in range(5)] + [lecture_text(50)]
+        }
+        paths = []
+        for name in texts:
+            (tmp_path / f"{name}.pdf").write_bytes(name.encode())
+            paths.append(tmp_path / f"{name}.pdf")
+        
+        store = MemoryStore()
+        pipeline = IngestPipeline(store, TextLoader(texts), extract_workers=1,
+                                  batch_size=4, deduplicator=NearDuplicateIndex(threshold=0.8))
+        stats = pipeline.run(paths)
+        
+        assert stats["chunks"] == len(store.rows) == 7
+        assert stats["dedup"]["duplicates"] == 5
+        assert stats["dedup"]["chunk_reduction"] == round(5 / 12, 4)
+        assert stats["stages"]["embed"]["items"] == 3  # Dropped chunks were never embedded
+        assert sum(len(entries) for entries in pipeline.duplicates.values()) == 5
+        assert stats["files_indexed"] == 2
+
+
+@pytest.mark.unit
+class TestStoreDedup:
+    """Test duplicate lists in the collection across file updates"""
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        from src.vector_store import vector_store
+        collection = chromadb.EphemeralClient().create_collection(
+            name=f"dedup_{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"},
+            embedding_function=StubEmbeddingFunction()
+        )
+        texts = {}
+        
+        def extract_pages(pdf_path, file_hash=None):
+            return texts[Path(pdf_path).stem]
+        
+        def chunk_pages(pages, pdf_path, file_hash=None):
+            return TextLoader({}).chunk_pages(pages, pdf_path, file_hash)
+        
+        with patch.object(vector_store, "collection", collection), \
+                patch.object(vector_store, "_dedup_index", None), \
+                patch.object(vector_store, "embed_texts", stub_embeddings), \
+                patch('src.vector_store.config.VECTOR_BACKEND', "chroma"), \
+                patch('src.vector_store.config.DEDUP_ENABLED', True), \
+                patch('src.vector_store.pdf_loader.extract_pages', extract_pages), \
+                patch('src.vector_store.pdf_loader.chunk_pages', chunk_pages):
+            yield vector_store, texts
+    
+    def add_file(self, tmp_path, texts, name, chunks):
+        texts[name] = chunks
+        path = tmp_path / f"{name}.pdf"
+        path.write_bytes(f"{name} {len(chunks)} {chunks[0][:20]}".encode())
+        return path
+    
+    def test_copy_is_listed_and_survives_original_removal(self, store, tmp_path):
+        store, texts = store
+        original = self.add_file(tmp_path, texts, "lecture", [lecture_text(1), lecture_text(2)])
+        copy = self.add_file(tmp_path, texts, "lecture_copy", [revise(lecture_text(2), every=75), lecture_text(3)])
+        
+        assert store.index_file(original) == 2
+        assert store.index_file(copy) == 1
+        assert store.collection.count() == 3
+        assert set(store.get_indexed_files()) == {str(original), str(copy)}
+        
+        hits = store._query_chroma(stub_embeddings([lecture_text(2)])[0], 1)
+        assert hits[0].all_sources == ["lecture", "lecture_copy"]
+        
+        # The copy's chunk lived only in the original's chunk: it is promoted
+        store.remove_file(original)
+        assert store.collection.count() == 2
+        promoted = store.collection.get(where={"source": "lecture_copy"}, include=["metadatas"])
+        assert sorted(metadata["chunk_index"] for metadata in promoted["metadatas"]) == [0, 1]
+        assert set(store.get_indexed_files()) == {str(copy)}
+    
+    def test_reindexing_a_copy_clears_its_old_entries(self, store, tmp_path):
+        store, texts = store
+        original = self.add_file(tmp_path, texts, "lecture", [lecture_text(1)])
+        copy = self.add_file(tmp_path, texts, "lecture_copy", [revise(lecture_text(1), every=75)])
+        store.index_file(original)
+        store.index_file(copy)
+        
+        self.add_file(tmp_path, texts, "lecture_copy", [lecture_text(4)])
+        store.index_file(copy)
+        stored = store.collection.get(include=["metadatas"])
+        assert sorted(metadata["source"] for metadata in stored["metadatas"]) == ["lecture", "lecture_copy"]
+        assert all(not metadata.get(DUPLICATES_KEY) for metadata in stored["metadatas"])
+
+
+@pytest.mark.unit
+class TestHitSources:
+    """Test that hits report every place their text occurs"""
+    
+    def test_all_sources_from_metadata(self):
+        metadata = {"source": "week1", "chunk_index": 0, DUPLICATES_KEY: dump_duplicates([
+            {"source": "week1_old", "file_path": "a", "file_hash": "h", "chunk_index": 3},
+            {"source": "week1", "file_path": "b", "file_hash": "h", "chunk_index": 4}
+        ])}
+        hit = Hit.from_metadata("Paging", metadata, distance=0.1)
+        assert hit.all_sources == ["week1", "week1_old"]
+        assert hit.with_content("Paging.").all_sources == ["week1", "week1_old"]
+        assert Hit("Paging", "week1").all_sources == ["week1"]
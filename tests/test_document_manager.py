@@ -0,0 +1,115 @@
+"""
+Tests for single-document upload, replace and delete
+"""
+import pytest
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.document_manager import DocumentError, DocumentManager, DocumentNotFoundError
+from src.watcher import PDFWatcher
+
+
+class FakeStore:
+    """Tracks chunk counts per file like the vector store would"""
+    
+    def __init__(self):
+        self.chunks = {}
+    
+    def index_file(self, path):
+        self.chunks[str(path)] = len(path.read_bytes()) // 10
+        return self.chunks[str(path)]
+    
+    def remove_file(self, path):
+        return self.chunks.pop(str(path), 0)
+    
+    def get_indexed_files(self):
+        return {path: "hash" for path in self.chunks}
+    
+    def list_documents(self):
+        return [
+            {"source": Path(path).stem, "file_path": path, "file_hash": "hash", "chunks": count}
+            for path, count in self.chunks.items()
+        ]
+
+
+class FakeLoader:
+    """Accepts anything except files containing BROKEN"""
+    
+    def extract_pages(self, path):
+        data = path.read_bytes()
+        if b"BROKEN" in data:
+            raise ValueError("bad xref")
+        return [data.decode(errors="ignore")]
+
+
+def upload(manager, name, data):
+    tmp_path = manager.create_upload(name)
+    Path(tmp_path).write_bytes(data)
+    return manager.commit_upload(tmp_path, name)
+
+
+@pytest.mark.unit
+class TestDocumentManager:
+    """Test the document lifecycle"""
+    
+    def test_upload_replace_delete(self, tmp_path):
+        """Uploads are created, then replaced, then deleted with their chunks"""
+        store = FakeStore()
+        manager = DocumentManager(store, FakeLoader(), folder=str(tmp_path))
+        
+        created = upload(manager, "week1.pdf", b"%PDF-1.7 " + b"x" * 91)
+        assert created == {"filename": "week1.pdf", "source": "week1", "status": "created", "chunks": 10}
+        
+        replaced = upload(manager, "week1.pdf", b"%PDF-1.7 " + b"x" * 191)
+        assert replaced["status"] == "replaced"
+        assert replaced["chunks"] == 20
+        assert list(tmp_path.iterdir()) == [tmp_path / "week1.pdf"]  # No temp files left
+        
+        listed = manager.list_documents()
+        assert [(doc["filename"], doc["chunks"], doc["on_disk"]) for doc in listed] == [("week1.pdf", 20, True)]
+        
+        assert manager.delete("week1.pdf")["chunks_removed"] == 20
+        assert not (tmp_path / "week1.pdf").exists()
+        with pytest.raises(DocumentNotFoundError):
+            manager.delete("week1.pdf")
+    
+    def test_broken_upload_keeps_current_version(self, tmp_path):
+        """A replacement that fails to parse leaves the old file and chunks alone"""
+        store = FakeStore()
+        manager = DocumentManager(store, FakeLoader(), folder=str(tmp_path))
+        upload(manager, "syllabus.pdf", b"%PDF-1.7 original content....")
+        
+        with pytest.raises(DocumentError):
+            upload(manager, "syllabus.pdf", b"%PDF-1.7 BROKEN")
+        with pytest.raises(DocumentError):
+            upload(manager, "syllabus.pdf", b"<html>not a pdf</html>")
+        
+        assert (tmp_path / "syllabus.pdf").read_bytes() == b"%PDF-1.7 original content...."
+        assert store.chunks == {str(tmp_path / "syllabus.pdf"): 2}
+    
+    @pytest.mark.parametrize("name", ["../escape.pdf", "notes.txt", ".hidden.pdf", ""])
+    def test_rejects_unsafe_names(self, tmp_path, name):
+        """Only bare .pdf names inside the folder are accepted"""
+        manager = DocumentManager(FakeStore(), FakeLoader(), folder=str(tmp_path))
+        with pytest.raises(DocumentError):
+            manager.create_upload(name)
+    
+    def test_watcher_does_not_reingest_uploads(self, tmp_path):
+        """Files written through the manager are already handled for the watcher"""
+        store = FakeStore()
+        calls = []
+        original_index = store.index_file
+        store.index_file = lambda path: calls.append(path.name) or original_index(path)
+        watcher = PDFWatcher(store, folder=str(tmp_path), poll_interval=0, debounce_seconds=0)
+        manager = DocumentManager(store, FakeLoader(), folder=str(tmp_path), watcher=watcher)
+        
+        upload(manager, "week2.pdf", b"%PDF-1.7 lecture notes")
+        watcher.scan_once(now=0)
+        watcher.scan_once(now=1)
+        assert calls == ["week2.pdf"]
+        
+        manager.delete("week2.pdf")
+        watcher.scan_once(now=2)
+        assert watcher.counts["deleted"] == 0
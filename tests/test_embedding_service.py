@@ -0,0 +1,135 @@
+"""
+Tests for query embedding micro-batching
+"""
+import pytest
+import threading
+import time
+from unittest.mock import patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embedding_service import EmbeddingBatcher, ThreadedONNXEmbedding
+from src.profiler import profiler
+
+
+class SlowEmbedder:
+    """Fixed cost per forward pass, records every batch it receives"""
+    
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.batches = []
+    
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        return [[float(len(text)), float(sum(map(ord, text)))] for text in texts]
+
+
+def embed_concurrently(batcher, texts):
+    results = [None] * len(texts)
+    barrier = threading.Barrier(len(texts))
+    
+    def worker(i):
+        barrier.wait()
+        results[i] = batcher.embed(texts[i])
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.mark.unit
+class TestEmbeddingBatcher:
+    """Test batching, fan-out and latency"""
+    
+    def test_concurrent_requests_share_forward_passes(self):
+        """Concurrent callers are batched and each gets its own embedding back"""
+        embedder = SlowEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_batch=32, max_wait_ms=5)
+        texts = [f"question number {i}" * (i % 3 + 1) for i in range(24)]
+        
+        results = embed_concurrently(batcher, texts)
+        
+        assert results == [[float(len(t)), float(sum(map(ord, t)))] for t in texts]
+        assert len(embedder.batches) < len(texts) / 2
+        assert sum(len(batch) for batch in embedder.batches) == len(texts)
+        assert batcher.get_stats()["max_batch_size"] > 1
+    
+    def test_max_batch_respected(self):
+        """No forward pass receives more than max_batch texts"""
+        embedder = SlowEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_batch=4, max_wait_ms=5)
+        embed_concurrently(batcher, [str(i) for i in range(10)])
+        assert max(len(batch) for batch in embedder.batches) <= 4
+    
+    def test_single_request_does_not_wait_for_window(self):
+        """A lone caller is dispatched immediately, not after max_wait_ms"""
+        embedder = SlowEmbedder(delay=0)
+        batcher = EmbeddingBatcher(embedder, max_batch=32, max_wait_ms=500)
+        batcher.embed("warm up the worker thread")
+        
+        start = time.perf_counter()
+        batcher.embed("what is a semaphore?")
+        assert time.perf_counter() - start < 0.1
+    
+    def test_errors_reach_every_caller_in_batch(self):
+        """A failed forward pass raises in each waiting caller and the worker survives"""
+        def failing(texts):
+            raise RuntimeError("model not loaded")
+        
+        batcher = EmbeddingBatcher(failing, max_wait_ms=1)
+        with pytest.raises(RuntimeError):
+            batcher.embed("q")
+        batcher.embed_fn = SlowEmbedder(delay=0)
+        assert batcher.embed("ok") == [2.0, 218.0]
+    
+    def test_short_or_stuck_embedder_fails_callers(self):
+        """A batch with missing vectors fails every caller; a stuck one times out"""
+        batcher = EmbeddingBatcher(lambda texts: [[1.0]] * (len(texts) - 1), max_wait_ms=1, timeout_s=5)
+        with pytest.raises(RuntimeError, match="0 vectors for 1 texts"):
+            batcher.embed("q")
+        
+        release = threading.Event()
+        stuck = EmbeddingBatcher(lambda texts: release.wait(5) and [[1.0]], max_wait_ms=1, timeout_s=0.05)
+        with pytest.raises(TimeoutError):
+            stuck.embed("q")
+        release.set()
+    
+    def test_forward_pass_is_profiled_for_its_callers(self):
+        """The batcher thread's work is sampled into each caller's profile, not into unprofiled ones"""
+        batcher = EmbeddingBatcher(SlowEmbedder(delay=0.05), max_wait_ms=20)
+        profiles = []
+        
+        def profiled_embed(text):
+            with profiler.request("POST /api/query") as profile:
+                batcher.embed(text)
+            profiles.append(profile)
+        
+        with patch.object(profiler, "interval", 0.002):
+            threads = [threading.Thread(target=profiled_embed, args=(text,)) for text in ("a", "b")]
+            threads.append(threading.Thread(target=batcher.embed, args=("c",)))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        for profile in profiles:
+            assert any(line.startswith("embedding_batch;") and ":__call__" in line
+                       for line in profile.collapsed().splitlines())
+    
+    def test_onnx_session_built_with_thread_counts(self):
+        """The ONNX session is created once, with the configured thread counts"""
+        class FakeSession:
+            def __init__(self, path, sess_options=None, providers=None):
+                self.options = sess_options
+        
+        embedder = ThreadedONNXEmbedding(intra_op_threads=2, inter_op_threads=1)
+        embedder.ort._ort = type("FakeOrt", (), {"InferenceSession": FakeSession})
+        session = embedder.ort.InferenceSession("model.onnx", providers=["CPUExecutionProvider"])
+        assert session.options.intra_op_num_threads == 2
+        assert session.options.inter_op_num_threads == 1
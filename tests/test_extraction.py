@@ -0,0 +1,215 @@
+"""
+Tests for time-boxed PDF extraction, fallback engines and quarantine
+"""
+import json
+import os
+import pytest
+import time
+from unittest.mock import patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import extraction
+from src.extraction import ExtractionError, PDFExtractor, pypdf_pages, run_isolated
+from src.quarantine import QuarantineRegistry
+
+
+def make_pdf(path: Path, texts) -> Path:
+    """Write a minimal PDF with one line of Helvetica text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    
+    body, offsets = b"%PDF-1.4\n", []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    body += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(body)
+    return path
+
+
+def hanging_pypdf(pdf_path, page_timeout=0):
+    time.sleep(30)
+
+
+class SlowPage:
+    def __init__(self, text, delay=0.0):
+        self.text = text
+        self.delay = delay
+    
+    def extract_text(self):
+        time.sleep(self.delay)
+        return self.text
+
+
+class SlowReader:
+    """Stands in for PdfReader: the second page takes far too long"""
+    
+    def __init__(self, path):
+        self.pages = [SlowPage("page one"), SlowPage("page two", delay=30), SlowPage("page three")]
+
+
+def slow_reader_pages(pdf_path, page_timeout):
+    """pypdf_pages over SlowReader (patched inside the worker process)"""
+    with patch.object(extraction, "PdfReader", SlowReader):
+        return pypdf_pages(pdf_path, page_timeout)
+
+
+def fallback_pages(pdf_path):
+    return ["text from the fallback engine " * 3]
+
+
+def fallback_names():
+    return list(extraction.FALLBACK_EXTRACTORS)
+
+
+@pytest.fixture
+def fallback():
+    extraction.register_fallback("fake", fallback_pages)
+    yield "fake"
+    extraction.FALLBACK_EXTRACTORS.pop("fake", None)
+
+
+@pytest.mark.unit
+class TestIsolatedExtraction:
+    """Test the forked workers and their time budgets"""
+    
+    def test_extracts_text_in_a_worker(self, tmp_path):
+        pdf = make_pdf(tmp_path / "notes.pdf", ["Paging splits memory into pages", "Deadlock needs four conditions"])
+        extractor = PDFExtractor(file_timeout=30, page_timeout=5, min_text_chars=10, fallbacks=[])
+        assert extractor.extract(pdf) == ["Paging splits memory into pages", "Deadlock needs four conditions"]
+        assert extractor.counts["pypdf"] == 1
+    
+    def test_hanging_file_is_killed_and_fallback_used(self, tmp_path, fallback):
+        """A file over its budget costs the budget, not the full parse"""
+        pdf = make_pdf(tmp_path / "bad.pdf", ["irrelevant"])
+        extractor = PDFExtractor(file_timeout=0.5, page_timeout=0, min_text_chars=10, fallbacks=[fallback])
+        start = time.perf_counter()
+        with patch.object(extraction, "pypdf_pages", hanging_pypdf):
+            pages = extractor.extract(pdf)
+        
+        assert time.perf_counter() - start < 5
+        assert pages == ["text from the fallback engine " * 3]
+        assert (extractor.counts["timeouts"], extractor.counts["fallback"]) == (1, 1)
+    
+    def test_slow_page_is_skipped(self):
+        start = time.perf_counter()
+        pages, timed_out = run_isolated(slow_reader_pages, ("any.pdf", 0.2), timeout=10)
+        assert pages == ["page one", "", "page three"]
+        assert timed_out == [1]
+        assert time.perf_counter() - start < 5
+    
+    def test_workers_are_not_forked_from_this_process(self):
+        """Workers do not inherit this process's threads or module state"""
+        extraction.FALLBACK_EXTRACTORS["only_in_parent"] = (lambda: True, fallback_pages)
+        try:
+            assert "only_in_parent" not in run_isolated(fallback_names, (), timeout=10)
+        finally:
+            extraction.FALLBACK_EXTRACTORS.pop("only_in_parent")
+    
+    def test_crashing_worker_is_reported(self):
+        with pytest.raises(RuntimeError, match="exited with code 3"):
+            run_isolated(os._exit, (3,), timeout=10)
+    
+    def test_no_text_without_fallback_fails(self, tmp_path):
+        pdf = make_pdf(tmp_path / "scanned.pdf", [""])
+        extractor = PDFExtractor(file_timeout=30, min_text_chars=10, fallbacks=["not-installed"])
+        with pytest.raises(ExtractionError) as error:
+            extractor.extract(pdf)
+        assert error.value.reason == "no_text"
+        assert error.value.attempts == ["pypdf: no text", "not-installed: not available"]
+
+
+@pytest.mark.unit
+class TestQuarantine:
+    """Test that failing files are quarantined, skipped and can be released"""
+    
+    def test_failed_file_is_quarantined_and_skipped(self, tmp_path):
+        from src.page_cache import file_sha256
+        from src.pdf_loader import PDFLoader
+        
+        registry = QuarantineRegistry(str(tmp_path / "quarantine.json"))
+        extractor = PDFExtractor(file_timeout=30, min_text_chars=10, fallbacks=[])
+        pdf = make_pdf(tmp_path / "scanned.pdf", [""])
+        
+        with patch("src.pdf_loader.quarantine", registry), patch("src.pdf_loader.pdf_extractor", extractor):
+            loader = PDFLoader()
+            with pytest.raises(ExtractionError):
+                loader.extract_pages(pdf)
+            with pytest.raises(ExtractionError, match="quarantined"):
+                loader.extract_pages(pdf)
+            assert extractor.counts["files"] == 1  # Not parsed again
+            
+            file_hash = file_sha256(pdf)
+            entries = QuarantineRegistry(str(tmp_path / "quarantine.json")).list()  # Persisted
+            assert [(e["file_hash"], e["filename"], e["reason"]) for e in entries] == \
+                [(file_hash, "scanned.pdf", "no_text")]
+            
+            assert registry.release(file_hash)
+            assert not registry.release(file_hash)
+            with pytest.raises(ExtractionError):
+                loader.extract_pages(pdf)
+            assert extractor.counts["files"] == 2
+    
+    def test_partial_extraction_is_not_cached(self, tmp_path):
+        """Pages left out over the page budget are retried on the next load"""
+        from src.page_cache import PageTextCache, file_sha256
+        from src.pdf_loader import PDFLoader
+        
+        cache = PageTextCache(str(tmp_path / "cache"), 1 << 20)
+        extractor = PDFExtractor(file_timeout=30, page_timeout=0.2, min_text_chars=5, fallbacks=[], isolate=False)
+        pdf = make_pdf(tmp_path / "slow.pdf", ["irrelevant"])
+        with patch("src.pdf_loader.page_cache", cache), patch("src.pdf_loader.pdf_extractor", extractor), \
+                patch.object(extraction, "PdfReader", SlowReader):
+            assert PDFLoader().extract_pages(pdf) == ["page one", "", "page three"]
+        
+        assert cache.get_pages(file_sha256(pdf)) is None
+        assert extractor.get_stats()["partial_files"][0]["missing_pages"] == [1]
+    
+    def test_crashed_worker_is_retried_before_quarantine(self, tmp_path):
+        """An error is extracted again once, and only quarantines the file if it repeats"""
+        from src.pdf_loader import PDFLoader
+        
+        registry = QuarantineRegistry(str(tmp_path / "quarantine.json"))
+        extractor = PDFExtractor(file_timeout=30, fallbacks=[], isolate=False)
+        pdf = make_pdf(tmp_path / "notes.pdf", ["Paging splits memory into pages"])
+        calls = []
+        
+        def crash_once(pdf_path, page_timeout):
+            calls.append(pdf_path)
+            if len(calls) == 1:
+                raise RuntimeError("worker exited with code -9")
+            return pypdf_pages(pdf_path, page_timeout)
+        
+        with patch("src.pdf_loader.quarantine", registry), patch("src.pdf_loader.pdf_extractor", extractor), \
+                patch("src.pdf_loader.page_cache.get_pages", return_value=None), \
+                patch.object(extraction, "pypdf_pages", crash_once):
+            assert PDFLoader().extract_pages(pdf) == ["Paging splits memory into pages"]
+        assert len(calls) == 2 and len(registry) == 0
+    
+    def test_error_entries_expire(self, tmp_path):
+        """A repeated error quarantines the file for error_ttl, a timeout until released"""
+        registry = QuarantineRegistry(str(tmp_path / "quarantine.json"), error_ttl=60)
+        registry.add("crashed", tmp_path / "a.pdf", "error")
+        registry.add("hangs", tmp_path / "b.pdf", "timeout")
+        assert registry.get("crashed")["expires_at"] is not None
+        
+        later = time.time() + 61
+        with patch("src.quarantine.time.time", return_value=later):
+            assert registry.get("crashed") is None
+            assert registry.get("hangs")["reason"] == "timeout"
+            assert [entry["file_hash"] for entry in registry.list()] == ["hangs"]
+        assert "crashed" not in json.loads((tmp_path / "quarantine.json").read_text())
@@ -0,0 +1,96 @@
+"""
+Tests for follow-up detection and retrieval reuse
+"""
+import pytest
+from unittest.mock import Mock, patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.followup import classify_followup, condense_query
+from src.records import Hit
+
+
+@pytest.mark.unit
+class TestClassifyFollowup:
+    """Test the cheap follow-up detector"""
+    
+    @pytest.mark.parametrize("question", [
+        "Tell me more", "why?", "Explain further.", "Can you elaborate", "give me an example",
+        "please tell me more", "لماذا؟"
+    ])
+    def test_continuations(self, question):
+        assert classify_followup(question, True) == "continuation"
+    
+    @pytest.mark.parametrize("question", [
+        "What are its advantages?", "How is it different from paging?", "Who invented it?",
+        "What does that mean?", "ما هذا؟"
+    ])
+    def test_references(self, question):
+        assert classify_followup(question, True) == "reference"
+    
+    @pytest.mark.parametrize("question", [
+        "What is supervised learning in machine learning?", "ما هو نظام التشغيل؟",
+        "What is this course about?", "Is that all?"
+    ])
+    def test_new_questions(self, question):
+        assert classify_followup(question, True) == "new"
+    
+    def test_no_previous_context(self):
+        assert classify_followup("Tell me more", False) == "new"
+    
+    def test_condense_query(self):
+        assert condense_query("what are its advantages?", "What is paging?") == \
+            "What is paging? what are its advantages?"
+
+
+DOCS = [Hit("Paging splits memory into pages.", "OS", distance=0.2)]
+REPORT = {"selected": 1, "candidates": 1, "stopped_by": "max_results"}
+
+
+@pytest.mark.unit
+class TestRAGChainFollowups:
+    """Test that follow-ups reuse or extend the cached retrieval"""
+    
+    def setup_method(self):
+        from src.rag_chain import RAGChain
+        self.chain = RAGChain()
+        self.chain.chain = Mock()
+        self.chain.chain.run.return_value = "An answer"
+    
+    def test_continuation_skips_embedding_and_search(self):
+        """'Tell me more' reuses the previous chunks"""
+        with patch('src.rag_chain.vector_store.embed_query', return_value=[0.1] * 8) as embed, \
+                patch('src.rag_chain.vector_store.search_adaptive', return_value=(DOCS, REPORT)) as search:
+            self.chain.query("What is paging?", session_id="s")
+            result = self.chain.query("Tell me more", session_id="s")
+        
+        assert embed.call_count == 1
+        assert search.call_count == 1
+        assert result["retrieval_mode"] == "reused"
+        assert result["sources"] == ["OS"]
+        context = self.chain.chain.run.call_args.kwargs["context"]
+        assert "Paging splits memory" in context
+    
+    def test_reference_searches_with_condensed_query(self):
+        """Referring follow-ups search with the topic and keep earlier chunks"""
+        extra = [Hit("Paging avoids external fragmentation.", "Slides", distance=0.3)]
+        with patch('src.rag_chain.vector_store.embed_query', return_value=[0.1] * 8), \
+                patch('src.rag_chain.vector_store.search_adaptive',
+                      side_effect=[(DOCS, REPORT), (extra, REPORT)]) as search:
+            self.chain.query("What is paging?", session_id="s")
+            result = self.chain.query("What are its advantages?", session_id="s")
+        
+        assert search.call_args_list[1].args[0] == "What is paging? What are its advantages?"
+        assert result["retrieval_mode"] == "condensed"
+        assert set(result["sources"]) == {"OS", "Slides"}
+    
+    def test_sessions_do_not_share_context(self):
+        """A follow-up in another session is treated as a new question"""
+        with patch('src.rag_chain.vector_store.embed_query', return_value=[0.1] * 8), \
+                patch('src.rag_chain.vector_store.search_adaptive', return_value=(DOCS, REPORT)) as search:
+            self.chain.query("What is paging?", session_id="a")
+            result = self.chain.query("Tell me more", session_id="b")
+        assert search.call_count == 2
+        assert result["retrieval_mode"] == "search"
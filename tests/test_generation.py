@@ -0,0 +1,144 @@
+"""
+Tests for deadline-aware generation with hedging and extractive fallback
+"""
+import pytest
+import threading
+import time
+from unittest.mock import Mock, patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.generation import DeadlineExceeded, HedgedGenerator, extractive_answer
+from src.profiler import profiler
+from src.records import Hit
+
+REPORT = {"selected": 1, "candidates": 1, "stopped_by": "max_results"}
+
+
+class ScriptedLLM:
+    """LLM call whose n-th invocation sleeps (or fails) as scripted"""
+    
+    def __init__(self, *delays):
+        self.delays = list(delays)
+        self.calls = 0
+        self.lock = threading.Lock()
+    
+    def __call__(self, question=""):
+        with self.lock:
+            attempt = self.calls
+            self.calls += 1
+        delay = self.delays[min(attempt, len(self.delays) - 1)]
+        if isinstance(delay, Exception):
+            raise delay
+        time.sleep(delay)
+        return f"answer {attempt}"
+
+
+def generator(**kwargs):
+    settings = {"deadline_ms": 1000, "hedge_percentile": 95, "hedge_min_ms": 50,
+                "max_hedges": 1, "window": 50, "workers": 4}
+    settings.update(kwargs)
+    return HedgedGenerator(**settings)
+
+
+@pytest.mark.unit
+class TestHedgedGenerator:
+    """Test hedging, retries and the deadline"""
+    
+    def test_fast_call_is_not_hedged(self):
+        gen = generator()
+        answer, report = gen.run(ScriptedLLM(0.0), question="q")
+        assert answer == "answer 0"
+        assert (report["attempts"], report["hedged"]) == (1, False)
+    
+    def test_hedge_wins_over_a_stalled_call(self):
+        llm = ScriptedLLM(0.8, 0.01)
+        start = time.monotonic()
+        answer, report = generator().run(llm, question="q")
+        assert answer == "answer 1"
+        assert (report["attempts"], report["winner"]) == (2, 1)
+        assert time.monotonic() - start < 0.4
+    
+    def test_deadline_bounds_latency(self):
+        gen = generator(deadline_ms=150)
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            gen.run(ScriptedLLM(0.6), question="q")
+        assert time.monotonic() - start < 0.4
+        stats = gen.get_stats()
+        assert (stats["hedges"], stats["degraded"]) == (1, 1)
+    
+    def test_failed_call_is_retried(self):
+        gen = generator(hedge_min_ms=500)
+        answer, report = gen.run(ScriptedLLM(RuntimeError("rate limited"), 0.0), question="q")
+        assert answer == "answer 1"
+        assert gen.get_stats()["retries"] == 1
+    
+    def test_errors_propagate_when_retries_run_out(self):
+        gen = generator()
+        with pytest.raises(RuntimeError, match="rate limited"):
+            gen.run(ScriptedLLM(RuntimeError("rate limited")), question="q")
+        assert gen.get_stats()["errors"] == 1
+    
+    def test_hedge_delay_follows_observed_latency(self):
+        gen = generator(hedge_min_ms=10, window=100)
+        assert gen.hedge_delay_ms() == 10  # Too few samples yet
+        gen.latencies.extend(range(1, 101))
+        assert gen.hedge_delay_ms() == 95
+        assert gen.get_stats()["p99_ms"] == 99
+    
+    def test_no_deadline_calls_directly(self):
+        answer, report = generator(deadline_ms=0).run(ScriptedLLM(0.0), question="q")
+        assert answer == "answer 0"
+        assert report["elapsed_ms"] is None
+    
+    def test_profiled_request_samples_the_call(self):
+        """The LLM call runs on an executor thread but still shows up in the request's profile"""
+        with patch.object(profiler, "interval", 0.002):
+            with profiler.request("POST /api/query") as profile:
+                generator().run(ScriptedLLM(0.05), question="q")
+        assert any(line.startswith("generation;") and ":__call__" in line
+                   for line in profile.collapsed().splitlines())
+
+
+@pytest.mark.unit
+class TestExtractiveAnswer:
+    """Test the fallback answer built from retrieved chunks"""
+    
+    def test_quotes_matching_sentences_with_sources(self):
+        docs = [
+            Hit("Scheduling picks the next process. A deadlock needs four conditions to hold.", "os_week3"),
+            Hit("Circular wait is one of the deadlock conditions.", "os_week4")
+        ]
+        answer = extractive_answer("What conditions cause a deadlock?", docs, max_tokens=25)
+        assert answer.startswith("The answer could not be generated in time.")
+        assert "- [os_week3] A deadlock needs four conditions to hold." in answer
+        assert "- [os_week4] Circular wait is one of the deadlock conditions." in answer
+        assert "Scheduling" not in answer
+    
+    def test_no_documents(self):
+        assert "no course materials matched" in extractive_answer("What is paging?", [])
+
+
+@pytest.mark.unit
+class TestDegradedQuery:
+    """Test that RAGChain.query degrades instead of waiting on a slow LLM"""
+    
+    def test_query_returns_flagged_extractive_answer(self):
+        from src.rag_chain import RAGChain
+        chain = RAGChain()
+        chain.chain = Mock()
+        chain.chain.run.side_effect = lambda **kwargs: time.sleep(0.5) or "late answer"
+        chain.generator = generator(deadline_ms=100, hedge_min_ms=1000)
+        hits = [Hit("Paging splits memory into fixed-size pages.", "os_week5", distance=0.2)]
+        
+        with patch('src.rag_chain.vector_store.embed_query', return_value=[0.1] * 8), \
+                patch('src.rag_chain.vector_store.search_adaptive', return_value=(hits, REPORT)):
+            start = time.monotonic()
+            result = chain.query("What is paging?", session_id="deadline")
+        assert time.monotonic() - start < 0.4
+        assert result["degraded"] is True
+        assert "[os_week5] Paging splits memory into fixed-size pages." in result["answer"]
+        assert result["sources"] == ["os_week5"]
@@ -0,0 +1,95 @@
+"""
+Tests for configurable HNSW parameters, the HNSW rebuild and the benchmark
+"""
+import pytest
+from unittest.mock import patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from tools.common import stub_embeddings
+from tools.hnsw_bench import estimate_hnsw_bytes, format_table, run_benchmark, sample_queries
+
+
+class StubEmbeddingFunction:
+    """Chroma embedding function that needs no model download"""
+    
+    def __call__(self, input):
+        return stub_embeddings(input)
+
+
+def open_store(path, **settings):
+    """VectorStore on a temporary database with the given HNSW config"""
+    from src.vector_store import VectorStore
+    hnsw = {"HNSW_M": 16, "HNSW_CONSTRUCTION_EF": 100, "HNSW_SEARCH_EF": 10, "HNSW_COLLECTION_PARAMS": {}}
+    hnsw.update(settings)
+    patches = [patch(f'src.vector_store.config.{key}', value) for key, value in hnsw.items()]
+    patches += [patch('src.vector_store.config.CHROMA_DB_PATH', str(path)),
+                patch('src.vector_store.config.VECTOR_BACKEND', "chroma"),
+                patch('src.vector_store.config.EMBED_BATCHING', False),
+                patch('src.vector_store.embedding_functions.DefaultEmbeddingFunction', StubEmbeddingFunction)]
+    for active in patches:
+        active.start()
+    try:
+        store = VectorStore()
+    finally:
+        for active in patches:
+            active.stop()
+    store.embed_texts = stub_embeddings
+    return store
+
+
+@pytest.mark.unit
+class TestHnswSettings:
+    """Test that HNSW parameters come from config and changes are applied by a rebuild"""
+    
+    def test_metadata_from_config_and_overrides(self, tmp_path):
+        store = open_store(tmp_path / "chroma", HNSW_SEARCH_EF=64,
+                           HNSW_COLLECTION_PARAMS={"course_materials": {"M": 32}})
+        assert store.collection.metadata == {"hnsw:space": "cosine", "hnsw:M": 32,
+                                             "hnsw:construction_ef": 100, "hnsw:search_ef": 64}
+        assert store.hnsw_metadata({"construction_ef": 200})["hnsw:construction_ef"] == 200
+        with pytest.raises(ValueError, match="ef_search"):
+            store.hnsw_metadata({"ef_search": 50})
+    
+    def test_changed_settings_need_a_rebuild(self, tmp_path):
+        store = open_store(tmp_path / "chroma")
+        texts = [f"lecture {i} covers paging thread kernel mutex {i}" for i in range(20)]
+        store.collection.add(ids=[f"chunk_{i}" for i in range(20)], embeddings=stub_embeddings(texts),
+                             documents=texts, metadatas=[{"source": "os", "chunk_index": i} for i in range(20)])
+        
+        store = open_store(tmp_path / "chroma", HNSW_M=24, HNSW_SEARCH_EF=80)  # Restart with new settings
+        assert store.collection.metadata.get("hnsw:M", 16) == 16  # Existing index left as built
+        assert store.hnsw_changes() == {"M": (16, 24), "search_ef": (10, 80)}
+        assert store.get_collection_info()["hnsw_rebuild_needed"]
+        
+        report = store.rebuild_hnsw(batch_size=7)
+        assert report["ok"] and report["count"] == 20
+        assert report["hnsw_changes"] == {"M": (16, 24), "search_ef": (10, 80)}
+        assert store.collection.name == "course_materials_g1"
+        assert store.collection.metadata["hnsw:M"] == 24 and not store.hnsw_changes()
+        stored = store.collection.get(ids=["chunk_3"], include=["documents", "metadatas"])
+        assert stored["documents"] == [texts[3]] and stored["metadatas"][0]["chunk_index"] == 3
+
+
+@pytest.mark.unit
+class TestHnswBenchmark:
+    """Test recall measurement against exact search"""
+    
+    def test_grid_rows_and_recall(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(400, 16)).astype(np.float32)
+        ids = [f"chunk_{i}" for i in range(400)]
+        queries = sample_queries(vectors, 20) + rng.normal(0, 0.3, size=(20, 16))
+        
+        rows = run_benchmark(ids, vectors, queries, ms=[8], construction_efs=[100], search_efs=[10, 200], k=5)
+        assert [(row["M"], row["search_ef"]) for row in rows] == [(8, 10), (8, 200)]
+        assert rows[1]["recall"] == 1.0  # Candidate list covers half the corpus
+        assert rows[0]["recall"] <= rows[1]["recall"]
+        assert rows[0]["memory_mb"] == round(estimate_hnsw_bytes(400, 16, 8) / 1024 / 1024, 2)
+        assert "| 8 * |" in format_table(rows, current=(8, 100, 200))
+    
+    def test_memory_estimate_grows_with_m(self):
+        assert estimate_hnsw_bytes(1000, 384, 32) > estimate_hnsw_bytes(1000, 384, 16) > 1000 * 384 * 4
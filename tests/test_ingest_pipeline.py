@@ -0,0 +1,127 @@
+"""
+Tests for the staged ingestion pipeline
+"""
+import pytest
+import threading
+import time
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from unittest.mock import patch
+from src.ingest_pipeline import IngestPipeline
+from src.profiler import profiler
+from src.records import ChunkBatch
+
+
+class SlowLoader:
+    """Loader whose extraction takes a fixed time per file"""
+    
+    def __init__(self, delay: float = 0.0, chunks_per_file: int = 4, broken: str = None):
+        self.delay = delay
+        self.chunks_per_file = chunks_per_file
+        self.broken = broken
+    
+    def extract_pages(self, pdf_path, file_hash=None):
+        time.sleep(self.delay)
+        if pdf_path.name == self.broken:
+            raise ValueError("damaged xref table")
+        return [f"page of {pdf_path.stem}"]
+    
+    def chunk_pages(self, pages, pdf_path, file_hash=None):
+        batch = ChunkBatch()
+        batch.add_file(pdf_path.stem, str(pdf_path), file_hash or "",
+                       [f"{pdf_path.stem} chunk {i}" for i in range(self.chunks_per_file)])
+        return batch
+
+
+class SlowStore:
+    """Store whose embedding and writes take a fixed time per batch"""
+    
+    def __init__(self, embed_delay: float = 0.0, write_delay: float = 0.0):
+        self.embed_delay = embed_delay
+        self.write_delay = write_delay
+        self.rows = {}
+        self.lock = threading.Lock()
+    
+    def embed_texts(self, texts):
+        time.sleep(self.embed_delay)
+        return [[float(len(text))] for text in texts]
+    
+    def _upsert_batch(self, batch, embeddings=None, collection=None):
+        time.sleep(self.write_delay)
+        with self.lock:
+            for chunk_id, text, embedding in zip(batch.ids(), batch.contents, embeddings):
+                self.rows[chunk_id] = (text, embedding)
+
+
+def pdf_paths(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"course{i}.pdf"
+        path.write_bytes(b"%PDF-1.4 " + bytes([i]))
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.unit
+class TestIngestPipeline:
+    """Test that stages overlap, apply backpressure and isolate failures"""
+    
+    def test_all_chunks_are_embedded_and_written(self, tmp_path):
+        store = SlowStore()
+        pipeline = IngestPipeline(store, SlowLoader(chunks_per_file=5), batch_size=2)
+        stats = pipeline.run(pdf_paths(tmp_path, 3))
+        
+        assert (stats["files_indexed"], stats["chunks"], stats["errors"]) == (3, 15, 0)
+        assert len(store.rows) == 15
+        assert stats["stages"]["chunk"]["outputs"] == 9  # 3 batches of 2, 2, 1 per file
+        assert stats["stages"]["write"]["items"] == 9
+        text, embedding = next(value for key, value in store.rows.items() if key.endswith("_4"))
+        assert embedding == [float(len(text))]
+    
+    def test_stages_overlap(self, tmp_path):
+        """Wall time approaches the slowest stage, not the sum of all stages"""
+        delay = 0.05
+        store = SlowStore(embed_delay=delay, write_delay=delay)
+        pipeline = IngestPipeline(store, SlowLoader(delay=delay), extract_workers=1,
+                                  batch_size=8)
+        stats = pipeline.run(pdf_paths(tmp_path, 6))
+        
+        assert stats["chunks"] == 24
+        assert stats["sequential_s"] >= 3 * 6 * delay * 0.9
+        assert stats["wall_s"] < stats["sequential_s"] * 0.7
+    
+    def test_bounded_queues_apply_backpressure(self, tmp_path):
+        """A slow writer keeps every queue at its capacity instead of buffering the corpus"""
+        store = SlowStore(write_delay=0.02)
+        pipeline = IngestPipeline(store, SlowLoader(), queue_size=1, batch_size=1)
+        stats = pipeline.run(pdf_paths(tmp_path, 4))
+        
+        assert stats["chunks"] == 16
+        assert stats["bottleneck"] == "write"
+        assert all(stage["max_queue_depth"] <= 1 for stage in stats["stages"].values())
+        assert stats["stages"]["embed"]["blocked_s"] > 0
+    
+    def test_broken_file_does_not_stop_the_others(self, tmp_path):
+        store = SlowStore()
+        pipeline = IngestPipeline(store, SlowLoader(broken="course1.pdf"), extract_workers=2)
+        stats = pipeline.run(pdf_paths(tmp_path, 3))
+        
+        assert (stats["files_indexed"], stats["chunks"], stats["errors"]) == (2, 8, 1)
+        assert stats["stages"]["extract"]["errors"] == 1
+        assert stats["failed_files"] == ["course1.pdf"]
+        assert not any(key.startswith("course1_") for key in store.rows)
+    
+    def test_profiled_run_samples_every_stage(self, tmp_path):
+        """A profiled re-index shows the stage work, not just the caller's join"""
+        store = SlowStore(embed_delay=0.03)
+        pipeline = IngestPipeline(store, SlowLoader(delay=0.03), batch_size=2)
+        with patch.object(profiler, "interval", 0.002):
+            with profiler.request("POST /api/index") as profile:
+                pipeline.run(pdf_paths(tmp_path, 3))
+        
+        stacks = profile.collapsed()
+        assert "ingest_extract;" in stacks and "src.ingest_pipeline:_extract" in stacks
+        assert "ingest_embed;" in stacks and "src.ingest_pipeline:_embed" in stacks
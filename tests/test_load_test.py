@@ -0,0 +1,75 @@
+"""
+Tests for the API load-testing harness
+"""
+import asyncio
+import pytest
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.common import percentile
+from tools.load_test import find_saturation, run_load_test, summarize
+
+
+def stage(concurrency, rps, p95=100.0, error_rate=0.0):
+    return {"concurrency": concurrency, "throughput_rps": rps, "p95_ms": p95, "error_rate": error_rate}
+
+
+@pytest.mark.unit
+class TestLoadTestReport:
+    """Test latency statistics and saturation detection"""
+    
+    def test_percentile(self):
+        """Nearest-rank percentiles"""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([], 95) == 0.0
+    
+    def test_summarize(self):
+        """Samples are aggregated per stage and endpoint"""
+        samples = [
+            {"endpoint": "query", "latency_ms": 100, "ok": True, "error": None},
+            {"endpoint": "query", "latency_ms": 300, "ok": False, "error": "HTTP 500"},
+            {"endpoint": "history", "latency_ms": 10, "ok": True, "error": None},
+            {"endpoint": "history", "latency_ms": 20, "ok": True, "error": None},
+        ]
+        summary = summarize(samples, elapsed=2.0, concurrency=4)
+        assert summary["throughput_rps"] == 2.0
+        assert summary["error_rate"] == 0.25
+        assert summary["errors"] == {"HTTP 500": 1}
+        assert summary["endpoints"]["query"]["requests"] == 2
+    
+    def test_saturation_on_throughput_plateau(self):
+        """Saturation is the first level where throughput stops growing"""
+        stages = [stage(1, 10), stage(2, 19), stage(4, 20), stage(8, 20)]
+        result = find_saturation(stages, slo_p95_ms=1000)
+        assert result["concurrency"] == 4
+        assert result["max_sustained_rps"] == 20
+    
+    def test_saturation_on_slo_and_errors(self):
+        """Latency SLO breaches and errors also mark saturation"""
+        assert find_saturation([stage(1, 10), stage(2, 20, p95=5000)], 1000)["concurrency"] == 2
+        assert find_saturation([stage(1, 10, error_rate=0.2)], 1000)["concurrency"] == 1
+        assert find_saturation([stage(1, 10), stage(2, 20)], 1000) is None
+
+
+@pytest.mark.integration
+class TestLoadTestInProcess:
+    """Smoke-test a short in-process run"""
+    
+    def test_short_run(self):
+        """A short run against the stubbed app completes without errors and restores the globals"""
+        from src.rag_chain import rag_chain
+        from src.vector_store import vector_store
+        chain, cache_size = rag_chain.chain, rag_chain.answer_cache.max_entries
+        
+        report = asyncio.run(run_load_test(
+            [1, 2], duration=0.5, llm_latency_ms=5, stub_embedding_model=True
+        ))
+        assert len(report["stages"]) == 2
+        assert report["stages"][0]["requests"] > 0
+        assert report["stages"][0]["error_rate"] == 0.0
+        assert rag_chain.chain is chain and rag_chain.answer_cache.max_entries == cache_size
+        assert "embed_texts" not in vector_store.__dict__
@@ -0,0 +1,83 @@
+"""
+Tests for the extracted page text cache
+"""
+import pytest
+from unittest.mock import Mock, patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.page_cache import PageTextCache, file_sha256
+from src.pdf_loader import PDFLoader
+from src.extraction import PDFExtractor
+
+
+@pytest.mark.unit
+class TestPageTextCache:
+    """Test page cache storage and eviction"""
+    
+    def test_round_trip(self, tmp_path):
+        """Stored pages come back unchanged"""
+        cache = PageTextCache(cache_dir=str(tmp_path), max_bytes=1 << 20)
+        pages = ["First page", "", "Third page – مرحبا"]
+        cache.put_pages("abc", pages)
+        
+        assert cache.get_pages("abc") == pages
+        assert cache.get_page("abc", 2) == pages[2]
+        assert cache.get_page("abc", 3) is None
+    
+    def test_miss_returns_none(self, tmp_path):
+        """Unknown hashes are cache misses"""
+        cache = PageTextCache(cache_dir=str(tmp_path), max_bytes=1 << 20)
+        assert cache.get_pages("missing") is None
+        assert cache.get_stats()["misses"] == 1
+    
+    def test_eviction_respects_limit(self, tmp_path):
+        """Oldest entries are evicted once the size limit is exceeded"""
+        import os, random, string
+        rng = random.Random(0)
+        noise = "".join(rng.choice(string.ascii_letters) for _ in range(4000))
+        cache = PageTextCache(cache_dir=str(tmp_path), max_bytes=4000)
+        
+        cache.put_pages("old", [noise])
+        os.utime(tmp_path / "old.pgz", (1, 1))
+        cache.put_pages("new", [noise[::-1]])
+        
+        assert cache.get_pages("old") is None
+        assert cache.get_pages("new") == [noise[::-1]]
+        assert cache.get_stats()["size_bytes"] <= 4000
+    
+    def test_disabled_cache(self, tmp_path):
+        """A zero size limit disables caching"""
+        cache = PageTextCache(cache_dir=str(tmp_path / "off"), max_bytes=0)
+        cache.put_pages("abc", ["text"])
+        assert cache.get_pages("abc") is None
+    
+    def test_file_sha256_missing_file(self, tmp_path):
+        """Unreadable files have no hash"""
+        assert file_sha256(tmp_path / "nope.pdf") is None
+
+
+@pytest.mark.unit
+class TestPDFLoaderPageCache:
+    """Test that the loader skips parsing for cached files"""
+    
+    @patch('src.pdf_loader.pdf_extractor', PDFExtractor(isolate=False))
+    @patch('src.extraction.PdfReader')
+    def test_second_load_skips_parsing(self, mock_reader, tmp_path):
+        """Re-loading an unchanged file does not call PdfReader again"""
+        mock_page = Mock()
+        mock_page.extract_text.return_value = "Cached text content"
+        mock_reader.return_value.pages = [mock_page]
+        
+        pdf_path = tmp_path / "lecture.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4 fake")
+        
+        with patch('src.pdf_loader.page_cache', PageTextCache(str(tmp_path / "cache"), 1 << 20)):
+            loader = PDFLoader()
+            first = loader._load_pdf(pdf_path)
+            second = loader._load_pdf(pdf_path)
+        
+        assert mock_reader.call_count == 1
+        assert first.contents == second.contents
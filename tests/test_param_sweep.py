@@ -0,0 +1,72 @@
+"""
+Tests for the retrieval parameter sweep tool
+"""
+import json
+import pytest
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.common import stub_embeddings
+from src.records import Hit
+from tools.param_sweep import (
+    DEFAULT_GOLDEN_SET, first_relevant_rank, format_table, load_golden_set, parse_ks, run_sweep
+)
+
+
+def result(source):
+    return Hit("text", source, distance=0.1)
+
+
+@pytest.mark.unit
+class TestParamSweep:
+    """Test metrics, golden set loading and a small sweep"""
+    
+    def test_first_relevant_rank(self):
+        """Rank is 1-based and None when no expected source is retrieved"""
+        results = [result("os"), result("ml"), result("ethics")]
+        assert first_relevant_rank(results, {"ml"}) == 2
+        assert first_relevant_rank(results, {"ethics", "os"}) == 1
+        assert first_relevant_rank(results, {"english"}) is None
+    
+    def test_golden_set_formats(self, tmp_path):
+        """Single and multiple expected sources are both accepted"""
+        path = tmp_path / "golden.json"
+        path.write_text(json.dumps([
+            {"question": "q1", "expected_source": "os"},
+            {"question": "q2", "expected_sources": ["ml", "ethics"]}
+        ]))
+        golden = load_golden_set(path)
+        assert golden[0]["expected_sources"] == {"os"}
+        assert golden[1]["expected_sources"] == {"ml", "ethics"}
+        assert parse_ks("1,3,auto") == [1, 3, "auto"]
+    
+    def test_bundled_golden_set_matches_course_pdfs(self):
+        """Every expected source in the shipped golden set is a bundled PDF"""
+        pdf_stems = {p.stem for p in (Path(__file__).parent.parent / "assets" / "course_pdfs").glob("*.pdf")}
+        golden = load_golden_set(DEFAULT_GOLDEN_SET)
+        assert len(golden) >= 20
+        for entry in golden:
+            assert entry["expected_sources"] <= pdf_stems
+    
+    def test_small_sweep(self):
+        """Each chunking configuration and k produces one row; invalid pairs are skipped"""
+        corpus = {
+            Path("os.pdf"): ["deadlock occurs when processes wait on each other forever. " * 20],
+            Path("ml.pdf"): ["gradient descent minimizes the loss by following the gradient. " * 20]
+        }
+        golden = [
+            {"question": "what is a deadlock between processes", "expected_sources": {"os"}},
+            {"question": "how does gradient descent minimize loss", "expected_sources": {"ml"}}
+        ]
+        rows = run_sweep(corpus, golden, chunk_sizes=[200, 400], overlaps=[50, 300],
+                         ks=[1, "auto"], embed_fn=stub_embeddings)
+        
+        assert [(row["chunk_size"], row["overlap"], row["k"]) for row in rows] == [
+            (200, 50, 1), (200, 50, "auto"), (400, 50, 1), (400, 50, "auto"),
+            (400, 300, 1), (400, 300, "auto")
+        ]
+        assert all(row["recall"] == 1.0 and row["mrr"] == 1.0 for row in rows if row["k"] == 1)
+        assert rows[0]["chunks"] > rows[2]["chunks"]  # Smaller chunks, more of them
+        assert "| 400 * | 50 |" in format_table(rows, default=(400, 50))
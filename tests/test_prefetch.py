@@ -0,0 +1,144 @@
+"""
+Tests for type-ahead prefetch and the query caches it warms
+"""
+import pytest
+import threading
+import time
+from unittest.mock import patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.cache import embedding_key, normalize_query
+from src.prefetch import Prefetcher
+from src.records import Hit
+
+
+class RecordingWarmer:
+    """Warm function that records what it was asked to search"""
+    
+    def __init__(self):
+        self.calls = []
+        self.done = threading.Event()
+    
+    def __call__(self, text, session_id):
+        self.calls.append((session_id, text))
+        self.done.set()
+        return normalize_query(text)
+
+
+def wait_until(predicate, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return predicate()
+
+
+@pytest.mark.unit
+class TestPrefetcher:
+    """Test debouncing, cancellation and effectiveness metrics"""
+    
+    def test_only_the_last_keystroke_is_warmed(self):
+        """Rapid submits within the debounce window collapse into one search"""
+        warmer = RecordingWarmer()
+        prefetcher = Prefetcher(warmer, debounce_ms=50, min_chars=3, workers=1)
+        for text in ["What is", "What is dead", "What is deadlock"]:
+            assert prefetcher.submit("s", text) == "scheduled"
+        
+        assert warmer.done.wait(2)
+        time.sleep(0.1)
+        assert warmer.calls == [("s", "What is deadlock")]
+        stats = prefetcher.get_stats()
+        assert (stats["requests"], stats["superseded"], stats["executed"]) == (3, 2, 1)
+    
+    def test_short_text_is_ignored(self):
+        prefetcher = Prefetcher(RecordingWarmer(), debounce_ms=10, min_chars=12)
+        assert prefetcher.submit("s", "  What  ") == "ignored"
+        assert prefetcher.get_stats()["ignored"] == 1
+    
+    def test_query_cancels_pending_prefetch(self):
+        """A query arriving inside the debounce window means no prefetch runs"""
+        warmer = RecordingWarmer()
+        prefetcher = Prefetcher(warmer, debounce_ms=100, min_chars=3)
+        prefetcher.submit("s", "What is paging")
+        prefetcher.on_query("s", normalize_query("What is paging?"))
+        
+        time.sleep(0.2)
+        assert warmer.calls == []
+        stats = prefetcher.get_stats()
+        assert (stats["cancelled"], stats["executed"], stats["hits"], stats["misses"]) == (1, 0, 0, 0)
+    
+    def test_hit_and_waste_accounting(self):
+        """Warmed keys count as hits when the query matches, otherwise as waste"""
+        prefetcher = Prefetcher(RecordingWarmer(), debounce_ms=0, min_chars=3)
+        prefetcher.submit("a", "What is paging")
+        prefetcher.submit("b", "What is segmentation")
+        assert wait_until(lambda: prefetcher.get_stats()["executed"] == 2)
+        
+        prefetcher.on_query("a", normalize_query("what is  paging?"))
+        prefetcher.on_query("b", normalize_query("What is thrashing?"))
+        prefetcher.on_query("a", normalize_query("what is paging?"))  # Nothing warmed anymore
+        
+        stats = prefetcher.get_stats()
+        assert (stats["hits"], stats["misses"], stats["wasted"]) == (1, 1, 1)
+        assert stats["hit_rate"] == 0.5
+        assert stats["wasted_rate"] == 0.5
+    
+    def test_warm_errors_are_counted(self):
+        def failing(text, session_id):
+            raise RuntimeError("index busy")
+        
+        prefetcher = Prefetcher(failing, debounce_ms=0, min_chars=3)
+        prefetcher.submit("s", "What is paging")
+        assert wait_until(lambda: prefetcher.get_stats()["errors"] == 1)
+
+
+@pytest.mark.unit
+class TestQueryCaches:
+    """Test that warmed searches are reused and dropped when the index changes"""
+    
+    def setup_method(self):
+        from src.vector_store import vector_store
+        self.store = vector_store
+        self.store.embedding_cache.clear()
+        self.store.search_cache.clear()
+    
+    def test_normalize_query(self):
+        assert normalize_query("  What is   Paging? ") == normalize_query("what is paging")
+        assert embedding_key("  What is   Paging? ") == "What is Paging?"
+        assert embedding_key("What is paging?") != embedding_key("what is paging")
+    
+    def test_search_cache_is_invalidated_by_index_updates(self):
+        hits = [Hit("Paging splits memory into pages.", "OS", distance=0.2)]
+        with patch.object(self.store, "embed_texts", return_value=[[0.1] * 8]) as embed, \
+                patch.object(self.store, "query_embedder", None), \
+                patch.object(self.store, "_query_chroma", return_value=hits) as query:
+            first = self.store.search("What is paging", num_results=3)
+            second = self.store.search("what is paging?", num_results=3)
+            assert first == second == hits
+            assert (embed.call_count, query.call_count) == (1, 1)
+            
+            self.store.after_index_update()
+            self.store.search("What is  paging", num_results=3)
+            assert query.call_count == 2
+            assert embed.call_count == 1  # Embeddings do not depend on the index
+            
+            self.store.search("what is paging?", num_results=5)
+            assert embed.call_count == 2  # Punctuation and case reach the model
+    
+    def test_rag_chain_warm_uses_the_condensed_query(self):
+        """Follow-ups are warmed with the same query the real turn will search"""
+        from src.rag_chain import RAGChain
+        chain = RAGChain()
+        conversation = chain.conversations.get("s")
+        conversation.topic_question = "What is paging?"
+        conversation.last_context = [Hit("Paging splits memory into pages.", "OS", distance=0.2)]
+        
+        with patch('src.rag_chain.vector_store.embed_query', return_value=[0.1] * 8), \
+                patch('src.rag_chain.vector_store.search_adaptive', return_value=([], {})) as search:
+            key = chain.warm("What are its advantages", session_id="s")
+            assert key == normalize_query("What is paging? What are its advantages")
+            assert search.call_args[0][0] == "What is paging? What are its advantages"
+            assert chain.warm("Tell me more", session_id="s") is None
+        assert conversation.topic_question == "What is paging?"
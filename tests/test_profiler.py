@@ -0,0 +1,67 @@
+"""
+Tests for the opt-in sampling profiler
+"""
+import time
+import pytest
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.profiler import SamplingProfiler
+
+
+def busy_work(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+@pytest.mark.unit
+class TestSamplingProfiler:
+    """Test sampling, storage and the disabled fast path"""
+    
+    def test_profiled_request_collects_collapsed_stacks(self):
+        """Samples are rooted at the section name and name the busy function"""
+        profiler = SamplingProfiler(interval_ms=1, sample_rate=0, max_profiles=5)
+        
+        @profiler.profiled("query")
+        def handler():
+            busy_work(0.1)
+        
+        with profiler.request("POST /api/query") as profile:
+            handler()
+        
+        assert profile.samples > 0
+        lines = profile.collapsed().strip().splitlines()
+        assert all(line.startswith("query;") for line in lines)
+        assert any("busy_work" in line for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert profiler.get(profile.id) is profile
+    
+    def test_no_sampling_outside_profiled_request(self):
+        """Instrumented code does not sample when the request is not selected"""
+        profiler = SamplingProfiler(interval_ms=1, sample_rate=0, max_profiles=5)
+        
+        @profiler.profiled("query")
+        def handler():
+            busy_work(0.02)
+            return 42
+        
+        assert handler() == 42
+        assert profiler.list_profiles() == []
+    
+    def test_should_profile(self):
+        """Header forces profiling; rate controls the rest"""
+        assert SamplingProfiler(sample_rate=0).should_profile("1")
+        assert not SamplingProfiler(sample_rate=0).should_profile("0")
+        assert not SamplingProfiler(sample_rate=0).should_profile(None)
+        assert SamplingProfiler(sample_rate=1).should_profile(None)
+    
+    def test_stored_profiles_are_bounded(self):
+        """Only the newest profiles are kept"""
+        profiler = SamplingProfiler(interval_ms=1, sample_rate=0, max_profiles=2)
+        for i in range(3):
+            with profiler.request(f"req{i}"):
+                pass
+        assert [p["label"] for p in profiler.list_profiles()] == ["req2", "req1"]
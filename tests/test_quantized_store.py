@@ -0,0 +1,88 @@
+"""
+Tests for the int8 quantized vector index
+"""
+import pytest
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from src.quantized_store import QuantizedIndex
+
+
+def clustered_vectors(n: int = 2000, dimension: int = 64, seed: int = 0) -> np.ndarray:
+    """Embedding-like data: points scattered around a few topic centres"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(20, dimension))
+    return centres[rng.integers(0, 20, n)] + rng.normal(scale=0.4, size=(n, dimension))
+
+
+@pytest.mark.unit
+class TestQuantizedIndex:
+    """Test quantization, rescoring and the evaluation report"""
+    
+    def setup_method(self):
+        self.vectors = clustered_vectors()
+        self.ids = [f"chunk_{i}" for i in range(len(self.vectors))]
+    
+    def test_build_and_reload(self, tmp_path):
+        """The index persists and reloads with the full-precision file memory-mapped"""
+        QuantizedIndex(str(tmp_path)).build(self.ids, self.vectors)
+        index = QuantizedIndex(str(tmp_path))
+        assert index.ready
+        assert index.codes.dtype == np.int8
+        assert isinstance(index.full, np.memmap)
+    
+    def test_self_query_finds_itself(self, tmp_path):
+        """A stored vector is its own nearest neighbour with ~zero distance"""
+        index = QuantizedIndex(str(tmp_path))
+        index.build(self.ids, self.vectors)
+        hits = index.search(self.vectors[123], k=5)
+        assert hits[0][0] == "chunk_123"
+        assert hits[0][1] == pytest.approx(0.0, abs=1e-5)
+        assert [d for _, d in hits] == sorted(d for _, d in hits)
+    
+    def test_recall_and_memory(self, tmp_path):
+        """Rescoring keeps recall high at a quarter of the memory"""
+        index = QuantizedIndex(str(tmp_path))
+        index.build(self.ids, self.vectors)
+        queries = clustered_vectors(n=50, seed=1)
+        report = index.evaluate(queries, k=10, rescore_factor=4)
+        assert report["recall_at_k"] >= 0.95
+        assert report["savings_ratio"] > 0.7
+    
+    def test_missing_index_is_not_ready(self, tmp_path):
+        index = QuantizedIndex(str(tmp_path / "none"))
+        assert not index.ready
+        assert index.search([1.0] * 64, k=3) == []
+    
+    def test_rebuild_never_touches_the_loaded_files(self, tmp_path):
+        """A rebuild writes a new directory, so arrays a search holds stay valid"""
+        index = QuantizedIndex(str(tmp_path))
+        index.build(self.ids, self.vectors)
+        held = index.full
+        first_row = np.array(held[0])
+        
+        index.build(self.ids[:100], self.vectors[100:200] * -1)
+        assert np.array_equal(held[0], first_row)
+        assert len(QuantizedIndex(str(tmp_path)).ids) == 100
+        assert len([path for path in tmp_path.iterdir() if path.is_dir()]) == 1
+    
+    def test_small_changes_go_to_the_delta(self, tmp_path):
+        """Added and removed chunks are searchable without rewriting the base"""
+        index = QuantizedIndex(str(tmp_path))
+        index.build(self.ids[:1000], self.vectors[:1000])
+        base = index._snapshot.base
+        
+        assert index.update(["new_chunk", "chunk_5"], [self.vectors[1500], self.vectors[5]], ["chunk_7"])
+        assert index._snapshot.base == base and index.count == 1000
+        assert index.search(self.vectors[1500], k=1)[0][0] == "new_chunk"
+        assert "chunk_7" not in {chunk_id for chunk_id, _ in index.search(self.vectors[7], k=10)}
+        
+        reloaded = QuantizedIndex(str(tmp_path))
+        assert reloaded.search(self.vectors[1500], k=1)[0][0] == "new_chunk"
+        assert reloaded.exact_search(self.vectors[7], k=1)[0][0] != "chunk_7"
+        
+        # A change larger than COMPACT_RATIO of the base asks for a rebuild
+        assert not index.update(self.ids[1000:1300], self.vectors[1000:1300], [])
@@ -0,0 +1,128 @@
+"""
+Tests for the query log, the startup cache warm-up and the answer cache
+"""
+import pytest
+import json
+import time
+from unittest.mock import Mock, patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.query_log import CacheWarmer, QueryLog
+from src.records import Hit
+
+REPORT = {"selected": 1, "candidates": 1, "stopped_by": "max_results"}
+
+
+@pytest.fixture
+def query_log(tmp_path):
+    return QueryLog(str(tmp_path / "log" / "queries.jsonl"), max_kb=1, backups=2, enabled=True)
+
+
+@pytest.mark.unit
+class TestQueryLog:
+    """Test recording, privacy and ranking of logged questions"""
+    
+    def test_records_compact_anonymous_lines(self, query_log):
+        query_log.record("  What is a Deadlock? ", "student-42")
+        entry = json.loads(query_log.path.read_text())
+        assert entry["q"] == "what is a deadlock"
+        assert entry["t"] % 60 == 0
+        assert "student-42" not in query_log.path.read_text() and len(entry["s"]) == 8
+    
+    def test_personal_questions_are_not_logged(self, query_log):
+        query_log.record("my email is ali@uni.edu, why was I graded 3?", "a")
+        query_log.record("student id 20231187 grade for OS", "a")
+        query_log.record("see https://drive.example.com/x?token=abc", "a")
+        assert not query_log.path.exists()
+        assert query_log.get_stats()["skipped"] == 3
+    
+    def test_rotation_keeps_a_bounded_number_of_files(self, query_log):
+        for i in range(100):
+            query_log.record(f"what is paging in lecture {i}", f"s{i}")
+        files = sorted(p.name for p in query_log.path.parent.iterdir())
+        assert files == ["queries.jsonl", "queries.jsonl.1", "queries.jsonl.2"]
+        assert all(p.stat().st_size <= 1024 for p in query_log.path.parent.iterdir())
+    
+    def test_top_queries_by_count_sessions_and_age(self, query_log):
+        for session in ("a", "b", "c"):
+            query_log.record("What is paging?", session)
+        for session in ("a", "b"):
+            query_log.record("What is a mutex?", session)
+        for _ in range(5):
+            query_log.record("my own strange question", "a")  # One student only
+        
+        assert query_log.top_queries(5, min_sessions=2) == ["what is paging", "what is a mutex"]
+        assert query_log.top_queries(1) == ["my own strange question"]
+        
+        old = {"t": int(time.time()) - 10 * 86400, "s": "zz", "q": "last term's question"}
+        with open(query_log.path, "a") as log_file:
+            log_file.write(json.dumps(old) + "\n" + '{"t": 1, "q"\n')  # Plus a torn line
+        assert "last term's question" not in query_log.top_queries(10, lookback_s=7 * 86400)
+    
+    def test_disabled_log_records_nothing(self, tmp_path):
+        log = QueryLog(str(tmp_path / "q.jsonl"), enabled=False)
+        log.record("What is paging?", "a")
+        assert not log.path.exists()
+
+
+@pytest.mark.unit
+class TestCacheWarmer:
+    """Test the startup replay and readiness"""
+    
+    def test_replays_most_asked_first_then_reports_ready(self, query_log):
+        for question, sessions in (("what is paging", "abc"), ("what is a mutex", "ab")):
+            for session in sessions:
+                query_log.record(question, session)
+        model, warmed = Mock(), []
+        warmer = CacheWarmer(query_log, model, warmed.append, budget_s=10,
+                             max_queries=10, lookback_hours=1, min_sessions=2)
+        assert not warmer.ready
+        
+        warmer.start()
+        assert warmer.wait(5)
+        model.assert_called_once()
+        assert warmed == ["what is paging", "what is a mutex"]
+        assert warmer.get_stats()["warmed"] == 2 and warmer.get_stats()["ready"]
+    
+    def test_budget_and_failures(self, query_log):
+        for i in range(5):
+            query_log.record(f"question number {i}", "a")
+        
+        def slow_or_failing(question):
+            if question.endswith("0"):
+                raise RuntimeError("LLM down")
+            time.sleep(0.1)
+        
+        report = CacheWarmer(query_log, Mock(side_effect=OSError("no model")), slow_or_failing,
+                             budget_s=0.15, max_queries=5, lookback_hours=1, min_sessions=1).run()
+        assert report["failed"] == 1 and report["warmed"] == 2
+        assert report["skipped_by_budget"] == 2
+
+
+@pytest.mark.unit
+class TestAnswerCache:
+    """Test that first-turn answers are reused until the index changes"""
+    
+    def test_repeat_question_skips_the_llm(self, tmp_path):
+        from src.rag_chain import RAGChain, WARMUP_SESSION
+        chain = RAGChain()
+        chain.chain = Mock()
+        chain.chain.run.return_value = "Paging splits memory into pages."
+        hits = [Hit("Paging splits memory into fixed-size pages.", "os_week5", distance=0.2)]
+        
+        with patch('src.rag_chain.vector_store.embed_query', return_value=[0.1] * 8), \
+                patch('src.rag_chain.vector_store.search_adaptive', return_value=(hits, REPORT)), \
+                patch('src.rag_chain.config.WARM_ANSWERS', True):
+            chain.warm_answer("what is paging")
+            first = chain.query("What is paging?", session_id="s1")
+            follow_up = chain.query("What is paging?", session_id="s1")  # Has history now
+            with patch('src.rag_chain.vector_store.index_generation', 99):
+                after_reindex = chain.query("What is paging?", session_id="s2")
+        
+        assert chain.conversations.get(WARMUP_SESSION).turns == 0
+        assert first["answer_cached"] and first["sources"] == ["os_week5"]
+        assert not follow_up["answer_cached"] and not after_reindex["answer_cached"]
+        assert chain.chain.run.call_count == 3
@@ -0,0 +1,83 @@
+"""
+Tests for the compact chunk and hit records
+"""
+import pytest
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.records import Chunk, ChunkBatch, Hit
+
+
+def two_file_batch() -> ChunkBatch:
+    batch = ChunkBatch()
+    batch.add_file("os", "pdfs/os.pdf", "a" * 64, ["os 0", "os 1", "os 2"])
+    batch.add_file("ml", "pdfs/ml.pdf", "b" * 64, ["ml 0", "ml 1"])
+    return batch
+
+
+@pytest.mark.unit
+class TestRecords:
+    """Test record layout and conversions"""
+    
+    def test_records_have_no_instance_dict(self):
+        """Chunks and hits use slots, not a per-instance __dict__"""
+        assert not hasattr(Chunk("text", "os"), "__dict__")
+        assert not hasattr(Hit("text", "os", distance=0.1), "__dict__")
+    
+    def test_hit_from_chroma_metadata(self):
+        """Hits are built from Chroma results, tolerating missing fields"""
+        hit = Hit.from_metadata("text", {"source": "os", "chunk_index": 4, "file_hash": "abc"}, 0.25)
+        assert (hit.source, hit.chunk_index, hit.file_path, hit.distance) == ("os", 4, "", 0.25)
+        
+        shorter = hit.with_content("te")
+        assert shorter.content == "te" and shorter.distance == 0.25 and hit.content == "text"
+    
+    def test_equal_records_hash_equal(self):
+        """Records compare by value and can be used in sets and as dict keys"""
+        hits = {Hit("text", "os", 1, distance=0.2), Hit("text", "os", 1, distance=0.2)}
+        assert len(hits) == 1
+        assert len({Chunk("text", "os"), Hit("text", "os")}) == 2
+
+
+@pytest.mark.unit
+class TestChunkBatch:
+    """Test the columnar batch form"""
+    
+    def test_rows_ids_and_metadata(self):
+        """Per-file fields are expanded per row only when needed"""
+        batch = two_file_batch()
+        assert len(batch) == 5
+        assert batch[3] == Chunk("ml 0", "ml", 0, "pdfs/ml.pdf", "b" * 64)
+        assert batch[-1].content == "ml 1"
+        assert batch.ids() == [chunk.chunk_id for chunk in batch]
+        assert batch.ids()[0] == "os_aaaaaaaaaaaa_0"
+        assert batch.metadatas()[4] == {
+            "source": "ml", "chunk_index": 1, "file_path": "pdfs/ml.pdf", "file_hash": "b" * 64
+        }
+        with pytest.raises(IndexError):
+            batch[5]
+    
+    def test_slice_across_file_boundary(self):
+        """Slices keep the right file and chunk index for every row"""
+        batch = two_file_batch()
+        part = batch.slice(2, 4)
+        assert [(c.source, c.chunk_index, c.content) for c in part] == [("os", 2, "os 2"), ("ml", 0, "ml 0")]
+        assert len(batch.slice(4, 100)) == 1
+        assert len(batch.slice(5, 10)) == 0
+    
+    def test_extend_and_from_chunks_round_trip(self):
+        """Batches can be merged and rebuilt from rows without changes"""
+        merged = ChunkBatch()
+        merged.extend(two_file_batch())
+        merged.extend(two_file_batch())
+        assert len(merged) == 10
+        assert merged.sources() == ["os", "ml", "os", "ml"]
+        
+        rebuilt = ChunkBatch.from_chunks(list(merged))
+        assert list(rebuilt) == list(merged)
+        assert rebuilt.ids() == merged.ids()
+        
+        gappy = ChunkBatch.from_chunks([chunk for chunk in merged if chunk.chunk_index != 1])
+        assert [c.chunk_index for c in gappy.slice(1, 4)] == [2, 0, 0]
@@ -0,0 +1,219 @@
+"""
+Tests for per-session ordering of concurrent requests
+"""
+import pytest
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.conversation_store import ConversationStore, SessionBusy
+from src.records import Hit
+
+REPORT = {"selected": 1, "candidates": 1, "stopped_by": "max_results"}
+
+
+class EchoLLM:
+    """LLM stub that answers after a random pause and records what it was shown"""
+    
+    def __init__(self, min_delay: float = 0.005, max_delay: float = 0.015):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.prompts = []
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+    
+    def run(self, context="", question="", chat_history=""):
+        with self.lock:
+            self.prompts.append((question, chat_history))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(random.uniform(self.min_delay, self.max_delay))
+        with self.lock:
+            self.active -= 1
+        return f"answer to {question}"
+
+
+@pytest.fixture
+def chain():
+    from src.rag_chain import RAGChain
+    chain = RAGChain()
+    chain.chain = EchoLLM()
+    chain.answer_cache.max_entries = 0
+    chain.conversations = ConversationStore(queue_size=100, queue_timeout_s=30)
+    hits = [Hit("Paging splits memory into fixed-size pages.", "os_week5", distance=0.2)]
+    with patch('src.rag_chain.vector_store.embed_query', return_value=[0.1] * 8), \
+            patch('src.rag_chain.vector_store.search_adaptive', return_value=(hits, REPORT)):
+        yield chain
+
+
+@pytest.mark.unit
+class TestSessionQueue:
+    """Test the per-session FIFO, its bound and its timeout"""
+    
+    def test_same_session_runs_in_arrival_order(self):
+        store = ConversationStore(queue_size=10)
+        order = []
+        
+        def request(i):
+            with store.turn("s"):
+                order.append(i)
+                time.sleep(0.01)
+        
+        with store.turn("s"):  # Hold the session while requests line up
+            threads = []
+            for i in range(5):
+                threads.append(threading.Thread(target=request, args=(i,)))
+                threads[-1].start()
+                while store.get_queue_stats()["queued"] < i + 1:
+                    time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        assert order == [0, 1, 2, 3, 4]
+        assert store.get_queue_stats()["busy_sessions"] == 0
+    
+    def test_full_queue_fails_fast(self):
+        store = ConversationStore(queue_size=1)
+        release = threading.Event()
+        
+        def hold():
+            with store.turn("s"):
+                release.wait(5)
+        
+        holders = [threading.Thread(target=hold) for _ in range(2)]  # Running + one queued
+        for thread in holders:
+            thread.start()
+        while store.get_queue_stats()["queued"] < 1:
+            time.sleep(0.001)
+        
+        start = time.monotonic()
+        with pytest.raises(SessionBusy):
+            with store.turn("s"):
+                pass
+        assert time.monotonic() - start < 0.1
+        with store.turn("other"):  # Other sessions are unaffected
+            pass
+        release.set()
+        for thread in holders:
+            thread.join()
+        assert store.get_queue_stats()["rejected"] == 1
+    
+    def test_timed_out_request_does_not_stall_the_queue(self):
+        store = ConversationStore(queue_size=5, queue_timeout_s=0.05)
+        with store.turn("s"):
+            with pytest.raises(SessionBusy):
+                with store.turn("s"):
+                    pass
+        with store.turn("s"):  # The abandoned ticket is skipped
+            pass
+        assert store.get_queue_stats() == {"busy_sessions": 0, "queued": 0, "queue_size": 5, "rejected": 1}
+
+
+@pytest.mark.unit
+class TestEventLoopAdmission:
+    """Test that same-session requests wait on the event loop, not in worker threads"""
+    
+    def test_queued_requests_wait_without_threads(self):
+        store = ConversationStore(queue_size=10, queue_timeout_s=5)
+        order, in_turn = [], []
+        
+        def run_turn(i):
+            with store.turn("s"):
+                in_turn.append(store._queues["s"].pending)
+                time.sleep(0.02)
+                order.append(i)
+        
+        async def request(i):
+            async with store.admit("s"):
+                await asyncio.to_thread(run_turn, i)
+        
+        async def main():
+            tasks = [asyncio.create_task(request(i)) for i in range(6)]
+            await asyncio.sleep(0.01)
+            stats = store.get_queue_stats()
+            await asyncio.gather(*tasks)
+            return stats
+        
+        stats = asyncio.run(main())
+        assert stats["busy_sessions"] == 1 and stats["queued"] == 5
+        assert order == list(range(6))
+        assert in_turn == [1] * 6  # No thread ever waited behind another
+        assert store.get_queue_stats()["busy_sessions"] == 0
+    
+    def test_bound_and_timeout(self):
+        store = ConversationStore(queue_size=1, queue_timeout_s=0.05)
+        
+        async def hold():
+            async with store.admit("s"):
+                await asyncio.sleep(0.2)
+        
+        async def ask():
+            async with store.admit("s"):
+                pass
+        
+        async def ask_other():
+            async with store.admit("other"):  # Other sessions are unaffected
+                pass
+        
+        async def main():
+            holder = asyncio.create_task(hold())
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(ask())
+            await asyncio.sleep(0)
+            with pytest.raises(SessionBusy, match="in flight"):
+                await ask()  # Running + one waiting is the bound
+            with pytest.raises(SessionBusy, match="busy for"):
+                await waiter
+            await ask_other()
+            await holder
+        
+        asyncio.run(main())
+        assert store.get_queue_stats() == {"busy_sessions": 0, "queued": 0, "queue_size": 1, "rejected": 2}
+
+
+@pytest.mark.unit
+class TestConcurrentSessions:
+    """Stress test: many sessions, many turns each, all in flight at once"""
+    
+    def test_no_lost_or_interleaved_turns(self, chain):
+        sessions, turns = 16, 8
+        requests = [(f"student-{s}", t) for s in range(sessions) for t in range(turns)]
+        random.Random(7).shuffle(requests)
+        
+        def ask(request):
+            session, t = request
+            return session, chain.query(f"question {t} from {session}", session_id=session)
+        
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=64) as pool:
+            results = list(pool.map(ask, requests))
+        elapsed = time.monotonic() - start
+        
+        for s in range(sessions):
+            session = f"student-{s}"
+            history = chain.get_conversation_history(session)
+            assert len(history) == 2 * turns  # Nothing lost
+            assert [m["role"] for m in history] == ["student", "assistant"] * turns
+            assert [m["id"] for m in history] == sorted(m["id"] for m in history)
+            for asked, answered in zip(history[::2], history[1::2]):
+                assert answered["content"] == f"answer to {asked['content']}"  # Nothing interleaved
+            numbers = sorted(r["conversation_turn"] for name, r in results if name == session)
+            assert numbers == list(range(1, turns + 1))
+        
+        # Every prompt carried exactly the turns completed before it, all from its own session
+        turn_of = {r["question"]: r["conversation_turn"] for _, r in results}
+        for question, chat_history in chain.chain.prompts:
+            session = question.split(" from ")[1]
+            lines = chat_history.splitlines() if chat_history else []
+            assert len(lines) == min(2 * (turn_of[question] - 1), chain.max_memory)
+            assert all(line.endswith(session) for line in lines)
+        
+        assert chain.chain.peak > 1  # Sessions ran in parallel
+        assert elapsed < sessions * turns * chain.chain.min_delay  # Faster than any serial run
@@ -0,0 +1,184 @@
+"""
+Tests for shadow re-indexing with atomic collection swaps
+"""
+import pytest
+import json
+from unittest.mock import patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from tools.common import stub_embeddings
+from src.records import ChunkBatch
+
+
+class StubEmbeddingFunction:
+    """Chroma embedding function that needs no model download"""
+    
+    def __call__(self, input):
+        return stub_embeddings(input)
+
+
+def fill_with(texts):
+    """Fill function writing one chunk per text"""
+    def fill(collection):
+        collection.add(ids=[f"chunk_{i}" for i in range(len(texts))],
+                       embeddings=stub_embeddings(texts), documents=list(texts),
+                       metadatas=[{"source": "lecture", "chunk_index": i} for i in range(len(texts))])
+        return len(texts)
+    return fill
+
+
+@pytest.fixture
+def store(tmp_path):
+    """VectorStore on a temporary database with stub embeddings"""
+    from src.vector_store import VectorStore
+    with patch('src.vector_store.config.CHROMA_DB_PATH', str(tmp_path / "chroma")), \
+            patch('src.vector_store.config.VECTOR_BACKEND', "chroma"), \
+            patch('src.vector_store.config.EMBED_BATCHING', False):
+        store = VectorStore()
+        store.embedding_function = StubEmbeddingFunction()
+        store.collection = store._get_collection(store.collection.name)
+        store.embed_texts = stub_embeddings
+        yield store
+
+
+def words(seed: int) -> str:
+    rng = np.random.default_rng(seed)
+    return " ".join(rng.choice(["paging", "thread", "kernel", "mutex", "cache", "disk", "socket"], 40))
+
+
+@pytest.mark.unit
+class TestShadowRebuild:
+    """Test that rebuilds are validated, swapped atomically and reversible"""
+    
+    def test_live_index_serves_until_swap(self, store):
+        fill_with([words(0), words(1)])(store.collection)
+        old_results = store.search(words(0), num_results=1)
+        seen_during_fill = []
+        
+        def fill(shadow):
+            count = fill_with([words(i) for i in range(10, 20)])(shadow)
+            seen_during_fill.append((store.collection.count(), store.search(words(0), num_results=1)))
+            return count
+        
+        report = store.rebuild(fill, min_count_ratio=0)
+        assert report["ok"] and report["sample_hits"] == report["sample_queries"] == 5
+        assert seen_during_fill == [(2, old_results)]  # Served from the old index (and its cache)
+        assert store.collection.count() == 10
+        assert store.search(words(0), num_results=1) != old_results  # Cache keyed by generation
+        
+        state = json.loads(store.generations_path.read_text())
+        assert (state["live"], state["previous"]) == ("course_materials_g1", "course_materials")
+    
+    def test_rollback_and_retention(self, store):
+        store.rebuild(fill_with([words(i) for i in range(3)]))
+        store.rebuild(fill_with([words(i) for i in range(4)]))
+        assert store.get_generations()["previous"] == "course_materials_g1"
+        assert "course_materials" not in [c.name for c in store.client.list_collections()]
+        
+        state = store.rollback()
+        assert (state["live"], state["live_count"], state["previous"]) == ("course_materials_g1", 3, "course_materials_g2")
+        state = store.rollback()  # Undo the rollback
+        assert (state["live"], state["live_count"]) == ("course_materials_g2", 4)
+    
+    def test_rejected_shadow_keeps_live_index(self, store):
+        store.rebuild(fill_with([words(i) for i in range(10)]))
+        live = store.collection.name
+        
+        report = store.rebuild(fill_with([words(1), words(2)]))  # Lost most of the corpus
+        assert not report["ok"]
+        assert "below 50%" in report["problems"][0]
+        assert store.collection.name == live
+        assert "course_materials_g2" not in [c.name for c in store.client.list_collections()]
+        
+        report = store.rebuild(lambda shadow: 5)  # Claims chunks it never wrote
+        assert not report["ok"] and store.collection.name == live
+    
+    def test_no_previous_generation(self, store):
+        with pytest.raises(ValueError):
+            store.rollback()
+    
+    def test_changes_during_rebuild_are_replayed(self, store, tmp_path):
+        upload = tmp_path / "week9.pdf"
+        upload.write_bytes(b"week9")
+        batch = ChunkBatch()
+        batch.add_file("week9", str(upload), "hash9", [words(99)])
+        
+        def fill(shadow):
+            with patch('src.vector_store.pdf_loader._load_pdf', return_value=batch):
+                store.index_file(upload)  # Lands in the live collection
+            return fill_with([words(i) for i in range(3)])(shadow)
+        
+        with patch('src.vector_store.pdf_loader._load_pdf', return_value=batch):
+            report = store.rebuild(fill)
+        assert report["replayed_changes"] == 1
+        assert store._file_chunk_ids(upload) == ["week9_hash9_0"]
+        assert store.collection.count() == 4
+    
+    def test_index_pdfs_builds_a_new_generation(self, store, tmp_path):
+        folder = tmp_path / "pdfs"
+        folder.mkdir()
+        for name in ("os", "ml"):
+            (folder / f"{name}.pdf").write_bytes(name.encode())
+        pages = {"os": [words(1) + ". " + words(2)], "ml": [words(3)]}
+        
+        with patch('src.vector_store.pdf_loader.pdf_folder', folder), \
+                patch('src.vector_store.pdf_loader.extract_pages',
+                      side_effect=lambda path, file_hash=None: pages[Path(path).stem]):
+            assert store.index_pdfs()
+        stats = store.last_ingest_stats
+        assert stats["swap"]["ok"] and stats["swap"]["count"] == stats["chunks"] > 0
+        assert store.collection.name == "course_materials_g1"
+        assert set(store.get_indexed_files()) == {str(folder / "os.pdf"), str(folder / "ml.pdf")}
+    
+    def test_file_failing_after_first_batch_keeps_live_chunks(self, store, tmp_path):
+        folder = tmp_path / "pdfs"
+        folder.mkdir()
+        os_pdf = folder / "os.pdf"
+        os_pdf.write_bytes(b"v1")
+        (folder / "ml.pdf").write_bytes(b"ml")
+        pages = {"os": [words(1)], "ml": [words(3)]}
+        
+        with patch('src.vector_store.pdf_loader.pdf_folder', folder), \
+                patch('src.vector_store.pdf_loader.extract_pages',
+                      side_effect=lambda path, file_hash=None: pages[Path(path).stem]):
+            assert store.index_pdfs()
+            live_os_ids = store._file_chunk_ids(os_pdf)
+            
+            # The new version has several one-chunk batches; the second fails
+            os_pdf.write_bytes(b"v2")
+            pages["os"] = [". ".join(words(i) for i in range(10, 20))]
+            failing = set()
+            
+            def embed_texts(texts):
+                if any(text in pages["os"][0] for text in texts):
+                    failing.add(texts[0])
+                    if len(failing) == 2:
+                        raise RuntimeError("embedding backend went away")
+                return stub_embeddings(texts)
+            
+            store.embed_texts = embed_texts
+            with patch('src.ingest_pipeline.config.INGEST_BATCH_SIZE', 1), \
+                    patch('src.vector_store.config.DEDUP_ENABLED', False):
+                assert store.index_pdfs()
+        
+        stats = store.last_ingest_stats
+        assert stats["failed_files"] == ["os.pdf"] and stats["discarded_chunks"] >= 1
+        assert sorted(store._file_chunk_ids(os_pdf)) == sorted(live_os_ids)
+        assert stats["swap"]["count"] == store.collection.count()
+    
+    def test_file_deleted_while_listing_is_skipped(self, store, tmp_path):
+        folder = tmp_path / "pdfs"
+        folder.mkdir()
+        (folder / "ml.pdf").write_bytes(b"ml")
+        gone = folder / "gone.pdf"
+        listed = [gone, folder / "ml.pdf"]  # Deleted between glob and stat
+        
+        with patch('src.vector_store.pdf_loader.pdf_folder') as pdf_folder, \
+                patch('src.vector_store.pdf_loader.extract_pages', return_value=[words(3)]):
+            pdf_folder.glob.return_value = listed
+            assert store.index_pdfs()
+        assert store.last_ingest_stats["files"] == 1
@@ -0,0 +1,160 @@
+"""
+Tests for the sharded scatter-gather vector index
+"""
+import pytest
+from unittest.mock import patch
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from src.quantized_store import QuantizedIndex
+from src.sharded_store import ShardedIndex, ShardError, partition
+
+
+def corpus(size: int, dimension: int = 32, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [f"chunk_{i}" for i in range(size)], rng.normal(size=(size, dimension)).astype(np.float32)
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    """Three-shard index whose processes are stopped after the test"""
+    index = ShardedIndex(num_shards=3, index_root=str(tmp_path / "shards"))
+    yield index
+    index.stop()
+
+
+@pytest.mark.unit
+class TestPartition:
+    """Test that chunks are spread evenly over the shards"""
+    
+    def test_balanced_and_complete(self):
+        ids = [f"{course}_chunk_{i}" for course in ("os", "ml", "db") for i in range(7 if course == "os" else 3)]
+        shards = partition(ids, 4)
+        assert sorted(len(rows) for rows in shards) == [3, 3, 3, 4]
+        assert sorted(np.concatenate(shards).tolist()) == list(range(len(ids)))
+    
+    def test_more_shards_than_chunks(self):
+        assert [len(rows) for rows in partition(["a", "b"], 3)] == [1, 1, 0]
+
+
+@pytest.mark.unit
+class TestShardedIndex:
+    """Test scatter-gather search, re-partitioning and restarts"""
+    
+    def test_merged_results_match_a_single_index(self, sharded, tmp_path):
+        ids, vectors = corpus(600)
+        report = sharded.build(ids, vectors, "course_materials")
+        assert report["shard_sizes"] == [200, 200, 200] and report["imbalance"] == 1.0
+        
+        single = QuantizedIndex(str(tmp_path / "single"))
+        single.build(ids, vectors)
+        for query in vectors[:5] + 0.1:
+            merged = sharded.search(query, 8)
+            assert [chunk_id for chunk_id, _ in merged] == [chunk_id for chunk_id, _ in single.search(query, 8)]
+            assert [distance for _, distance in merged] == sorted(distance for _, distance in merged)
+        
+        stats = sharded.get_stats()
+        assert stats["queries"] == 5 and stats["running"] == 3 and len(stats["avg_shard_ms"]) == 3
+    
+    def test_rebuild_rebalances_and_drops_old_build(self, sharded):
+        ids, vectors = corpus(90)
+        sharded.build(ids, vectors, "course_materials")
+        first_build = sharded.index_root / sharded.current_build
+        
+        report = sharded.build(ids[:31], vectors[:31], "course_materials_g1")  # Files removed
+        assert report["shard_sizes"] == [11, 10, 10]
+        assert not first_build.exists()
+        assert {chunk_id for chunk_id, _ in sharded.search(vectors[40], 5)} <= set(ids[:31])
+    
+    def test_restart_loads_current_build(self, sharded):
+        ids, vectors = corpus(60)
+        sharded.build(ids, vectors, "course_materials")
+        
+        restarted = ShardedIndex(num_shards=3, index_root=str(sharded.index_root))
+        try:
+            assert restarted.ready
+            assert restarted.search(vectors[7], 1)[0][0] == "chunk_7"
+        finally:
+            restarted.stop()
+        
+        # A different shard count needs a re-index before it is used
+        assert not ShardedIndex(num_shards=2, index_root=str(sharded.index_root)).ready
+    
+    def test_single_file_change_touches_only_its_shards(self, sharded):
+        ids, vectors = corpus(90)
+        sharded.build(ids, vectors, "course_materials")
+        shard_files = [sharded._shard_dir(sharded.current_build, shard) / "current.json" for shard in range(3)]
+        before = [path.read_text() for path in shard_files]
+        
+        _, new_vectors = corpus(4, seed=1)
+        new_ids = [f"new_{i}" for i in range(4)]
+        # chunk_5 is already indexed and must not be added twice
+        assert sharded.update(new_ids + ["chunk_5"], np.vstack([new_vectors, vectors[5:6]]), [])
+        after = [path.read_text() for path in shard_files]
+        assert sharded.sizes == [34, 30, 30]
+        assert after[0] != before[0] and after[1:] == before[1:]
+        assert sharded.search(new_vectors[2], 1)[0][0] == "new_2"
+        
+        assert sharded.update([], [], ["chunk_7"])
+        assert sum(sharded.sizes) == 93
+        assert "chunk_7" not in {chunk_id for chunk_id, _ in sharded.search(vectors[7], 5)}
+        assert ShardedIndex(num_shards=3, index_root=str(sharded.index_root)).sizes == sharded.sizes
+    
+    def test_dead_shard_is_restarted(self, sharded):
+        ids, vectors = corpus(60)
+        sharded.build(ids, vectors, "course_materials")
+        sharded._processes[1].kill()
+        sharded._processes[1].join()
+        
+        assert sharded.search(vectors[7], 1)[0][0] == "chunk_7"
+        stats = sharded.get_stats()
+        assert stats["restarts"] == 1 and stats["running"] == 3
+    
+    def test_failed_scatter_releases_every_lock(self, sharded):
+        ids, vectors = corpus(60)
+        sharded.build(ids, vectors, "course_materials")
+        
+        class BrokenPipe:
+            def send(self, request):
+                raise BrokenPipeError("shard gone")
+            
+            def close(self):
+                pass
+        
+        sharded._conns[1] = BrokenPipe()
+        with pytest.raises(ShardError):
+            sharded.search(vectors[7], 1)
+        assert not any(lock.locked() for lock in sharded._locks)
+        # The shard was replaced, and shards 0 and 2 were not left with unread replies
+        assert sharded.search(vectors[7], 1)[0][0] == "chunk_7"
+    
+    def test_vector_store_uses_shards(self, sharded):
+        from src.records import Hit
+        from src.vector_store import VectorStore
+        ids, vectors = corpus(30)
+        sharded.build(ids, vectors, "course_materials")
+        store = VectorStore.__new__(VectorStore)
+        store.sharded_index = sharded
+        
+        def stored(ids, include):
+            return {"ids": ids, "documents": [f"text of {i}" for i in ids],
+                    "metadatas": [{"source": "lecture"} for _ in ids]}
+        
+        with patch.object(store, "collection", create=True) as collection:
+            collection.get.side_effect = stored
+            hits = store._query_sharded(vectors[3], 2)
+        assert isinstance(hits[0], Hit) and hits[0].content == "text of chunk_3"
+        assert len(hits) == 2
+    
+    def test_vector_store_falls_back_to_chroma(self, sharded):
+        from src.vector_store import VectorStore
+        store = VectorStore.__new__(VectorStore)
+        store.sharded_index = sharded
+        
+        with patch.object(sharded, "search", side_effect=ShardError("shard 0 stopped")), \
+                patch.object(store, "_query_chroma", return_value=["chroma hit"]) as query_chroma:
+            assert store._query_sharded([0.1] * 32, 2) == ["chroma hit"]
+        query_chroma.assert_called_once()
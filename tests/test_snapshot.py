@@ -0,0 +1,192 @@
+"""
+Tests for portable index snapshots
+"""
+import pytest
+import hashlib
+import json
+import threading
+import time
+from unittest.mock import patch
+from pathlib import Path
+import sys
+import uuid
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import chromadb
+import numpy as np
+from tools.common import stub_embeddings
+import src.snapshot
+from src.snapshot import (SNAPSHOT_MAGIC, SNAPSHOT_VERSION, SnapshotError, _FRAME, _U32,
+                          export_snapshot, export_store_snapshot, import_snapshot, verify_snapshot)
+
+MODEL_ID = "test-model"
+
+
+def make_collection(client, rows: int = 0, dimension: int = 8):
+    """Create a collection filled with random vectors"""
+    collection = client.create_collection(
+        name=f"snap_{uuid.uuid4().hex[:8]}",
+        metadata={"hnsw:space": "cosine"}
+    )
+    if rows:
+        rng = np.random.default_rng(0)
+        collection.add(
+            ids=[f"doc_{i}" for i in range(rows)],
+            embeddings=rng.normal(size=(rows, dimension)).tolist(),
+            documents=[f"Chunk number {i}" for i in range(rows)],
+            metadatas=[{"source": f"lecture{i % 3}", "chunk_index": i} for i in range(rows)]
+        )
+    return collection
+
+
+class FakeStore:
+    """Minimal stand-in for VectorStore"""
+    
+    def __init__(self, client):
+        self.client = client
+        self.embedding_model_id = MODEL_ID
+        self.collection = make_collection(client)
+    
+    def rebuild(self, fill, metadata=None, min_count_ratio=None):
+        shadow = make_collection(self.client)
+        count = fill(shadow)
+        self.collection = shadow
+        return {"ok": True, "count": count, "problems": []}
+
+
+@pytest.fixture
+def client():
+    return chromadb.EphemeralClient()
+
+
+@pytest.fixture
+def live_store(tmp_path):
+    """VectorStore on a temporary database holding two indexed files"""
+    from src.vector_store import VectorStore
+    with patch('src.vector_store.config.CHROMA_DB_PATH', str(tmp_path / "chroma")), \
+            patch('src.vector_store.config.VECTOR_BACKEND', "chroma"), \
+            patch('src.vector_store.config.EMBED_BATCHING', False):
+        store = VectorStore()
+        texts = [f"Chunk number {i}" for i in range(30)]
+        store.collection.add(
+            ids=[f"doc_{i}" for i in range(30)],
+            embeddings=stub_embeddings(texts),
+            documents=texts,
+            metadatas=[{"source": f"lecture{i % 2}", "file_path": f"lecture{i % 2}.pdf"} for i in range(30)]
+        )
+        yield store
+
+
+@pytest.mark.unit
+class TestSnapshot:
+    """Test snapshot export, verification and import"""
+    
+    def test_round_trip(self, client, tmp_path):
+        """Exported rows are imported with identical vectors and text"""
+        source = make_collection(client, rows=25)
+        path = tmp_path / "corpus.edusnap"
+        info = export_snapshot(source, str(path), MODEL_ID, batch_size=10)
+        assert info["count"] == 25
+        assert info["dimension"] == 8
+        
+        store = FakeStore(client)
+        result = import_snapshot(store, str(path))
+        assert result["imported"] == 25
+        
+        original = source.get(ids=["doc_7"], include=["embeddings", "documents", "metadatas"])
+        copied = store.collection.get(ids=["doc_7"], include=["embeddings", "documents", "metadatas"])
+        assert copied["documents"] == original["documents"]
+        # Marked with the snapshot they came from, so the folder watcher keeps them
+        assert copied["metadatas"] == [{**original["metadatas"][0], "snapshot": info["created_at"]}]
+        assert np.allclose(copied["embeddings"], original["embeddings"])
+    
+    def test_corruption_detected(self, client, tmp_path):
+        """Flipping a byte inside a frame fails verification"""
+        path = tmp_path / "corpus.edusnap"
+        export_snapshot(make_collection(client, rows=5), str(path), MODEL_ID)
+        data = bytearray(path.read_bytes())
+        data[-60] ^= 0xFF
+        path.write_bytes(bytes(data))
+        
+        with pytest.raises(SnapshotError):
+            verify_snapshot(str(path))
+    
+    def test_truncation_detected(self, client, tmp_path):
+        """A partially transferred snapshot is rejected"""
+        path = tmp_path / "corpus.edusnap"
+        export_snapshot(make_collection(client, rows=5), str(path), MODEL_ID)
+        path.write_bytes(path.read_bytes()[:-10])
+        
+        with pytest.raises(SnapshotError):
+            verify_snapshot(str(path))
+    
+    def test_malformed_contents_rejected(self, tmp_path):
+        """Bad headers and frames with valid checksums raise SnapshotError, not raw errors"""
+        prefix = SNAPSHOT_MAGIC + bytes([SNAPSHOT_VERSION])
+        header = json.dumps({"dimension": 8, "count": 1}).encode()
+        records, vectors = b"not zlib", b"\0" * 12  # 3 floats cannot reshape to (1, 8)
+        frame = _FRAME.pack(b"B", 1, len(records), len(vectors), hashlib.sha256(records + vectors).digest())
+        cases = {
+            "bad_json": prefix + _U32.pack(5) + b"{oops",
+            "missing_key": prefix + _U32.pack(2) + b"{}",
+            "bad_frame": prefix + _U32.pack(len(header)) + header + frame + records + vectors
+        }
+        for name, data in cases.items():
+            path = tmp_path / f"{name}.edusnap"
+            path.write_bytes(data)
+            with pytest.raises(SnapshotError):
+                verify_snapshot(str(path))
+    
+    def test_model_mismatch_keeps_index(self, client, tmp_path):
+        """Snapshots from another embedding model are refused"""
+        path = tmp_path / "corpus.edusnap"
+        export_snapshot(make_collection(client, rows=5), str(path), "other-model")
+        store = FakeStore(client)
+        original = store.collection
+        
+        with pytest.raises(SnapshotError):
+            import_snapshot(store, str(path))
+        assert store.collection is original
+    
+    def test_writes_wait_for_export(self, live_store, tmp_path):
+        """A file removed while an export runs lands after it, never inside it"""
+        real_pieces = src.snapshot.iter_snapshot_bytes
+        exporting = threading.Event()
+        written = []
+        
+        def slow_pieces(*args, **kwargs):
+            for piece in real_pieces(*args, **kwargs):
+                exporting.set()
+                time.sleep(0.01)
+                yield piece
+            written.append(time.monotonic())
+        
+        removed = []
+        
+        def remove():
+            exporting.wait(5)
+            live_store.remove_file(Path("lecture1.pdf"))
+            removed.append(time.monotonic())
+        
+        writer = threading.Thread(target=remove)
+        writer.start()
+        with patch('src.snapshot.iter_snapshot_bytes', slow_pieces):
+            info = export_store_snapshot(live_store, str(tmp_path / "corpus.edusnap"), batch_size=5)
+        writer.join()
+        
+        assert info["count"] == 30 and verify_snapshot(str(tmp_path / "corpus.edusnap"))["count"] == 30
+        assert removed[0] > written[0]
+        assert live_store.collection.count() == 15
+    
+    def test_import_uses_local_hnsw_settings(self, client, live_store, tmp_path):
+        """The exporting node's HNSW parameters are recorded but not applied"""
+        source = client.create_collection(name="tuned", metadata={"hnsw:space": "cosine", "hnsw:M": 48})
+        source.add(ids=["doc_0", "doc_1"], embeddings=stub_embeddings(["one", "two"]), documents=["one", "two"])
+        path = tmp_path / "corpus.edusnap"
+        export_snapshot(source, str(path), live_store.embedding_model_id)
+        
+        info = import_snapshot(live_store, str(path))
+        assert info["collection_metadata"]["hnsw:M"] == 48
+        assert live_store.collection.metadata == live_store.collection_metadata
+        assert live_store.collection.count() == 2
@@ -13,6 +13,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.config import config
 from src.pdf_loader import PDFLoader
+from src.extraction import PDFExtractor
+from src.records import ChunkBatch
 from src.vector_store import VectorStore
 
 # ============================================================================
@@ -69,9 +71,10 @@ class TestPDFLoader:
         assert self.loader.chunk_size == 1000
         assert self.loader.chunk_overlap == 200
     
-    @patch('src.pdf_loader.PdfReader')
+    @patch('src.pdf_loader.pdf_extractor', PDFExtractor(isolate=False))
+    @patch('src.extraction.PdfReader')
     def test_load_pdf_returns_list(self, mock_reader):
-        """_load_pdf returns list of documents"""
+        """_load_pdf returns a batch of chunks"""
         # Mock PDF reader
         mock_page = Mock()
         mock_page.extract_text.return_value = "Sample text content"
@@ -81,13 +84,13 @@ class TestPDFLoader:
         test_path = Path("test.pdf")
         result = self.loader._load_pdf(test_path)
         
-        assert isinstance(result, list)
+        assert isinstance(result, ChunkBatch)
         assert len(result) > 0
     
     def test_load_all_pdfs_returns_list(self):
-        """load_all_pdfs returns list"""
+        """load_all_pdfs returns a batch of chunks"""
         result = self.loader.load_all_pdfs()
-        assert isinstance(result, list)
+        assert isinstance(result, ChunkBatch)
 
 # ===================
 # VECTOR STORE TESTS
@@ -0,0 +1,172 @@
+"""
+Tests for the PDF folder watcher
+"""
+import pytest
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.watcher import PDFWatcher
+
+
+class FakeStore:
+    """Records the calls the watcher makes"""
+    
+    def __init__(self, indexed=None, imported=()):
+        self.indexed = indexed or {}
+        self.imported = set(imported)
+        self.calls = []
+    
+    def get_indexed_files(self, imported=True):
+        return {path: file_hash for path, file_hash in self.indexed.items()
+                if imported or path not in self.imported}
+    
+    def index_file(self, path):
+        self.calls.append(("index", path.name))
+        return 3
+    
+    def remove_file(self, path):
+        self.calls.append(("remove", path.name))
+        return 3
+
+
+@pytest.mark.unit
+class TestPDFWatcher:
+    """Test change detection and debouncing"""
+    
+    def test_new_file_waits_for_debounce(self, tmp_path):
+        """A file is only ingested once it has been stable for the debounce period"""
+        store = FakeStore()
+        watcher = PDFWatcher(store, folder=str(tmp_path), poll_interval=0, debounce_seconds=2)
+        (tmp_path / "week1.pdf").write_bytes(b"%PDF partial")
+        
+        assert watcher.scan_once(now=0) == 0
+        (tmp_path / "week1.pdf").write_bytes(b"%PDF partial, still copying")
+        assert watcher.scan_once(now=1.5) == 0  # Changed: timer restarts
+        assert watcher.scan_once(now=3.0) == 0
+        assert watcher.scan_once(now=3.6) == 1
+        assert store.calls == [("index", "week1.pdf")]
+        assert watcher.scan_once(now=10) == 0  # Unchanged files are not re-ingested
+    
+    def test_modified_and_deleted(self, tmp_path):
+        """Modified files are re-ingested and deleted files removed"""
+        store = FakeStore()
+        watcher = PDFWatcher(store, folder=str(tmp_path), poll_interval=0, debounce_seconds=0)
+        pdf = tmp_path / "week2.pdf"
+        pdf.write_bytes(b"v1")
+        watcher.scan_once(now=0)
+        watcher.scan_once(now=0)
+        
+        pdf.write_bytes(b"version 2")
+        watcher.scan_once(now=1)
+        watcher.scan_once(now=1)
+        pdf.unlink()
+        watcher.scan_once(now=2)
+        
+        assert store.calls == [("index", "week2.pdf"), ("index", "week2.pdf"), ("remove", "week2.pdf")]
+        assert watcher.counts == {"added": 1, "modified": 1, "deleted": 1, "failed": 0}
+    
+    def test_sync_skips_unchanged_files(self, tmp_path):
+        """Files already indexed with the same hash are not re-ingested on start"""
+        from src.page_cache import file_sha256
+        pdf = tmp_path / "syllabus.pdf"
+        pdf.write_bytes(b"same content")
+        store = FakeStore(indexed={
+            str(pdf): file_sha256(pdf),
+            str(tmp_path / "gone.pdf"): "abc"
+        })
+        watcher = PDFWatcher(store, folder=str(tmp_path), poll_interval=0, debounce_seconds=0)
+        
+        watcher.sync()
+        watcher.scan_once(now=0)
+        watcher.scan_once(now=0)
+        assert store.calls == [("remove", "gone.pdf")]
+    
+    def test_sync_keeps_files_it_did_not_index(self, tmp_path):
+        """Imported snapshot chunks and other folders' files survive the initial sync"""
+        store = FakeStore(indexed={
+            str(tmp_path / "imported.pdf"): "abc",
+            "/srv/other-node/pdfs/lecture1.pdf": "def",
+            str(tmp_path / "gone.pdf"): "ghi"
+        }, imported=[str(tmp_path / "imported.pdf")])
+        watcher = PDFWatcher(store, folder=str(tmp_path), poll_interval=0, debounce_seconds=0)
+        
+        watcher.sync()
+        watcher.scan_once(now=0)
+        assert store.calls == [("remove", "gone.pdf")]
+    
+    def test_failed_ingest_not_retried_until_changed(self, tmp_path):
+        """A broken file is retried only after it changes"""
+        store = FakeStore()
+        store.index_file = lambda path: (_ for _ in ()).throw(ValueError("bad pdf"))
+        watcher = PDFWatcher(store, folder=str(tmp_path), poll_interval=0, debounce_seconds=0)
+        (tmp_path / "broken.pdf").write_bytes(b"junk")
+        
+        watcher.scan_once(now=0)
+        watcher.scan_once(now=0)
+        watcher.scan_once(now=1)
+        assert watcher.counts["failed"] == 1
+    
+    def test_file_held_during_scan_is_skipped(self, tmp_path):
+        """A file an API thread takes over mid-scan is not indexed by the watcher"""
+        import threading
+        store = FakeStore()
+        watcher = PDFWatcher(store, folder=str(tmp_path), poll_interval=0, debounce_seconds=0)
+        for name in ("a.pdf", "b.pdf"):
+            (tmp_path / name).write_bytes(name.encode())
+        watcher.scan_once(now=0)
+        
+        entered, done = threading.Event(), threading.Event()
+        
+        def upload(path):
+            with watcher.hold(path):
+                entered.set()
+                done.wait(5)
+        
+        def index_file(path):
+            other = tmp_path / ("b.pdf" if path.name == "a.pdf" else "a.pdf")
+            if not entered.is_set():
+                threading.Thread(target=upload, args=(other,), daemon=True).start()
+                entered.wait(5)
+            store.calls.append(("index", path.name))
+            return 3
+        
+        store.index_file = index_file
+        assert watcher.scan_once(now=1) == 1
+        done.set()
+        assert len(store.calls) == 1
+    
+    def test_hold_waits_for_running_ingest(self, tmp_path):
+        """An upload of a file the watcher is indexing starts after the watcher is done"""
+        import threading
+        store = FakeStore()
+        watcher = PDFWatcher(store, folder=str(tmp_path), poll_interval=0, debounce_seconds=0)
+        pdf = tmp_path / "week3.pdf"
+        pdf.write_bytes(b"v1")
+        watcher.scan_once(now=0)
+        
+        indexing, release, order = threading.Event(), threading.Event(), []
+        
+        def index_file(path):
+            indexing.set()
+            release.wait(5)
+            order.append("watcher")
+            return 3
+        
+        def upload():
+            with watcher.hold(pdf):
+                order.append("upload")
+        
+        store.index_file = index_file
+        scan = threading.Thread(target=watcher.scan_once, kwargs={"now": 1})
+        scan.start()
+        indexing.wait(5)
+        writer = threading.Thread(target=upload)
+        writer.start()
+        writer.join(0.2)
+        assert order == []
+        release.set()
+        scan.join(5)
+        writer.join(5)
+        assert order == ["watcher", "upload"]
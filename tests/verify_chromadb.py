@@ -62,9 +62,9 @@ if results:
     print(f" Search works! Found {len(results)} results for '{test_query}'")
     for idx, result in enumerate(results, 1):
         print(f"\n   Result {idx}:")
-        print(f"      Source: {result['metadata']['source']}")
-        print(f"      Distance: {result['distance']:.4f}")
-        print(f"      Content: {result['content'][:100]}...")
+        print(f"      Source: {result.source}")
+        print(f"      Distance: {result.distance:.4f}")
+        print(f"      Content: {result.content[:100]}...")
 else:
     print(f" Search returned no results!")
 
@@ -0,0 +1,3 @@
+"""
+Developer tools for benchmarking and operating EduMate RAG
+"""
@@ -0,0 +1,41 @@
+"""
+Shared helpers for the offline tools (and the tests that reuse them)
+
+Importing this module lets src be imported without a Groq key: src.config
+refuses to load without GROQ_API_KEY, and none of the tools call the LLM.
+A key from the environment or .env still takes precedence.
+"""
+import math
+import os
+import sys
+import zlib
+from pathlib import Path
+from typing import List
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+load_dotenv()
+os.environ.setdefault("GROQ_API_KEY", "offline-tools")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def stub_embeddings(texts: List[str], dimension: int = 384) -> List[List[float]]:
+    """Hashed bag-of-words vectors, for runs without the ONNX model"""
+    vectors = []
+    for text in texts:
+        vector = [0.0] * dimension
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode("utf-8")) % dimension] += 1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        vectors.append([v / norm for v in vector])
+    return vectors
@@ -0,0 +1,235 @@
+"""
+HNSW Benchmark - Recall, latency, build time and memory for a grid of HNSW settings
+
+Copies the vectors of the live index into a throwaway Chroma collection for
+every (M, construction_ef, search_ef) combination and queries it with
+stored chunk vectors and the golden set questions. Recall@k is measured
+against exact (brute-force cosine) search over the same vectors, so
+HNSW_M / HNSW_CONSTRUCTION_EF / HNSW_SEARCH_EF can be chosen on evidence.
+
+Usage:
+    python -m tools.hnsw_bench
+    python -m tools.hnsw_bench --m 8,16,32,48 --construction-ef 100,200 --search-ef 10,50,100 --k 10
+    python -m tools.hnsw_bench --queries 500 --no-golden --json hnsw.json
+"""
+import argparse
+import itertools
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.common import percentile
+from tools.param_sweep import DEFAULT_GOLDEN_SET, load_golden_set
+
+
+class _PrecomputedEmbeddings:
+    """Embedding function for collections that only ever receive vectors"""
+    
+    def __call__(self, input):
+        raise RuntimeError("hnsw_bench collections take precomputed embeddings only")
+
+
+def estimate_hnsw_bytes(count: int, dimension: int, m: int) -> int:
+    """
+    Memory of an hnswlib index, from its storage layout
+    
+    Every element holds its float32 vector, a label and 2·M level-0 links;
+    a 1/(M-1) share of elements has, on average, one upper level of M links.
+    """
+    level0 = count * (dimension * 4 + 8 + 2 * m * 4 + 4)
+    upper = count / max(m - 1, 1) * (m * 4 + 4)
+    return int(level0 + upper)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Row numbers of the k nearest vectors to each query by cosine distance"""
+    normed = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_normed = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    scores = query_normed @ normed.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def evaluate_setting(ids: List[str], vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+                     m: int, construction_ef: int, search_ef: int, k: int,
+                     batch_size: int = 1000) -> dict:
+    """
+    Build one HNSW collection and measure it
+    
+    Args:
+        ids: Chunk IDs
+        vectors: (n, dimension) stored vectors
+        queries: (q, dimension) query vectors
+        truth: Exact top-k row numbers of each query
+        m: HNSW M (links per node)
+        construction_ef: Candidate list size while building
+        search_ef: Candidate list size while searching
+        k: Results per query
+        batch_size: Vectors added per call
+    
+    Returns:
+        recall@k, query latency, build time and estimated memory
+    """
+    import chromadb
+    from chromadb.config import Settings
+    
+    path = Path(tempfile.mkdtemp(prefix="edumate_hnsw_"))
+    try:
+        client = chromadb.PersistentClient(path=str(path), settings=Settings(anonymized_telemetry=False))
+        collection = client.create_collection(
+            "hnsw_bench",
+            metadata={"hnsw:space": "cosine", "hnsw:M": m, "hnsw:construction_ef": construction_ef,
+                      "hnsw:search_ef": search_ef},
+            embedding_function=_PrecomputedEmbeddings()
+        )
+        
+        start = time.perf_counter()
+        for offset in range(0, len(ids), batch_size):
+            collection.add(ids=ids[offset:offset + batch_size],
+                           embeddings=vectors[offset:offset + batch_size].tolist())
+        build_s = time.perf_counter() - start
+        
+        row_of = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        found, latencies = 0, []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+            latencies.append((time.perf_counter() - start) * 1000)
+            found += len({row_of[chunk_id] for chunk_id in result["ids"][0]} & set(expected.tolist()))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    
+    return {
+        "M": m,
+        "construction_ef": construction_ef,
+        "search_ef": search_ef,
+        "recall": round(found / (len(queries) * k), 4) if len(queries) else 0.0,
+        "query_p50_ms": round(percentile(latencies, 50), 2),
+        "query_p95_ms": round(percentile(latencies, 95), 2),
+        "build_s": round(build_s, 2),
+        "memory_mb": round(estimate_hnsw_bytes(len(ids), vectors.shape[1], m) / 1024 / 1024, 2)
+    }
+
+
+def run_benchmark(ids: List[str], vectors, queries, ms: List[int], construction_efs: List[int],
+                  search_efs: List[int], k: int) -> List[dict]:
+    """
+    Evaluate every combination of HNSW settings
+    
+    Args:
+        ids: Chunk IDs
+        vectors: Stored vectors
+        queries: Query vectors
+        ms: Values of M to try
+        construction_efs: Values of construction_ef to try
+        search_efs: Values of search_ef to try
+        k: Results per query
+    
+    Returns:
+        One row per (M, construction_ef, search_ef)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    k = min(k, len(ids))
+    truth = exact_neighbours(vectors, queries, k)
+    
+    rows = []
+    for m, construction_ef, search_ef in itertools.product(ms, construction_efs, search_efs):
+        print(f" Building HNSW: M={m} construction_ef={construction_ef} search_ef={search_ef}")
+        rows.append(evaluate_setting(ids, vectors, queries, truth, m, construction_ef, search_ef, k))
+    return rows
+
+
+def sample_queries(vectors: np.ndarray, count: int) -> np.ndarray:
+    """Stored vectors spread evenly over the collection, used as queries"""
+    if count <= 0 or not len(vectors):
+        return np.empty((0, vectors.shape[1] if vectors.ndim == 2 else 0), dtype=np.float32)
+    rows = np.linspace(0, len(vectors) - 1, min(count, len(vectors))).astype(int)
+    return vectors[rows]
+
+
+COLUMNS = [
+    ("M", "M"), ("construction_ef", "construction_ef"), ("search_ef", "search_ef"),
+    ("recall", "recall@k"), ("query_p50_ms", "p50 ms"), ("query_p95_ms", "p95 ms"),
+    ("build_s", "build s"), ("memory_mb", "memory MB")
+]
+
+
+def format_table(rows: List[dict], current: tuple = None) -> str:
+    """
+    Render rows as a Markdown table, best recall then fastest first
+    
+    Args:
+        rows: Rows from run_benchmark
+        current: (M, construction_ef, search_ef) to mark as the live setting
+    
+    Returns:
+        Table text
+    """
+    ordered = sorted(rows, key=lambda row: (-row["recall"], row["query_p50_ms"], row["memory_mb"]))
+    lines = [
+        "| " + " | ".join(title for _, title in COLUMNS) + " |",
+        "|" + "|".join("---" for _ in COLUMNS) + "|"
+    ]
+    for row in ordered:
+        cells = [str(row[key]) for key, _ in COLUMNS]
+        if current and (row["M"], row["construction_ef"], row["search_ef"]) == current:
+            cells[0] += " *"
+        lines.append("| " + " | ".join(cells) + " |")
+    if current:
+        lines.append("\n* live index setting")
+    return "\n".join(lines)
+
+
+def parse_ints(value: str) -> List[int]:
+    """Parse "8,16,32" into [8, 16, 32]"""
+    return [int(item) for item in value.split(",")]
+
+
+def main(argv: list = None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark HNSW settings on the indexed chunks")
+    parser.add_argument("--m", default="8,16,32", help="Comma-separated values of M")
+    parser.add_argument("--construction-ef", default="100,200", help="Comma-separated construction_ef values")
+    parser.add_argument("--search-ef", default="10,50,100", help="Comma-separated search_ef values")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (recall@k)")
+    parser.add_argument("--queries", type=int, default=200, help="Stored chunk vectors used as queries")
+    parser.add_argument("--golden", default=str(DEFAULT_GOLDEN_SET), help="Golden set questions added as queries")
+    parser.add_argument("--no-golden", action="store_true", help="Query with stored vectors only")
+    parser.add_argument("--json", metavar="PATH", help="Write all rows as JSON")
+    args = parser.parse_args(argv)
+    
+    from src.vector_store import HNSW_DEFAULTS, vector_store
+    ids, embeddings = vector_store._collection_vectors(vector_store.collection, 1000)
+    if not ids:
+        print(" The index is empty; run POST /api/index first")
+        return
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    
+    queries = sample_queries(vectors, args.queries)
+    if not args.no_golden:
+        questions = [entry["question"] for entry in load_golden_set(Path(args.golden))]
+        if questions:
+            queries = np.vstack([queries, np.asarray(vector_store.embed_texts(questions), dtype=np.float32)])
+    print(f" {len(ids)} vectors, {len(queries)} queries")
+    
+    rows = run_benchmark(ids, vectors, queries, parse_ints(args.m), parse_ints(args.construction_ef),
+                         parse_ints(args.search_ef), args.k)
+    live = vector_store.collection.metadata or {}
+    current = tuple(live.get(f"hnsw:{key}", default) for key, default in HNSW_DEFAULTS.items())
+    print()
+    print(format_table(rows, current=current))
+    
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Load Test - Find how many concurrent students the API can serve
+
+Simulates concurrent multi-turn study sessions against /api/query and the
+conversation endpoints, ramping the number of concurrent sessions stage by
+stage. The Groq LLM is replaced by a local stub with configurable latency,
+so runs are offline and repeatable.
+
+Usage:
+    python -m tools.load_test                          # In-process app
+    python -m tools.load_test --levels 1,4,16,64 --duration 20
+    python -m tools.load_test serve --port 8001        # Stubbed local server
+    python -m tools.load_test --url http://localhost:8001
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.common import percentile, stub_embeddings
+
+# Opening questions weighted towards what students ask most
+QUESTION_MIX = [
+    (5, "What is an operating system?"),
+    (4, "Explain the difference between a process and a thread."),
+    (4, "What causes a deadlock and how can it be prevented?"),
+    (3, "What is supervised learning?"),
+    (3, "How does gradient descent work?"),
+    (3, "What is overfitting in machine learning?"),
+    (2, "What are the main principles of professional ethics?"),
+    (2, "What is a code of ethics for computing professionals?"),
+    (2, "What is virtual memory?"),
+    (1, "How do I write a formal email in English?"),
+    (1, "ما هو نظام التشغيل؟"),
+]
+
+FOLLOW_UPS = [
+    "Tell me more",
+    "Why is that important?",
+    "Can you give an example?",
+    "Explain further",
+    "How is it different from what you said before?",
+]
+
+
+class StubChain:
+    """Drop-in replacement for the LLM chain that sleeps instead of calling Groq"""
+    
+    def __init__(self, latency_ms: float = 800, jitter_ms: float = 200,
+                 slow_rate: float = 0.0, slow_ms: float = 10000):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.slow_rate = slow_rate  # Fraction of calls that stall, like a provider slowdown
+        self.slow_ms = slow_ms
+    
+    def run(self, context: str = "", question: str = "", chat_history: str = "", **kwargs) -> str:
+        if random.random() < self.slow_rate:
+            time.sleep(self.slow_ms / 1000)
+        time.sleep(max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+        return f"Stub answer to: {question} (context {len(context)} chars)"
+
+
+_UNSET = object()
+
+
+@contextmanager
+def stubbed_app(llm_latency_ms: float, stub_embedding_model: bool,
+                llm_slow_rate: float = 0.0, llm_slow_ms: float = 10000):
+    """
+    The FastAPI app with the LLM (and optionally embeddings) stubbed
+    
+    The stubs are set on the global rag_chain and vector_store and the
+    originals are restored on exit, so importing this tool (or running it
+    inside a test session) leaves the real objects untouched.
+    """
+    from src.api.main import app
+    from src.rag_chain import rag_chain
+    from src.vector_store import vector_store
+    
+    stubs = [
+        (rag_chain, "chain", StubChain(llm_latency_ms, slow_rate=llm_slow_rate, slow_ms=llm_slow_ms)),
+        # Synthetic sessions repeat the same opening questions: keep them out of
+        # the query log, and make every turn reach the (stub) LLM
+        (rag_chain.query_log, "enabled", False),
+        (rag_chain.answer_cache, "max_entries", 0)
+    ]
+    if stub_embedding_model:
+        stubs.append((vector_store, "embed_texts", stub_embeddings))
+    
+    originals = [(target, name, target.__dict__.get(name, _UNSET)) for target, name, _ in stubs]
+    for target, name, value in stubs:
+        setattr(target, name, value)
+    try:
+        yield app
+    finally:
+        for target, name, value in originals:
+            if value is _UNSET:
+                delattr(target, name)
+            else:
+                setattr(target, name, value)
+
+
+class LoadTester:
+    """Closed-loop load generator with stepped concurrency"""
+    
+    def __init__(self, client: httpx.AsyncClient, think_time: float = 0.0, seed: int = 0):
+        """
+        Initialize load tester
+        
+        Args:
+            client: HTTP client bound to the app or server under test
+            think_time: Mean pause between a session's requests (seconds)
+            seed: Random seed for the question mix
+        """
+        self.client = client
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.questions = [q for weight, q in QUESTION_MIX for _ in range(weight)]
+    
+    async def _request(self, samples: list, endpoint: str, method: str, path: str,
+                       **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        response = None
+        degraded = False
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            ok = response.status_code < 400
+            error = None if ok else f"HTTP {response.status_code}"
+            if ok and endpoint == "query":
+                degraded = bool(response.json().get("degraded"))
+        except httpx.HTTPError as e:
+            ok, error = False, type(e).__name__
+        samples.append({
+            "endpoint": endpoint,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "ok": ok,
+            "error": error,
+            "degraded": degraded
+        })
+        return response
+    
+    async def _session(self, samples: list, session_id: str):
+        """One student: an opening question, a few follow-ups, some history polls"""
+        turns = [self.rng.choice(self.questions)]
+        turns += self.rng.sample(FOLLOW_UPS, self.rng.randint(0, 3))
+        cursor = None
+        for question in turns:
+            await self._request(samples, "query", "POST", "/api/query",
+                                json={"question": question, "session_id": session_id})
+            if self.rng.random() < 0.3:
+                params = {"session_id": session_id}
+                if cursor is not None:
+                    params["after"] = cursor
+                response = await self._request(samples, "history", "GET",
+                                               "/api/conversation/history", params=params)
+                if response is not None and response.status_code == 200:
+                    cursor = response.json().get("next_cursor", cursor)
+            if self.think_time:
+                await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+        if self.rng.random() < 0.2:
+            await self._request(samples, "info", "GET", "/api/conversation/info",
+                                params={"session_id": session_id})
+        if self.rng.random() < 0.5:
+            await self._request(samples, "clear", "POST", "/api/conversation/clear",
+                                params={"session_id": session_id})
+    
+    async def _user(self, samples: list, deadline: float, user_id: int):
+        session = 0
+        while time.perf_counter() < deadline:
+            await self._session(samples, f"loadtest-{user_id}-{session}")
+            session += 1
+    
+    async def run_stage(self, concurrency: int, duration: float) -> dict:
+        """
+        Run a fixed number of concurrent sessions for a fixed time
+        
+        Args:
+            concurrency: Number of simultaneous sessions
+            duration: Stage length in seconds
+        
+        Returns:
+            Stage summary
+        """
+        samples = []
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*[self._user(samples, deadline, i) for i in range(concurrency)])
+        return summarize(samples, time.perf_counter() - start, concurrency)
+    
+    async def ramp(self, levels: List[int], duration: float) -> List[dict]:
+        """Run one stage per concurrency level"""
+        stages = []
+        for concurrency in levels:
+            stage = await self.run_stage(concurrency, duration)
+            stages.append(stage)
+            print(format_row(stage), flush=True)
+        return stages
+
+
+def summarize(samples: List[dict], elapsed: float, concurrency: int) -> dict:
+    """Aggregate raw request samples into throughput, latency and errors"""
+    latencies = [s["latency_ms"] for s in samples]
+    errors = [s for s in samples if not s["ok"]]
+    by_endpoint = {}
+    for name in sorted({s["endpoint"] for s in samples}):
+        endpoint_latencies = [s["latency_ms"] for s in samples if s["endpoint"] == name]
+        by_endpoint[name] = {
+            "requests": len(endpoint_latencies),
+            "p50_ms": round(percentile(endpoint_latencies, 50), 1),
+            "p95_ms": round(percentile(endpoint_latencies, 95), 1)
+        }
+    queries = [s for s in samples if s["endpoint"] == "query"]
+    degraded = sum(1 for s in queries if s.get("degraded"))
+    error_kinds: Dict[str, int] = {}
+    for s in errors:
+        error_kinds[s["error"]] = error_kinds.get(s["error"], 0) + 1
+    
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "error_rate": round(len(errors) / len(samples), 4) if samples else 0.0,
+        "errors": error_kinds,
+        "degraded_rate": round(degraded / len(queries), 4) if queries else 0.0,
+        "endpoints": by_endpoint
+    }
+
+
+def find_saturation(stages: List[dict], slo_p95_ms: float, min_gain: float = 0.1,
+                    max_error_rate: float = 0.01) -> Optional[dict]:
+    """
+    Find the first concurrency level at which the service stops scaling
+    
+    A stage is saturated when throughput grows by less than min_gain over
+    the previous stage, p95 latency breaks the SLO, or errors exceed
+    max_error_rate.
+    
+    Returns:
+        The saturated stage with the reason, or None if it never saturated
+    """
+    for idx, stage in enumerate(stages):
+        reason = None
+        if stage["error_rate"] > max_error_rate:
+            reason = f"error rate {stage['error_rate']:.1%}"
+        elif stage["p95_ms"] > slo_p95_ms:
+            reason = f"p95 {stage['p95_ms']:.0f} ms > SLO {slo_p95_ms:.0f} ms"
+        elif idx > 0 and stages[idx - 1]["throughput_rps"] > 0:
+            gain = stage["throughput_rps"] / stages[idx - 1]["throughput_rps"] - 1
+            if gain < min_gain:
+                reason = f"throughput gain {gain:.0%} < {min_gain:.0%}"
+        if reason:
+            return {"concurrency": stage["concurrency"], "reason": reason,
+                    "max_sustained_rps": max(s["throughput_rps"] for s in stages[:idx + 1])}
+    return None
+
+
+def format_row(stage: dict) -> str:
+    return (f"{stage['concurrency']:>6} {stage['requests']:>8} {stage['throughput_rps']:>9.2f} "
+            f"{stage['p50_ms']:>9.1f} {stage['p95_ms']:>9.1f} {stage['p99_ms']:>9.1f} "
+            f"{stage['error_rate']:>7.2%} {stage['degraded_rate']:>8.2%}")
+
+
+async def run_load_test(levels: List[int], duration: float, url: str = None,
+                        llm_latency_ms: float = 800, stub_embedding_model: bool = False,
+                        think_time: float = 0.0, slo_p95_ms: float = 3000, seed: int = 0,
+                        llm_slow_rate: float = 0.0, llm_slow_ms: float = 10000) -> dict:
+    """
+    Ramp through concurrency levels and report the saturation point
+    
+    Args:
+        levels: Concurrent session counts, one stage each
+        duration: Seconds per stage
+        url: Base URL of a running server (None runs the app in-process)
+        llm_latency_ms: Mean latency of the stub LLM (in-process only)
+        stub_embedding_model: Use hashed embeddings instead of the ONNX model
+        think_time: Mean pause between a session's requests
+        slo_p95_ms: p95 latency above which the service counts as saturated
+        seed: Random seed for the question mix
+        llm_slow_rate: Fraction of stub LLM calls that stall (in-process only)
+        llm_slow_ms: Extra latency of a stalled call
+    
+    Returns:
+        Per-stage results and the saturation point
+    """
+    print(f"{'conc':>6} {'requests':>8} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'degraded':>8}")
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+            stages = await LoadTester(client, think_time, seed).ramp(levels, duration)
+    else:
+        with stubbed_app(llm_latency_ms, stub_embedding_model, llm_slow_rate, llm_slow_ms) as app:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                         base_url="http://loadtest", timeout=120) as client:
+                stages = await LoadTester(client, think_time, seed).ramp(levels, duration)
+    
+    saturation = find_saturation(stages, slo_p95_ms)
+    if saturation:
+        print(f"\n Saturated at {saturation['concurrency']} concurrent sessions "
+              f"({saturation['reason']}); max sustained {saturation['max_sustained_rps']} req/s")
+    else:
+        print("\n No saturation within the tested levels")
+    return {"stages": stages, "saturation": saturation}
+
+
+def main(argv: list = None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Load test the EduMate API with a stubbed LLM")
+    parser.add_argument("mode", nargs="?", choices=["run", "serve"], default="run")
+    parser.add_argument("--url", help="Test a running server instead of the in-process app")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per stage")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="Mean stub LLM latency")
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0,
+                        help="Fraction of stub LLM calls that stall (exercises deadlines and hedging)")
+    parser.add_argument("--llm-slow-ms", type=float, default=10000, help="Extra latency of a stalled call")
+    parser.add_argument("--stub-embeddings", action="store_true", help="Do not load the ONNX embedding model")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between requests")
+    parser.add_argument("--slo-p95-ms", type=float, default=3000)
+    parser.add_argument("--port", type=int, default=8001, help="Port for serve mode")
+    parser.add_argument("--json", metavar="PATH", help="Write the full report as JSON")
+    args = parser.parse_args(argv)
+    
+    if args.mode == "serve":
+        import uvicorn
+        with stubbed_app(args.llm_latency_ms, args.stub_embeddings,
+                         args.llm_slow_rate, args.llm_slow_ms) as app:
+            uvicorn.run(app, host="127.0.0.1", port=args.port)
+        return
+    
+    levels = [int(level) for level in args.levels.split(",")]
+    report = asyncio.run(run_load_test(
+        levels, args.duration, url=args.url, llm_latency_ms=args.llm_latency_ms,
+        stub_embedding_model=args.stub_embeddings, think_time=args.think_time,
+        slo_p95_ms=args.slo_p95_ms, llm_slow_rate=args.llm_slow_rate, llm_slow_ms=args.llm_slow_ms
+    ))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
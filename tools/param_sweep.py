@@ -0,0 +1,307 @@
+"""
+Parameter Sweep - Retrieval quality vs latency for chunking and top-k settings
+
+Rebuilds a throwaway index for every (chunk size, overlap) pair and runs a
+golden set of questions with known source documents against it, so
+CHUNK_SIZE / CHUNK_OVERLAP and the number of context documents can be
+chosen on evidence. Page text comes from the page cache, so only chunking
+and embedding are repeated per configuration.
+
+Usage:
+    python -m tools.param_sweep
+    python -m tools.param_sweep --chunk-sizes 500,1000,1500 --overlaps 100,200 --k 1,3,5,auto
+    python -m tools.param_sweep --golden my_questions.json --json sweep.json
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.common import percentile, stub_embeddings
+from src.records import ChunkBatch, Hit
+
+DEFAULT_GOLDEN_SET = Path(__file__).parent / "golden_set.json"
+AUTO_K = "auto"
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+def load_golden_set(path: Path) -> List[dict]:
+    """
+    Load questions and the sources that should answer them
+    
+    Args:
+        path: JSON list of {"question", "expected_sources"} objects
+            ("expected_source" with a single name is also accepted)
+    
+    Returns:
+        Normalized golden set entries
+    """
+    entries = json.loads(Path(path).read_text(encoding="utf-8"))
+    golden = []
+    for entry in entries:
+        expected = entry.get("expected_sources") or [entry["expected_source"]]
+        golden.append({"question": entry["question"], "expected_sources": set(expected)})
+    return golden
+
+
+def first_relevant_rank(results: List[Hit], expected_sources: set) -> Optional[int]:
+    """1-based rank of the first result from an expected source, or None"""
+    for rank, doc in enumerate(results, start=1):
+        if doc.source in expected_sources:
+            return rank
+    return None
+
+
+def format_context(results: List[Hit]) -> str:
+    """Context block exactly as RAGChain sends it to the LLM"""
+    return "\n\n---\n\n".join(f"[{doc.source}] {doc.content}" for doc in results)
+
+
+def directory_size(path: Path) -> int:
+    """Total bytes of all files below a directory"""
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+class SweepIndex:
+    """A temporary Chroma collection built with one chunking configuration"""
+    
+    def __init__(self, corpus: Dict[Path, List[str]], chunk_size: int, chunk_overlap: int,
+                 embed_fn: EmbedFn, batch_size: int = 64):
+        """
+        Chunk, embed and store the corpus
+        
+        Args:
+            corpus: Page text of each PDF
+            chunk_size: Characters per chunk
+            chunk_overlap: Overlap between chunks
+            embed_fn: Embeds a list of texts
+            batch_size: Chunks embedded per call
+        """
+        import chromadb
+        from chromadb.config import Settings
+        from src.pdf_loader import PDFLoader
+        
+        loader = PDFLoader(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        documents = ChunkBatch()
+        for pdf_path, pages in corpus.items():
+            documents.extend(loader.chunk_pages(pages, pdf_path))
+        
+        self.path = Path(tempfile.mkdtemp(prefix="edumate_sweep_"))
+        self.client = chromadb.PersistentClient(path=str(self.path),
+                                                settings=Settings(anonymized_telemetry=False))
+        self.collection = self.client.create_collection("sweep", metadata={"hnsw:space": "cosine"})
+        
+        start = time.perf_counter()
+        for offset in range(0, len(documents), batch_size):
+            batch = documents.slice(offset, offset + batch_size)
+            self.collection.add(
+                ids=batch.ids(),
+                embeddings=embed_fn(batch.contents),
+                documents=batch.contents,
+                metadatas=batch.metadatas()
+            )
+        self.build_seconds = time.perf_counter() - start
+        self.chunks = len(documents)
+    
+    def search(self, query_embedding: List[float], n_results: int) -> List[Hit]:
+        """Nearest chunks to a query embedding, best first"""
+        results = self.collection.query(query_embeddings=[query_embedding], n_results=n_results)
+        return [
+            Hit.from_metadata(doc, metadata, distance)
+            for doc, metadata, distance in zip(
+                results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
+    
+    def size_bytes(self) -> int:
+        """Bytes the collection occupies on disk"""
+        return directory_size(self.path)
+    
+    def close(self):
+        """Delete the temporary index"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def evaluate(index: SweepIndex, golden: List[dict], query_embeddings: List[List[float]],
+             k: object) -> dict:
+    """
+    Measure retrieval quality and cost for one k
+    
+    Args:
+        index: Index to query
+        golden: Golden set entries
+        query_embeddings: Embedding of each golden question
+        k: Number of results, or "auto" for adaptive selection
+    
+    Returns:
+        recall@k, MRR@k, search latency, context size and result count
+    """
+    from src.config import config
+    from src.context_selection import estimate_tokens, select_context
+    
+    hits, reciprocal_ranks, latencies, tokens, result_counts = 0, 0.0, [], [], []
+    for entry, embedding in zip(golden, query_embeddings):
+        start = time.perf_counter()
+        if k == AUTO_K:
+            candidates = index.search(embedding, config.RETRIEVAL_MAX_RESULTS)
+            results, _ = select_context(candidates, config.RETRIEVAL_MAX_DISTANCE,
+                                        config.RETRIEVAL_ELBOW_GAP, config.MAX_CONTEXT_TOKENS)
+        else:
+            results = index.search(embedding, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        
+        rank = first_relevant_rank(results, entry["expected_sources"])
+        if rank is not None:
+            hits += 1
+            reciprocal_ranks += 1.0 / rank
+        tokens.append(estimate_tokens(format_context(results)) if results else 0)
+        result_counts.append(len(results))
+    
+    count = len(golden) or 1
+    return {
+        "k": k,
+        "recall": round(hits / count, 3),
+        "mrr": round(reciprocal_ranks / count, 3),
+        "search_p50_ms": round(percentile(latencies, 50), 2),
+        "search_p95_ms": round(percentile(latencies, 95), 2),
+        "avg_context_tokens": round(sum(tokens) / count),
+        "avg_results": round(sum(result_counts) / count, 2)
+    }
+
+
+def run_sweep(corpus: Dict[Path, List[str]], golden: List[dict], chunk_sizes: List[int],
+              overlaps: List[int], ks: List[object], embed_fn: EmbedFn) -> List[dict]:
+    """
+    Evaluate every chunking configuration and k
+    
+    Args:
+        corpus: Page text of each PDF
+        golden: Golden set entries
+        chunk_sizes: Chunk sizes to try
+        overlaps: Chunk overlaps to try (pairs with overlap >= size are skipped)
+        ks: Values of k to evaluate ("auto" for adaptive selection)
+        embed_fn: Embeds a list of texts
+    
+    Returns:
+        One row per (chunk size, overlap, k)
+    """
+    query_embeddings = embed_fn([entry["question"] for entry in golden])
+    rows = []
+    for chunk_size in chunk_sizes:
+        for overlap in overlaps:
+            if overlap >= chunk_size:
+                continue
+            print(f" Building index: chunk_size={chunk_size} overlap={overlap}")
+            index = SweepIndex(corpus, chunk_size, overlap, embed_fn)
+            try:
+                for k in ks:
+                    row = {
+                        "chunk_size": chunk_size,
+                        "overlap": overlap,
+                        "chunks": index.chunks,
+                        "index_mb": round(index.size_bytes() / 1024 / 1024, 2),
+                        "build_s": round(index.build_seconds, 2)
+                    }
+                    row.update(evaluate(index, golden, query_embeddings, k))
+                    rows.append(row)
+            finally:
+                index.close()
+    return rows
+
+
+COLUMNS = [
+    ("chunk_size", "size"), ("overlap", "overlap"), ("k", "k"), ("recall", "recall@k"),
+    ("mrr", "MRR"), ("search_p50_ms", "p50 ms"), ("search_p95_ms", "p95 ms"),
+    ("avg_context_tokens", "ctx tokens"), ("avg_results", "results"), ("chunks", "chunks"),
+    ("index_mb", "index MB"), ("build_s", "build s")
+]
+
+
+def format_table(rows: List[dict], default: tuple = None) -> str:
+    """
+    Render rows as a Markdown table, best recall and MRR first
+    
+    Args:
+        rows: Rows from run_sweep
+        default: (chunk_size, overlap) to mark as the current setting
+    
+    Returns:
+        Table text
+    """
+    ordered = sorted(rows, key=lambda row: (-row["recall"], -row["mrr"], row["avg_context_tokens"]))
+    lines = [
+        "| " + " | ".join(title for _, title in COLUMNS) + " |",
+        "|" + "|".join("---" for _ in COLUMNS) + "|"
+    ]
+    for row in ordered:
+        cells = [str(row[key]) for key, _ in COLUMNS]
+        if default and (row["chunk_size"], row["overlap"]) == default:
+            cells[0] += " *"
+        lines.append("| " + " | ".join(cells) + " |")
+    if default:
+        lines.append("\n* current CHUNK_SIZE / CHUNK_OVERLAP")
+    return "\n".join(lines)
+
+
+def load_corpus(pdf_folder: Path) -> Dict[Path, List[str]]:
+    """Page text of every PDF in a folder (through the page cache)"""
+    from src.pdf_loader import pdf_loader
+    corpus = {}
+    for pdf_path in sorted(Path(pdf_folder).glob("*.pdf")):
+        corpus[pdf_path] = pdf_loader.extract_pages(pdf_path)
+    return corpus
+
+
+def parse_ks(value: str) -> List[object]:
+    """Parse "1,3,5,auto" into [1, 3, 5, "auto"]"""
+    return [k if k == AUTO_K else int(k) for k in value.split(",")]
+
+
+def main(argv: list = None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Sweep chunking and top-k settings against a golden set")
+    parser.add_argument("--golden", default=str(DEFAULT_GOLDEN_SET), help="Golden set JSON file")
+    parser.add_argument("--pdf-folder", default=None, help="Corpus folder (defaults to PDF_FOLDER_PATH)")
+    parser.add_argument("--chunk-sizes", default="500,1000,1500", help="Comma-separated chunk sizes")
+    parser.add_argument("--overlaps", default="100,200", help="Comma-separated chunk overlaps")
+    parser.add_argument("--k", default="1,3,5,8,auto", help="Comma-separated k values; auto = adaptive")
+    parser.add_argument("--stub-embeddings", action="store_true", help="Do not load the ONNX embedding model")
+    parser.add_argument("--json", metavar="PATH", help="Write all rows as JSON")
+    args = parser.parse_args(argv)
+    
+    from src.config import config
+    if args.stub_embeddings:
+        embed_fn = stub_embeddings
+    else:
+        from src.vector_store import vector_store
+        embed_fn = vector_store.embed_texts
+    
+    golden = load_golden_set(Path(args.golden))
+    corpus = load_corpus(Path(args.pdf_folder or config.PDF_FOLDER_PATH))
+    if not corpus:
+        print(" No PDFs to sweep over")
+        return
+    
+    rows = run_sweep(
+        corpus, golden,
+        chunk_sizes=[int(size) for size in args.chunk_sizes.split(",")],
+        overlaps=[int(overlap) for overlap in args.overlaps.split(",")],
+        ks=parse_ks(args.k),
+        embed_fn=embed_fn
+    )
+    print()
+    print(format_table(rows, default=(config.CHUNK_SIZE, config.CHUNK_OVERLAP)))
+    
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
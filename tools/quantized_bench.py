@@ -0,0 +1,204 @@
+"""
+Quantized Index Benchmark - First-pass speed, process memory and disk use
+
+Two measurements back the VECTOR_BACKEND=quantized trade-off:
+
+1. First pass: the int8 scoring pass of QuantizedIndex against a float32
+   matrix-vector product over the same vectors, in-process.
+2. Serving: a throwaway Chroma collection and a quantized index over the
+   same synthetic vectors are written to a temporary directory, then each
+   backend answers the same queries in a fresh process. The whole-process
+   RSS (current and peak) and the bytes on disk are reported, so the
+   figures include Chroma's own memory, not only the side index.
+
+Usage:
+    python -m tools.quantized_bench
+    python -m tools.quantized_bench --vectors 100000 --queries 200 --json quantized.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.common import percentile
+
+COLLECTION = "quantized_bench"
+
+
+class _PrecomputedEmbeddings:
+    """Embedding function for collections that only ever receive vectors"""
+    
+    def __call__(self, input):
+        raise RuntimeError("quantized_bench collections take precomputed embeddings only")
+
+
+def process_memory() -> dict:
+    """Current and peak resident memory of this process in MB"""
+    memory = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                memory[key] = round(int(value.split()[0]) / 1024, 1)
+    return {"rss_mb": memory.get("VmRSS"), "peak_rss_mb": memory.get("VmHWM")}
+
+
+def disk_mb(path: Path) -> float:
+    """Bytes under a directory, in MB"""
+    return round(sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1024 ** 2, 1)
+
+
+def synthetic_vectors(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal(size=(count, dimension), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def first_pass(sizes: List[int], dimension: int = 384, repeats: int = 20) -> List[dict]:
+    """
+    Time the int8 first pass against a float32 matrix-vector product
+    
+    Args:
+        sizes: Corpus sizes (vectors)
+        dimension: Vector dimension
+        repeats: Timed passes per size (after one warm-up pass)
+    
+    Returns:
+        One row per size with the mean time of each pass
+    """
+    from src.quantized_store import QuantizedIndex
+    rows = []
+    for size in sizes:
+        vectors = synthetic_vectors(size, dimension)
+        with tempfile.TemporaryDirectory() as root:
+            index = QuantizedIndex(root)
+            index.build([f"chunk_{i}" for i in range(size)], vectors)
+            query = vectors[size // 2]
+            timings = {}
+            for name, score in (("float32_ms", lambda: vectors @ query),
+                                ("int8_ms", lambda: index.approximate_scores(query))):
+                score()
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    score()
+                timings[name] = round((time.perf_counter() - start) * 1000 / repeats, 2)
+        rows.append({"vectors": size, **timings, "speedup": round(timings["float32_ms"] / timings["int8_ms"], 2)})
+        print(f" {size:>9} vectors  float32 {timings['float32_ms']:>8.2f} ms  "
+              f"int8 {timings['int8_ms']:>8.2f} ms  x{rows[-1]['speedup']}")
+    return rows
+
+
+def prepare(root: Path, count: int, dimension: int, queries: int, batch_size: int = 5000):
+    """Write the Chroma collection, the quantized index and the query vectors"""
+    import chromadb
+    from src.quantized_store import QuantizedIndex
+    vectors = synthetic_vectors(count, dimension)
+    ids = [f"chunk_{i}" for i in range(count)]
+    
+    client = chromadb.PersistentClient(path=str(root / "chroma"))
+    collection = client.create_collection(COLLECTION, metadata={"hnsw:space": "cosine"},
+                                          embedding_function=_PrecomputedEmbeddings())
+    for start in range(0, count, batch_size):
+        end = start + batch_size
+        collection.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                       documents=[f"Chunk text {i}" for i in range(start, min(end, count))],
+                       metadatas=[{"source": f"lecture{i % 20}"} for i in range(start, min(end, count))])
+    QuantizedIndex(str(root / "quantized")).build(ids, vectors, {"collection": COLLECTION})
+    
+    rng = np.random.default_rng(1)
+    probes = vectors[rng.choice(count, queries)] + rng.normal(0, 0.02, size=(queries, dimension))
+    np.save(root / "queries.npy", probes.astype(np.float32))
+
+
+def serve(root: Path, backend: str, k: int) -> dict:
+    """Answer the saved queries with one backend (run in a fresh process)"""
+    import chromadb
+    from src.quantized_store import QuantizedIndex
+    queries = np.load(root / "queries.npy")
+    client = chromadb.PersistentClient(path=str(root / "chroma"))
+    collection = client.get_collection(COLLECTION, embedding_function=_PrecomputedEmbeddings())
+    index = QuantizedIndex(str(root / "quantized")) if backend == "quantized" else None
+    opened = process_memory()
+    
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        if index is None:
+            collection.query(query_embeddings=[query.tolist()], n_results=k,
+                             include=["documents", "metadatas", "distances"])
+        else:
+            # What VectorStore does: IDs from the index, text from Chroma
+            hits = index.search(query, k)
+            collection.get(ids=[chunk_id for chunk_id, _ in hits], include=["documents", "metadatas"])
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    return {
+        "backend": backend,
+        "rss_after_open_mb": opened["rss_mb"],
+        **process_memory(),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2)
+    }
+
+
+def serving(count: int, dimension: int, queries: int, k: int) -> dict:
+    """Measure both backends over the same data, each in its own process"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        start = time.perf_counter()
+        prepare(root, count, dimension, queries)
+        print(f" Prepared {count} vectors in {time.perf_counter() - start:.1f} s")
+        
+        # The quantized backend still needs Chroma on disk for text and writes
+        disk = {"chroma": disk_mb(root / "chroma"),
+                "quantized": disk_mb(root / "chroma") + disk_mb(root / "quantized")}
+        rows = []
+        for backend in ("chroma", "quantized"):
+            output = subprocess.run(
+                [sys.executable, "-m", "tools.quantized_bench", "serve", "--root", str(root),
+                 "--backend", backend, "--k", str(k)],
+                cwd=str(Path(__file__).parent.parent), capture_output=True, text=True, check=True
+            ).stdout
+            row = json.loads(output.strip().splitlines()[-1])
+            row["disk_mb"] = round(disk[backend], 1)
+            rows.append(row)
+            print(f" {backend:>9}  rss {row['rss_mb']:>7.1f} MB  peak {row['peak_rss_mb']:>7.1f} MB  "
+                  f"disk {row['disk_mb']:>7.1f} MB  p50 {row['p50_ms']:>6.2f} ms  p95 {row['p95_ms']:>6.2f} ms")
+    return {"vectors": count, "dimension": dimension, "queries": queries, "k": k, "backends": rows}
+
+
+def main(argv: list = None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the int8 quantized vector index")
+    parser.add_argument("command", nargs="?", default="all", choices=["all", "first-pass", "serve"])
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--sizes", default="20000,100000,400000", help="Corpus sizes for the first pass")
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", choices=["chroma", "quantized"], help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+    
+    if args.command == "serve":
+        print(json.dumps(serve(Path(args.root), args.backend, args.k)))
+        return
+    
+    results = {"first_pass": first_pass([int(size) for size in args.sizes.split(",")], args.dimension)}
+    if args.command == "all":
+        results["serving"] = serving(args.vectors, args.dimension, args.queries, args.k)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Records Benchmark - Memory and time of chunk records vs per-chunk dicts
+
+Measures the three places src.records replaced dicts, on a synthetic corpus
+whose chunk texts are shared by both forms (so only the per-chunk overhead
+is compared):
+
+1. Loader output: one {"content", "metadata": {...}} dict per chunk against
+   a ChunkBatch (text list, array of chunk indexes, one entry per file).
+2. Write-batch preparation: the ids, documents and metadatas lists built
+   for every upsert batch.
+3. Retained hits: {"content", "metadata", "distance"} dicts, which keep
+   Chroma's metadata dict alive, against Hit records built from it.
+
+Memory is what tracemalloc sees allocated by each form; time is the best
+of a few runs.
+
+Usage:
+    python -m tools.records_bench
+    python -m tools.records_bench --files 500 --chunks-per-file 400 --hits 800000 --json records.json
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.records import ChunkBatch, Hit
+
+BATCH_SIZE = 256
+
+
+def measure(build: Callable, repeats: int = 3) -> dict:
+    """
+    Memory retained by build()'s result and the best build time
+    
+    Args:
+        build: Builds and returns the structure to measure
+        repeats: Timed runs (memory is taken from the first)
+    
+    Returns:
+        Retained MB and build time in ms
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    
+    best = float("inf")
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        result = build()
+        best = min(best, time.perf_counter() - start)
+        del result
+    return {"mb": round(retained / 1024 ** 2, 1), "ms": round(best * 1000, 1)}
+
+
+def synthetic_corpus(files: int, chunks_per_file: int, chunk_chars: int) -> list:
+    """(source, file_path, file_hash, texts) per file; texts are shared by both forms"""
+    corpus = []
+    for f in range(files):
+        source = f"lecture_{f:04d}"
+        texts = [(f"{source} chunk {i} " * (chunk_chars // 16 + 1))[:chunk_chars] for i in range(chunks_per_file)]
+        corpus.append((source, f"/data/pdfs/{source}.pdf", f"{f:064x}", texts))
+    return corpus
+
+
+def loader_dicts(corpus: list) -> list:
+    """Loader output before src.records: one dict per chunk"""
+    return [
+        {"content": text, "metadata": {"source": source, "chunk_index": i,
+                                       "file_path": file_path, "file_hash": file_hash}}
+        for source, file_path, file_hash, texts in corpus
+        for i, text in enumerate(texts)
+    ]
+
+
+def loader_batch(corpus: list) -> ChunkBatch:
+    batch = ChunkBatch()
+    for source, file_path, file_hash, texts in corpus:
+        batch.add_file(source, file_path, file_hash, texts)
+    return batch
+
+
+def write_batches_dicts(documents: list) -> list:
+    """Per upsert batch: ids, documents and metadatas from the chunk dicts"""
+    batches = []
+    for start in range(0, len(documents), BATCH_SIZE):
+        batch = documents[start:start + BATCH_SIZE]
+        batches.append((
+            [f"{doc['metadata']['source']}_{doc['metadata']['file_hash'][:12]}_{doc['metadata']['chunk_index']}"
+             for doc in batch],
+            [doc["content"] for doc in batch],
+            [doc["metadata"] for doc in batch]
+        ))
+    return batches
+
+
+def write_batches_records(documents: ChunkBatch) -> list:
+    batches = []
+    for start in range(0, len(documents), BATCH_SIZE):
+        batch = documents.slice(start, start + BATCH_SIZE)
+        batches.append((batch.ids(), batch.contents, batch.metadatas()))
+    return batches
+
+
+def query_results(corpus: list, count: int) -> list:
+    """(content, metadata, distance) per result, each with a fresh metadata dict as Chroma returns"""
+    rows = [(text, source, i, file_path, file_hash)
+            for source, file_path, file_hash, texts in corpus for i, text in enumerate(texts)]
+    # Chroma decodes new strings for every result, so each dict gets copies
+    return [(text, {"source": (source + " ")[:-1], "chunk_index": i, "file_path": (file_path + " ")[:-1],
+                    "file_hash": (file_hash + " ")[:-1]}, 0.25)
+            for text, source, i, file_path, file_hash in (rows[n % len(rows)] for n in range(count))]
+
+
+def run(files: int, chunks_per_file: int, chunk_chars: int, hits: int) -> dict:
+    """Measure all three comparisons"""
+    corpus = synthetic_corpus(files, chunks_per_file, chunk_chars)
+    text_mb = sum(len(text) for *_, texts in corpus for text in texts) / 1024 ** 2
+    print(f" {files * chunks_per_file} chunks ({files} files x {chunks_per_file}), "
+          f"{text_mb:.0f} MB of text shared by both forms")
+    results = {"chunks": files * chunks_per_file, "text_mb": round(text_mb, 1)}
+    
+    results["loader"] = {"dicts": measure(lambda: loader_dicts(corpus)),
+                         "records": measure(lambda: loader_batch(corpus))}
+    
+    documents, batch = loader_dicts(corpus), loader_batch(corpus)
+    results["write_batches"] = {"dicts": measure(lambda: write_batches_dicts(documents)),
+                                "records": measure(lambda: write_batches_records(batch))}
+    del documents, batch
+    
+    def retained_hits(make_hit):
+        # Only the hits survive; the query results they came from are dropped
+        return [make_hit(content, metadata, distance) for content, metadata, distance in query_results(corpus, hits)]
+    
+    results["hits"] = {
+        "count": hits,
+        "dicts": measure(lambda: retained_hits(
+            lambda content, metadata, distance: {"content": content, "metadata": metadata, "distance": distance})),
+        "records": measure(lambda: retained_hits(Hit.from_metadata))
+    }
+    
+    for name in ("loader", "write_batches", "hits"):
+        row = results[name]
+        print(f" {name:<14} dicts {row['dicts']['mb']:>7.1f} MB {row['dicts']['ms']:>8.1f} ms   "
+              f"records {row['records']['mb']:>7.1f} MB {row['records']['ms']:>8.1f} ms")
+    return results
+
+
+def main(argv: list = None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Compare chunk records with per-chunk dicts")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--chunks-per-file", type=int, default=400)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--hits", type=int, default=800000, help="Search hits kept alive")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+    
+    results = run(args.files, args.chunks_per_file, args.chunk_chars, args.hits)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()